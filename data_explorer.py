@@ -5,9 +5,21 @@ Visual exploration of all BigQuery tables, schemas, and CSV export
 Launch: streamlit run data_explorer.py
 """
 import os
+import sys
+import time
+from datetime import datetime, timezone
 import streamlit as st
 import pandas as pd
-from google.cloud import bigquery
+
+# Shared client factory lives in data_validation/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_validation'))
+import bq_client
+from query_budget import QueryBudget, BudgetExceeded, format_bytes
+from result_export import (EXPORT_FORMATS, EXPORT_MAX_LOCAL_ROWS, EXPORT_RETENTION_HOURS, export_to_file,
+                           extract_to_gcs, signed_urls, cleanup_exports, cleanup_gcs_exports)
+import result_cache
+import table_catalog
+import local_mirror
 
 st.set_page_config(page_title="Better Signal - Data Explorer", layout="wide")
 
@@ -19,15 +31,36 @@ if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
 
 @st.cache_resource
 def get_client():
-    return bigquery.Client(project="hulken")
+    return bq_client.get_client("hulken")
 
 client = get_client()
 
+@st.cache_resource
+def cleanup_shared_cache():
+    """Once per process: drop expired entries of the on-disk result cache."""
+    result_cache.cleanup()
+
+cleanup_shared_cache()
+
+@st.cache_resource
+def start_catalog_refresh():
+    """Once per process: keep the local table catalog (SQLite) fresh in the background."""
+    return table_catalog.start_background_refresh(client)
+
+start_catalog_refresh()
+
+def get_budget():
+    """Bytes budget of this browser session (config.QUERY_BUDGETS["data_explorer"])."""
+    if "query_budget" not in st.session_state:
+        st.session_state["query_budget"] = QueryBudget.for_tool("data_explorer")
+    return st.session_state["query_budget"]
+
 # ============================================================
 # SIDEBAR - Dataset & Table Selection
 # ============================================================
 st.sidebar.title("Better Signal")
 st.sidebar.markdown("Data Explorer")
+st.sidebar.caption(get_budget().summary_line())
 
 DATASETS = {
     "ads_data": "Shopify, Facebook, TikTok, UTM",
@@ -43,9 +76,12 @@ selected_dataset = st.sidebar.selectbox(
     format_func=lambda x: f"{x} - {DATASETS[x]}"
 )
 
-# Get tables for selected dataset
+# Get tables for selected dataset (local catalog, BigQuery until the catalog is built)
 @st.cache_data(ttl=300)
 def get_tables(dataset_id):
+    catalog_df = table_catalog.list_tables(dataset_id)
+    if not catalog_df.empty:
+        return catalog_df
     tables = list(client.list_tables(f"hulken.{dataset_id}"))
     result = []
     for t in tables:
@@ -57,6 +93,16 @@ def get_tables(dataset_id):
 
 tables_df = get_tables(selected_dataset)
 
+# Column search across every dataset (local catalog, no BigQuery call)
+column_search = st.sidebar.text_input("Find column", placeholder="e.g. email_hash")
+if column_search:
+    matches = table_catalog.search_columns(column_search)
+    if matches.empty:
+        refreshed = table_catalog.refreshed_at()
+        st.sidebar.caption("No match" if refreshed else "Catalog is being built, try again in a minute")
+    else:
+        st.sidebar.dataframe(matches[["dataset", "table", "column"]], hide_index=True, use_container_width=True)
+
 if tables_df.empty:
     st.warning(f"No tables in {selected_dataset}")
     st.stop()
@@ -73,9 +119,14 @@ tab_schema, tab_preview, tab_query, tab_overview = st.tabs([
     "Schema", "Preview", "Query + Export", "Overview"
 ])
 
-# Get schema
+# Get schema (shared by all sessions through the on-disk result cache)
 @st.cache_data(ttl=300)
 def get_schema(dataset_id, table_id):
+    schema = result_cache.cached_call("schema", (dataset_id, table_id), lambda: load_schema(dataset_id, table_id))
+    return pd.DataFrame(schema["columns"]), schema["num_rows"], schema["num_bytes"], schema["modified"]
+
+def load_schema(dataset_id, table_id):
+    """Columns and size of a table as JSON data (stored as is in the result cache)."""
     table = client.get_table(f"hulken.{dataset_id}.{table_id}")
     schema_rows = []
     for field in table.schema:
@@ -85,7 +136,12 @@ def get_schema(dataset_id, table_id):
             "Mode": field.mode,
             "Description": field.description or "",
         })
-    return pd.DataFrame(schema_rows), table.num_rows, table.num_bytes, table.modified
+    return {
+        "columns": schema_rows,
+        "num_rows": table.num_rows,
+        "num_bytes": table.num_bytes,
+        "modified": table.modified.isoformat(sep=" ") if table.modified else None,
+    }
 
 schema_df, num_rows, num_bytes, modified = get_schema(selected_dataset, selected_table)
 
@@ -102,16 +158,52 @@ with tab_schema:
 # ============================================================
 # TAB 2 - Preview (first 100 rows)
 # ============================================================
+PREVIEW_ROWS = 100
+PREVIEW_DEFAULT_COLUMNS = 30
+PREVIEW_VIEW_DAYS = 3  # views: only read the most recent days
+VIEW_DATE_COLUMNS = ["date", "report_date", "date_start", "created_at", "_DATA_DATE"]
+
+def preview_view(table, columns):
+    """Views cannot be listed: query the selected columns on the most recent days only."""
+    select = ", ".join(f"`{c}`" for c in columns) or "*"
+    date_field = next(
+        (f for name in VIEW_DATE_COLUMNS for f in table.schema
+         if f.name == name and f.field_type in ("DATE", "TIMESTAMP", "DATETIME")),
+        None
+    )
+    where = ""
+    if date_field:
+        where = f"WHERE DATE(`{date_field.name}`) >= DATE_SUB(@today, INTERVAL {PREVIEW_VIEW_DAYS} DAY)"
+    query = f"SELECT {select} FROM `{table.project}.{table.dataset_id}.{table.table_id}` {where} LIMIT {PREVIEW_ROWS}"
+    return get_budget().run_query(client, query).to_dataframe()
+
+@st.cache_data(ttl=120)
+def preview_table(dataset_id, table_id, columns):
+    """
+    First rows of a table through tabledata.list (no query job, nothing billed),
+    decoded to Arrow; views fall back to a date-pruned query.
+    Returns (DataFrame, source label).
+    """
+    table = client.get_table(f"hulken.{dataset_id}.{table_id}")
+    if table.table_type in ("VIEW", "MATERIALIZED_VIEW"):
+        return preview_view(table, columns), f"query on the last {PREVIEW_VIEW_DAYS} days (view)"
+    fields = [f for f in table.schema if f.name in columns] or None
+    rows = client.list_rows(table, max_results=PREVIEW_ROWS, selected_fields=fields)
+    # Small page: the free REST listing is faster than opening a Storage API read session
+    return rows.to_arrow(create_bqstorage_client=False).to_pandas(), "table listing (free)"
+
 with tab_preview:
-    st.subheader(f"Preview: `{selected_table}` (100 rows)")
+    st.subheader(f"Preview: `{selected_table}` ({PREVIEW_ROWS} rows)")
 
-    @st.cache_data(ttl=120)
-    def preview_table(dataset_id, table_id):
-        query = f"SELECT * FROM `hulken.{dataset_id}.{table_id}` LIMIT 100"
-        return client.query(query).to_dataframe()
+    all_columns = schema_df["Column"].tolist() if not schema_df.empty else []
+    preview_columns = st.multiselect(
+        "Columns", all_columns, default=all_columns[:PREVIEW_DEFAULT_COLUMNS],
+        key=f"preview_columns_{selected_dataset}_{selected_table}"
+    )
 
     try:
-        preview_df = preview_table(selected_dataset, selected_table)
+        preview_df, preview_source = preview_table(selected_dataset, selected_table, tuple(preview_columns))
+        st.caption(f"Source: {preview_source}")
         st.dataframe(preview_df, use_container_width=True, height=500)
 
         # CSV export for preview
@@ -126,8 +218,100 @@ with tab_preview:
         st.error(f"Error: {e}")
 
 # ============================================================
-# TAB 3 - Custom Query + CSV Export
+# TAB 3 - Custom Query + Export
 # ============================================================
+RESULT_PAGE_SIZES = [100, 500, 1000, 5000]
+
+def fetch_result_page(destination, page, page_size):
+    """One page of a finished query, read from its destination table (tabledata.list, not billed)."""
+    rows = client.list_rows(destination, start_index=page * page_size, max_results=page_size)
+    return rows.to_arrow(create_bqstorage_client=False).to_pandas()
+
+MAX_CONCURRENT_QUERIES = 2
+QUERY_POLL_SECONDS = 2
+
+def session_jobs():
+    """Query jobs submitted from this browser session (running and finished, most recent last)."""
+    return st.session_state.setdefault("query_jobs", [])
+
+def job_progress(job):
+    """(stage label, fraction of work units done or None) from the job's query plan and timeline."""
+    stages = job.query_plan or []
+    if not stages:
+        return job.state.title(), None
+    done = sum(1 for stage in stages if stage.status == "COMPLETE")
+    current = next((stage.name for stage in stages if stage.status == "RUNNING"), stages[-1].name)
+    fraction = None
+    if job.timeline:
+        sample = job.timeline[-1]
+        total = (sample.completed_units or 0) + (sample.pending_units or 0)
+        fraction = (sample.completed_units or 0) / total if total else None
+    return f"{current} ({done}/{len(stages)} stages complete)", fraction
+
+def show_result(entry):
+    """Make a finished job the result browsed and exported below."""
+    job = entry["job"]
+    rows = job.result(page_size=1)  # job is done: no waiting, first page only
+    st.session_state["query_result"] = {
+        "job_id": job.job_id,
+        "destination": f"{job.destination.project}.{job.destination.dataset_id}.{job.destination.table_id}"
+                       if job.destination else None,
+        "total_rows": rows.total_rows or 0,
+        "estimate": entry["estimate"],
+    }
+    st.session_state.pop("result_page", None)
+    st.session_state.pop("result_export", None)
+
+def _auto_refresh(func):
+    """Rerun only this panel every QUERY_POLL_SECONDS (st.fragment, Streamlit >= 1.37)."""
+    fragment = getattr(st, "fragment", None)
+    return fragment(run_every=QUERY_POLL_SECONDS)(func) if fragment else func
+
+@_auto_refresh
+def query_jobs_panel():
+    """Status of this session's query jobs, with live progress and Cancel."""
+    jobs = session_jobs()
+    jobs[:] = [entry for entry in jobs if not entry.get("dismissed")]
+    for entry in reversed(jobs):
+        job = entry["job"]
+        if job.state != "DONE":
+            job.reload()
+        if job.state == "DONE" and not entry.get("settled"):
+            # Seen DONE without a reload (e.g. cache hit): result() runs the budget and metrics hooks
+            try:
+                job.result(max_results=0)
+            except Exception:
+                pass  # error_result is shown below
+            entry["settled"] = True
+        elapsed = (job.ended or datetime.now(timezone.utc)) - job.created if job.created else None
+        elapsed_label = f"{elapsed.total_seconds():.0f}s" if elapsed is not None else "-"
+        st.caption(f"`{job.job_id}` - {entry['sql'][:80]}")
+        if job.state == "DONE":
+            if job.error_result:
+                st.error(f"Query Error ({elapsed_label}): {job.error_result.get('message')}")
+            else:
+                st.success(f"Done in {elapsed_label}, {format_bytes(job.total_bytes_processed)} processed"
+                           + (" (cache hit)" if job.cache_hit else ""))
+                # The latest query replaces the result below as soon as it finishes
+                if job.job_id == st.session_state.get("latest_job_id") or st.button("Show results", key=f"show_{job.job_id}"):
+                    entry["dismissed"] = True
+                    show_result(entry)
+                    st.rerun()
+            if st.button("Dismiss", key=f"dismiss_{job.job_id}"):
+                entry["dismissed"] = True
+                st.rerun()
+        else:
+            stage, fraction = job_progress(job)
+            st.progress(fraction or 0.0,
+                        text=f"{stage} - {elapsed_label} elapsed, "
+                             f"~{format_bytes(entry['estimate']['estimated_bytes'])} to scan (dry run)")
+            if st.button("Cancel", key=f"cancel_{job.job_id}"):
+                # Best effort: bytes already scanned are still billed
+                job.cancel()
+                st.warning("Cancellation requested")
+    if jobs and not hasattr(st, "fragment"):
+        st.button("Refresh status")
+
 with tab_query:
     st.subheader("Custom Query")
 
@@ -136,43 +320,152 @@ with tab_query:
     query_text = st.text_area("SQL", value=default_query, height=150)
 
     col_run, col_limit = st.columns([1, 3])
-    max_rows = col_limit.number_input("Max rows", value=1000, min_value=1, max_value=100000, step=1000)
+    page_size = col_limit.selectbox("Rows per page", RESULT_PAGE_SIZES, index=2)
+    allow_sample = st.checkbox(
+        "Run on a table sample (TABLESAMPLE) when the query is over budget",
+        help=f"Per-query limit: {format_bytes(get_budget().max_bytes_per_query)}, "
+             f"session budget: {format_bytes(get_budget().run_budget)}"
+    )
+
+    # Local backend: DuckDB over the Parquet mirror of recent days (local_mirror.py),
+    # BigQuery when the query needs tables or days that are not mirrored
+    col_backend, col_sync = st.columns([3, 1])
+    backend = col_backend.radio("Backend", ["BigQuery", "Local (DuckDB)"], horizontal=True,
+                                help=f"Local mirror: last {local_mirror.LOCAL_MIRROR['days']} days of "
+                                     + ", ".join(t.rsplit('.', 1)[-1] for t in local_mirror.LOCAL_MIRROR["tables"]))
+    if backend == "Local (DuckDB)" and col_sync.button("Sync mirror"):
+        with st.spinner("Exporting recent days to Parquet..."):
+            try:
+                days = local_mirror.sync(client, budget=get_budget(), progress=None)
+                st.success(f"Local mirror up to date ({days} day(s) exported)")
+            except Exception as e:
+                st.error(f"Mirror sync Error: {e}")
 
     if col_run.button("Run Query", type="primary"):
-        with st.spinner("Running..."):
+        local_df = None
+        if backend == "Local (DuckDB)":
+            try:
+                started = time.monotonic()
+                local_df = local_mirror.run(query_text)
+                elapsed_ms = (time.monotonic() - started) * 1000
+            except local_mirror.NotMirrored as e:
+                st.info(f"Running on BigQuery: {e}")
+        running = [j for j in session_jobs() if j["job"].state != "DONE"]
+        if local_df is not None:
+            st.success(f"{len(local_df):,} rows from the local mirror in {elapsed_ms:.0f} ms (0 bytes billed)")
+            st.dataframe(local_df.head(page_size), use_container_width=True, height=500)
+            if len(local_df) > page_size:
+                st.caption(f"First {page_size:,} rows shown")
+        elif len(running) >= MAX_CONCURRENT_QUERIES:
+            st.error(f"{len(running)} queries already running (limit {MAX_CONCURRENT_QUERIES} per session): "
+                     "wait for one to finish or cancel it")
+        else:
             try:
-                result_df = client.query(query_text).to_dataframe()
-                if len(result_df) > max_rows:
-                    result_df = result_df.head(max_rows)
-                    st.warning(f"Results truncated to {max_rows:,} rows")
-
-                st.success(f"{len(result_df):,} rows returned")
-                st.dataframe(result_df, use_container_width=True, height=500)
-
-                # CSV export
-                csv = result_df.to_csv(index=False)
-                st.download_button(
-                    label=f"Download CSV ({len(result_df):,} rows)",
-                    data=csv,
-                    file_name="query_result.csv",
-                    mime="text/csv"
-                )
-
-                # Store in session for later
-                st.session_state["last_result"] = result_df
+                # Dry run first: the query only starts if it fits the budget.
+                # @today / @now are bound on the client so identical queries hit the BigQuery cache.
+                # client.query() returns as soon as the job is submitted; the panel below polls it
+                budget = get_budget()
+                job = budget.run_query(client, query_text, allow_sample=allow_sample)
+                session_jobs().append({"job": job, "estimate": budget.history[-1], "sql": query_text})
+                st.session_state["latest_job_id"] = job.job_id
+            except BudgetExceeded as e:
+                st.error(f"Query blocked: {e}")
             except Exception as e:
                 st.error(f"Query Error: {e}")
 
+    query_jobs_panel()
+
+    # Result browsing: pages are read from the job's destination table on demand,
+    # only the visible page is held in memory
+    result = st.session_state.get("query_result")
+    if result:
+        estimate = result["estimate"]
+        if estimate["sample_percent"] < 100:
+            st.warning(f"Query estimated at {format_bytes(estimate['estimated_bytes'])}: "
+                       f"ran on a {estimate['sample_percent']}% table sample")
+        else:
+            st.caption(f"Scanned (estimate): {format_bytes(estimate['estimated_bytes'])}")
+        st.success(f"{result['total_rows']:,} rows returned")
+
+        if result["destination"] and result["total_rows"]:
+            page_count = max((result["total_rows"] + page_size - 1) // page_size, 1)
+            page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1) - 1
+            page_key = (result["destination"], page, page_size)
+            cached = st.session_state.get("result_page")
+            if not cached or cached[0] != page_key:
+                try:
+                    page_df = fetch_result_page(result["destination"], page, page_size)
+                except Exception as e:
+                    st.error(f"Could not read results (the temporary result table expires after 24h): {e}")
+                    page_df = pd.DataFrame()
+                st.session_state["result_page"] = (page_key, page_df)
+            page_df = st.session_state["result_page"][1]
+
+            first = page * page_size + 1
+            st.caption(f"Rows {first:,}-{first + len(page_df) - 1:,} of {result['total_rows']:,}")
+            st.dataframe(page_df, use_container_width=True, height=500)
+
+        # Export: streamed chunk by chunk from the destination table to a file on disk.
+        # Above EXPORT_MAX_LOCAL_ROWS: extract job to Cloud Storage and signed URLs, so
+        # large files never sit in Streamlit's in-memory download store
+        if result["destination"]:
+            st.markdown("**Export**")
+            col_fmt, col_export = st.columns([1, 3])
+            export_format = col_fmt.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+            export = st.session_state.get("result_export")
+            if export and export["key"] != (result["job_id"], export_format):
+                export = None
+            if col_export.button("Prepare export"):
+                try:
+                    if result["total_rows"] > EXPORT_MAX_LOCAL_ROWS:
+                        with st.spinner("Extract job to Cloud Storage..."):
+                            cleanup_gcs_exports(project=client.project)
+                            uri = extract_to_gcs(client, result["destination"], export_format, result["job_id"])
+                            urls = signed_urls(uri, project=client.project)
+                        export = {"key": (result["job_id"], export_format), "uri": uri, "urls": urls}
+                    else:
+                        cleanup_exports()
+                        bar = st.progress(0.0, text="Exporting...")
+                        path, written = export_to_file(
+                            client, result["destination"], export_format, name=f"query_result_{result['job_id']}",
+                            progress=lambda n: bar.progress(min(n / result["total_rows"], 1.0),
+                                                            text=f"{n:,} / {result['total_rows']:,} rows"))
+                        bar.empty()
+                        export = {"key": (result["job_id"], export_format), "path": str(path), "rows": written}
+                    st.session_state["result_export"] = export
+                except Exception as e:
+                    st.error(f"Export Error: {e}")
+
+            if export and export.get("uri") and export["urls"] is None:
+                # Credentials without a private key cannot sign URLs
+                st.success(f"Exported to Cloud Storage (deleted after {EXPORT_RETENTION_HOURS}h)")
+                st.code(f"gsutil cp '{export['uri']}' .", language="bash")
+            elif export and export.get("uri"):
+                st.success(f"Exported to `{export['uri']}` ({len(export['urls'])} file(s), "
+                           f"links valid {EXPORT_RETENTION_HOURS}h)")
+                for name, url in export["urls"]:
+                    st.link_button(f"Download {name}", url)
+            elif export and os.path.exists(export["path"]):
+                size = os.path.getsize(export["path"])
+                with open(export["path"], "rb") as f:
+                    st.download_button(
+                        label=f"Download {export_format} ({export['rows']:,} rows, {format_bytes(size)})",
+                        data=f,
+                        file_name=os.path.basename(export["path"]),
+                        mime=EXPORT_FORMATS[export_format][1]
+                    )
+
     # Quick queries
     st.markdown("---")
-    st.markdown("**Quick Queries (click to load):**")
+    st.markdown("**Quick Queries:**")
+    st.caption("`@today` (current UTC date) and `@now` (current UTC time, truncated to the hour by default) are bound automatically.")
 
     quick_queries = {
         "Daily Revenue (30 days)": """SELECT DATE(created_at) AS date,
   COUNT(*) AS orders,
   ROUND(SUM(total_price), 2) AS revenue
 FROM `hulken.ads_data.shopify_live_orders_clean`
-WHERE DATE(created_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 30 DAY)
 GROUP BY date ORDER BY date DESC""",
 
         "Facebook Spend by Campaign (deduped)": """SELECT campaign_name,
@@ -180,7 +473,7 @@ GROUP BY date ORDER BY date DESC""",
   SUM(impressions) AS impressions,
   SUM(clicks) AS clicks
 FROM `hulken.ads_data.facebook_insights`
-WHERE date_start >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+WHERE date_start >= DATE_SUB(@today, INTERVAL 7 DAY)
 GROUP BY campaign_name ORDER BY spend DESC""",
 
         "TikTok Daily Spend": """SELECT report_date AS date,
@@ -188,27 +481,27 @@ GROUP BY campaign_name ORDER BY spend DESC""",
   SUM(impressions) AS impressions,
   SUM(clicks) AS clicks
 FROM `hulken.ads_data.tiktok_ads_reports_daily`
-WHERE report_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+WHERE report_date >= DATE_SUB(@today, INTERVAL 7 DAY)
 GROUP BY date ORDER BY date DESC""",
 
         "UTM Attribution - Revenue by Source": """SELECT first_utm_source,
   COUNT(*) AS orders,
   ROUND(SUM(total_price), 2) AS revenue
 FROM `hulken.ads_data.shopify_utm`
-WHERE DATE(created_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 30 DAY)
   AND first_utm_source IS NOT NULL
 GROUP BY first_utm_source ORDER BY revenue DESC""",
 
-        "Data Freshness Check": """SELECT 'facebook_ads' AS source, MAX(date_start) AS latest, DATE_DIFF(CURRENT_DATE(), MAX(date_start), DAY) AS days_behind
+        "Data Freshness Check": """SELECT 'facebook_ads' AS source, MAX(date_start) AS latest, DATE_DIFF(@today, MAX(date_start), DAY) AS days_behind
 FROM `hulken.ads_data.facebook_insights`
 UNION ALL
-SELECT 'tiktok_ads', MAX(report_date), DATE_DIFF(CURRENT_DATE(), MAX(report_date), DAY)
+SELECT 'tiktok_ads', MAX(report_date), DATE_DIFF(@today, MAX(report_date), DAY)
 FROM `hulken.ads_data.tiktok_ads_reports_daily`
 UNION ALL
-SELECT 'shopify_orders', MAX(DATE(created_at)), DATE_DIFF(CURRENT_DATE(), MAX(DATE(created_at)), DAY)
+SELECT 'shopify_orders', MAX(DATE(created_at)), DATE_DIFF(@today, MAX(DATE(created_at)), DAY)
 FROM `hulken.ads_data.shopify_live_orders_clean`
 UNION ALL
-SELECT 'shopify_utm', MAX(DATE(created_at)), DATE_DIFF(CURRENT_DATE(), MAX(DATE(created_at)), DAY)
+SELECT 'shopify_utm', MAX(DATE(created_at)), DATE_DIFF(@today, MAX(DATE(created_at)), DAY)
 FROM `hulken.ads_data.shopify_utm`
 ORDER BY source""",
 
@@ -217,13 +510,29 @@ ORDER BY source""",
   SUM(metrics_impressions) AS impressions,
   SUM(metrics_clicks) AS clicks
 FROM `hulken.google_Ads.ads_CampaignBasicStats_4354001000`
-WHERE _DATA_DATE >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+WHERE _DATA_DATE >= DATE_SUB(@today, INTERVAL 7 DAY)
 GROUP BY date ORDER BY date DESC""",
+
+        "GA4 Daily Traffic (rollup)": """SELECT event_date, dataset, source, sessions, users, purchases, revenue
+FROM `hulken.ads_data.ga4_daily_rollup`
+WHERE event_date >= DATE_SUB(@today, INTERVAL 30 DAY)
+ORDER BY event_date DESC, dataset""",
     }
 
     for name, sql in quick_queries.items():
         with st.expander(name):
             st.code(sql, language="sql")
+            if st.button("Run", key=f"quick_{name}"):
+                try:
+                    # Shared on-disk cache: reused by every session until a source table changes
+                    quick_df, hit = result_cache.cached_query(client, sql, budget=get_budget())
+                    st.caption("Served from the shared cache (0 bytes billed)" if hit
+                               else f"Ran: ~{format_bytes(get_budget().history[-1]['estimated_bytes'])} scanned")
+                    st.dataframe(quick_df, use_container_width=True)
+                except BudgetExceeded as e:
+                    st.error(f"Query blocked: {e}")
+                except Exception as e:
+                    st.error(f"Query Error: {e}")
 
 # ============================================================
 # TAB 4 - Overview (all tables summary)
@@ -233,6 +542,9 @@ with tab_overview:
 
     @st.cache_data(ttl=300)
     def get_overview(dataset_id):
+        catalog_df = table_catalog.overview(dataset_id)
+        if not catalog_df.empty:
+            return catalog_df
         query = f"""
         SELECT table_name,
                row_count,
@@ -241,7 +553,7 @@ with tab_overview:
         FROM `hulken.{dataset_id}.__TABLES__`
         ORDER BY row_count DESC
         """
-        return client.query(query).to_dataframe()
+        return result_cache.cached_query(client, query)[0]
 
     try:
         overview_df = get_overview(selected_dataset)
@@ -20,6 +20,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from google.cloud import bigquery
 
+from bq_client import get_client
+
 load_dotenv()
 
 # Configuration
@@ -64,7 +66,7 @@ PII_COLUMNS = {
 
 class PIIAnonymizer:
     def __init__(self):
-        self.client = bigquery.Client(project=BQ_PROJECT)
+        self.client = get_client(BQ_PROJECT)
         self.report = {
             "timestamp": datetime.now().isoformat(),
             "tables_checked": [],
@@ -30,6 +30,12 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 from google.cloud import bigquery
 
+# Shared query helpers live in data_validation/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from query_builder import run_query
+from config import GA4
+from ga4_events import latest_shards, rollup as ga4_rollup
+
 # Load env from data_validation/.env
 env_path = Path(__file__).parent / '.env'
 load_dotenv(env_path)
@@ -103,8 +109,8 @@ class ReconciliationCheck:
         print(str(r))
         return r
 
-    def query(self, sql):
-        return list(self.bq.query(sql).result())
+    def query(self, sql, params=None):
+        return list(run_query(self.bq, sql, params).result())
 
     # ============================================================
     # CHECK 1: DATA FRESHNESS
@@ -433,19 +439,23 @@ class ReconciliationCheck:
     def check_continuity(self):
         print("\n=== TEMPORAL CONTINUITY (last 30 days) ===")
 
+        # Window resolved here (not with CURRENT_DATE()) so the queries are cacheable
+        today = datetime.utcnow().date()
+        window = {'start_date': today - timedelta(days=30), 'end_date': today - timedelta(days=1)}
+
         continuity_checks = [
             {
                 'name': 'Shopify orders',
                 'sql': f"""
                     WITH dates AS (
                       SELECT date FROM UNNEST(GENERATE_DATE_ARRAY(
-                        DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY), DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+                        @start_date, @end_date
                       )) AS date
                     ),
                     data_dates AS (
                       SELECT DATE(created_at) AS d, COUNT(*) AS cnt
                       FROM `{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean`
-                      WHERE DATE(created_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+                      WHERE DATE(created_at) >= @start_date
                       GROUP BY d
                     )
                     SELECT d.date FROM dates d LEFT JOIN data_dates o ON d.date = o.d
@@ -460,13 +470,13 @@ class ReconciliationCheck:
                 'sql': f"""
                     WITH dates AS (
                       SELECT date FROM UNNEST(GENERATE_DATE_ARRAY(
-                        DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY), DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+                        @start_date, @end_date
                       )) AS date
                     ),
                     data_dates AS (
                       SELECT date_start AS d, COUNT(*) AS cnt
                       FROM `{BQ_PROJECT}.{BQ_DATASET}.facebook_insights`
-                      WHERE date_start >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+                      WHERE date_start >= @start_date
                       GROUP BY d
                     )
                     SELECT d.date FROM dates d LEFT JOIN data_dates f ON d.date = f.d
@@ -481,13 +491,13 @@ class ReconciliationCheck:
                 'sql': f"""
                     WITH dates AS (
                       SELECT date FROM UNNEST(GENERATE_DATE_ARRAY(
-                        DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY), DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+                        @start_date, @end_date
                       )) AS date
                     ),
                     data_dates AS (
                       SELECT report_date AS d, COUNT(*) AS cnt
                       FROM `{BQ_PROJECT}.{BQ_DATASET}.tiktok_ads_reports_daily`
-                      WHERE report_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+                      WHERE report_date >= @start_date
                       GROUP BY d
                     )
                     SELECT d.date FROM dates d LEFT JOIN data_dates t ON d.date = t.d
@@ -501,7 +511,7 @@ class ReconciliationCheck:
 
         for check in continuity_checks:
             try:
-                missing = self.query(check['sql'])
+                missing = self.query(check['sql'], window)
                 if len(missing) == 0:
                     self.add(f"Continuity: {check['name']}", "PASS", "No missing days in last 30 days")
                 else:
@@ -683,24 +693,23 @@ class ReconciliationCheck:
     # ============================================================
     def check_ga4(self):
         print("\n=== GOOGLE ANALYTICS 4 ===")
-        ga4_datasets = [
-            ('analytics_334792038', 'EU'),
-            ('analytics_454869667', 'US'),
-            ('analytics_454871405', 'CA'),
-        ]
-        for dataset, region in ga4_datasets:
+        # Shard list (free) + per-day rollup (refreshed by the scheduled ga4_events.py):
+        # no scan of the events_* shards themselves
+        for dataset, region in GA4['datasets'].items():
             try:
-                sql = f"""
-                SELECT MAX(REGEXP_EXTRACT(table_id, r'events_(\\d{{8}})')) AS latest_daily,
-                  (SELECT MAX(REGEXP_EXTRACT(table_id, r'events_intraday_(\\d{{8}})'))
-                   FROM `{BQ_PROJECT}.{dataset}.__TABLES__` WHERE table_id LIKE '%intraday%') AS latest_intraday
-                FROM `{BQ_PROJECT}.{dataset}.__TABLES__`
-                WHERE table_id LIKE 'events_%' AND table_id NOT LIKE '%intraday%'
-                """
-                row = self.query(sql)[0]
+                latest = latest_shards(self.bq, dataset, BQ_PROJECT)
+                traffic = ""
+                if latest['daily']:
+                    days = ga4_rollup(self.bq, latest['daily'], latest['daily'], [dataset])
+                    if days:
+                        d = days[0]
+                        traffic = (f" | {d.event_date}: {d.sessions:,} sessions, "
+                                   f"{d.purchases:,} purchases, ${d.revenue:,.0f}")
+                    else:
+                        traffic = " | not rolled up yet (python ga4_events.py)"
                 # GA4 is normally J-1 or J-2, no diagnosis needed
                 self.add(f"GA4 {region} ({dataset})", "PASS",
-                         f"Daily: {row.latest_daily}, Intraday: {row.latest_intraday}")
+                         f"Daily: {latest['daily']}, Intraday: {latest['intraday']}{traffic}")
             except Exception as e:
                 self.add(f"GA4 {region}", "ERROR", str(e),
                          diagnosis={
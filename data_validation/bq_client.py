@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+BIGQUERY CLIENT FACTORY
+=======================
+One shared, lazily constructed BigQuery client per (project, location) for
+the whole process, instead of a new bigquery.Client(...) in every module.
+
+- Thread-safe construction (checks running in parallel share one client)
+- HTTP connection pool sized for concurrent jobs (BQ_HTTP_POOL_SIZE, default 32)
+- Every query job is timed and recorded in a process-wide metrics registry
+  (latency, bytes processed/billed, slot-ms, cache hits, errors) when its
+  caller sees it finish (when_done): no extra thread polls the job
+
+Usage:
+    from bq_client import get_client, METRICS
+
+    client = get_client("hulken")
+    client.query("SELECT 1").result()
+    METRICS.print_summary()
+
+Scripts outside data_validation/ add it to sys.path first:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data_validation'))
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+from google.cloud import bigquery
+
+HTTP_POOL_SIZE = int(os.getenv('BQ_HTTP_POOL_SIZE', '32'))
+
+
+# ============================================================
+# METRICS REGISTRY
+# ============================================================
+class BigQueryMetrics:
+    """Process-wide, thread-safe registry of finished query jobs."""
+
+    def __init__(self, max_jobs=1000):
+        self.lock = threading.Lock()
+        self.jobs = deque(maxlen=max_jobs)  # most recent jobs only
+        self.listeners = []  # listener(entry) called for every recorded job
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.jobs.clear()
+            self.totals = {
+                "jobs": 0,
+                "errors": 0,
+                "cache_hits": 0,
+                "latency_s": 0.0,
+                "bytes_processed": 0,
+                "bytes_billed": 0,
+                "slot_ms": 0,
+            }
+
+    def record(self, job, latency_s):
+        """Record a finished job and its latency (created -> ended)."""
+        entry = {
+            "job_id": job.job_id,
+            "latency_s": round(latency_s, 3),
+            "error": (job.error_result or {}).get("message") if job.error_result else None,
+            "cache_hit": bool(getattr(job, "cache_hit", False)),
+            "bytes_processed": getattr(job, "total_bytes_processed", None) or 0,
+            "bytes_billed": getattr(job, "total_bytes_billed", None) or 0,
+            "slot_ms": getattr(job, "slot_millis", None) or 0,
+        }
+        with self.lock:
+            self.jobs.append(entry)
+            t = self.totals
+            t["jobs"] += 1
+            t["errors"] += 1 if entry["error"] else 0
+            t["cache_hits"] += 1 if entry["cache_hit"] else 0
+            t["latency_s"] += latency_s
+            t["bytes_processed"] += entry["bytes_processed"]
+            t["bytes_billed"] += entry["bytes_billed"]
+            t["slot_ms"] += entry["slot_ms"]
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(entry)
+
+    def snapshot(self):
+        """Copy of the totals (safe to read while jobs are running)."""
+        with self.lock:
+            return dict(self.totals)
+
+    def summary_line(self):
+        """One-line summary of every job recorded so far, or None if there is none."""
+        t = self.snapshot()
+        if not t["jobs"]:
+            return None
+        avg = t["latency_s"] / t["jobs"]
+        return (f"BigQuery: {t['jobs']} job(s), {t['bytes_billed'] / 1e9:.3f} GB billed, "
+                f"{t['cache_hits']} cache hit(s), {t['errors']} error(s), avg latency {avg:.1f}s")
+
+    def print_summary(self):
+        line = self.summary_line()
+        if line:
+            print(line)
+
+
+METRICS = BigQueryMetrics()
+
+
+# ============================================================
+# CLIENT FACTORY
+# ============================================================
+def when_done(job, callback):
+    """
+    Call callback(job) once, the first time the job is seen DONE by its
+    caller: result() (also behind to_dataframe/to_arrow), done() or reload()
+    (the explorer's and BigQueryExecutor's poll loops). Unlike
+    job.add_done_callback, no background thread polls the job alongside them.
+    """
+    lock = threading.Lock()
+    fired = []
+
+    def fire():
+        with lock:
+            if fired:
+                return
+            fired.append(True)
+        callback(job)
+
+    def hook(method):
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if job.state == "DONE":
+                    fire()
+        return wrapper
+
+    for name in ("result", "done", "reload"):
+        setattr(job, name, hook(getattr(job, name)))
+    return job
+
+
+class InstrumentedClient(bigquery.Client):
+    """bigquery.Client recording every query job into METRICS once it is done."""
+
+    def query(self, *args, **kwargs):
+        started = time.monotonic()
+        job = super().query(*args, **kwargs)
+        if job.dry_run:
+            return job  # pre-flight estimate, nothing billed
+
+        def record(j):
+            # Server-side timestamps: the job may be seen DONE a poll interval late
+            latency = ((j.ended - j.created).total_seconds() if j.ended and j.created
+                       else time.monotonic() - started)
+            METRICS.record(j, latency)
+        return when_done(job, record)
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _tune_http_pool(client, pool_size):
+    """Resize the client's HTTP connection pool so concurrent jobs don't queue on connections."""
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+    try:
+        client._http.mount("https://", adapter)
+    except AttributeError as e:
+        # client._http is not a requests Session (private attribute, custom transport)
+        print(f"bq_client: HTTP pool not resized, keeping the library default ({e})", file=sys.stderr)
+
+
+def get_client(project=None, location=None):
+    """Return the process-wide BigQuery client for a project, creating it on first use."""
+    project = project or os.getenv('BIGQUERY_PROJECT', 'hulken')
+    key = (project, location)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = InstrumentedClient(project=project, location=location)
+                _tune_http_pool(client, HTTP_POOL_SIZE)
+                _clients[key] = client
+    return client
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+COLUMN PROFILER - Per-day statistics of every column, one scan per table
+========================================================================
+Generates a single aggregate query over a table that computes, per day and
+for every top-level scalar column:
+- null count
+- approximate distinct count (APPROX_COUNT_DISTINCT)
+- min / max (as strings; not for PII columns, PROFILING["pii_columns"])
+- top-K values (APPROX_TOP_COUNT; not for FLOAT/TIMESTAMP or PII columns)
+- string length quantiles (min, p25, median, p75, max)
+- values matching the column's format rule (PROFILING["format_rules"])
+
+Profiles are stored per (table, day, column) in PROFILING["table"]; days
+already profiled are only recomputed when they are within REFRESH_DAYS of
+today (late rows). Format and consistency checks (soc_checks.py) only read
+the stored profiles (load_profiles, profile_gaps); the refresh is a scheduled
+`python column_profiler.py`, never part of a check.
+
+Usage:
+    python column_profiler.py            # profile every platform table, last 7 days (scheduled daily)
+
+    from column_profiler import refresh_profiles, load_profiles
+    refresh_profiles(client, table, "createdAt", days)
+    profiles = load_profiles(client, table, start_date, end_date)
+"""
+
+import re
+import sys
+from datetime import timedelta
+
+from google.cloud import bigquery
+
+from config import PROFILING, PLATFORMS, TABLES, BQ_PROJECT
+from query_builder import as_date, hours_since, now_params, run_query
+
+SCALAR_TYPES = {"STRING", "INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC", "BIGNUMERIC",
+                "BOOLEAN", "BOOL", "DATE", "DATETIME", "TIMESTAMP", "TIME"}
+NO_TOP_VALUES = {"FLOAT", "FLOAT64", "TIMESTAMP", "DATETIME", "TIME"}
+NUMERIC_TYPES = {"INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC", "BIGNUMERIC"}
+REFRESH_DAYS = 1  # yesterday is re-profiled on every run (late rows)
+
+
+class StaleProfiles(Exception):
+    """Stored profiles do not cover the requested days (the scheduled refresh did not run)."""
+
+
+PROFILE_SCHEMA = [
+    bigquery.SchemaField("table_id", "STRING"),
+    bigquery.SchemaField("profile_date", "DATE"),
+    bigquery.SchemaField("column_name", "STRING"),
+    bigquery.SchemaField("data_type", "STRING"),
+    bigquery.SchemaField("row_count", "INT64"),
+    bigquery.SchemaField("null_count", "INT64"),
+    bigquery.SchemaField("approx_distinct", "INT64"),
+    bigquery.SchemaField("min_value", "STRING"),
+    bigquery.SchemaField("max_value", "STRING"),
+    bigquery.SchemaField("top_values", "RECORD", mode="REPEATED", fields=[
+        bigquery.SchemaField("value", "STRING"),
+        bigquery.SchemaField("count", "INT64"),
+    ]),
+    bigquery.SchemaField("length_quantiles", "INT64", mode="REPEATED"),
+    bigquery.SchemaField("format_rule", "STRING"),
+    bigquery.SchemaField("format_matches", "INT64"),
+    bigquery.SchemaField("profiled_at", "TIMESTAMP"),
+]
+
+
+def format_rule(column_name, data_type):
+    """(rule name, value regex) applying to a column, or (None, None)."""
+    if data_type != "STRING":
+        return None, None
+    for name, (column_pattern, value_pattern) in PROFILING["format_rules"].items():
+        if re.search(column_pattern, column_name):
+            return name, value_pattern
+    return None, None
+
+
+# ============================================================
+# PROFILE QUERY
+# ============================================================
+def profiled_columns(client, table):
+    """[(name, type)] of the table's top-level scalar columns."""
+    return [(f.name, f.field_type) for f in client.get_table(table).schema
+            if f.field_type in SCALAR_TYPES and f.mode != "REPEATED"]
+
+
+def profile_sql(table, date_field, columns):
+    """One aggregate query profiling every column for each day in @days."""
+    exprs = []
+    for i, (name, data_type) in enumerate(columns):
+        col = f"`{name}`"
+        pii = re.search(PROFILING["pii_columns"], name)
+        exprs += [
+            f"COUNTIF({col} IS NULL) AS c{i}_nulls",
+            f"APPROX_COUNT_DISTINCT({col}) AS c{i}_distinct",
+            # PII columns: statistics only, never values
+            f"CAST(MIN({col}) AS STRING) AS c{i}_min" if not pii else f"CAST(NULL AS STRING) AS c{i}_min",
+            f"CAST(MAX({col}) AS STRING) AS c{i}_max" if not pii else f"CAST(NULL AS STRING) AS c{i}_max",
+        ]
+        if data_type not in NO_TOP_VALUES and not pii:
+            exprs.append(f"APPROX_TOP_COUNT(CAST({col} AS STRING), {PROFILING['top_k']}) AS c{i}_top")
+        if data_type == "STRING":
+            exprs.append(f"APPROX_QUANTILES(LENGTH({col}), 4) AS c{i}_lengths")
+        rule, pattern = format_rule(name, data_type)
+        if rule:
+            exprs.append(f"COUNTIF(REGEXP_CONTAINS({col}, r'{pattern}')) AS c{i}_matches")
+    return (f"SELECT DATE({date_field}) AS profile_date, COUNT(*) AS row_count,\n  "
+            + ",\n  ".join(exprs)
+            + f"\nFROM `{table}`\nWHERE DATE({date_field}) IN UNNEST(@days)\nGROUP BY profile_date")
+
+
+def _profile_rows(table, columns, row, profiled_at):
+    """Reshape one day of the wide profile row into one record per column."""
+    records = []
+    for i, (name, data_type) in enumerate(columns):
+        rule, _ = format_rule(name, data_type)
+        top = row.get(f"c{i}_top") or []
+        records.append({
+            "table_id": table,
+            "profile_date": row["profile_date"].isoformat(),
+            "column_name": name,
+            "data_type": data_type,
+            "row_count": row["row_count"],
+            "null_count": row[f"c{i}_nulls"],
+            "approx_distinct": row[f"c{i}_distinct"],
+            "min_value": row[f"c{i}_min"],
+            "max_value": row[f"c{i}_max"],
+            "top_values": [{"value": t["value"], "count": t["count"]} for t in top],
+            "length_quantiles": list(row.get(f"c{i}_lengths") or []),
+            "format_rule": rule,
+            "format_matches": row.get(f"c{i}_matches"),
+            "profiled_at": profiled_at.isoformat(),
+        })
+    return records
+
+
+# ============================================================
+# STORAGE
+# ============================================================
+def create_profile_table(client):
+    table = bigquery.Table(PROFILING["table"], schema=PROFILE_SCHEMA)
+    table.time_partitioning = bigquery.TimePartitioning(field="profile_date")
+    table.clustering_fields = ["table_id", "column_name"]
+    client.create_table(table, exists_ok=True)
+
+
+def profiled_days(client, table):
+    """Days already profiled for a table."""
+    sql = f"SELECT DISTINCT profile_date FROM `{PROFILING['table']}` WHERE table_id = @table_id"
+    return {row.profile_date for row in run_query(client, sql, {"table_id": table}).result()}
+
+
+def refresh_profiles(client, table, date_field, days=None, budget=None):
+    """
+    Profile the days of `days` (default: the last PROFILING["days"] complete
+    days) not profiled yet, plus the most recent ones. Returns the days profiled.
+    """
+    today = now_params()['today']
+    days = [as_date(d) for d in days] if days else \
+        [today - timedelta(days=i) for i in range(1, PROFILING["days"] + 1)]
+    create_profile_table(client)
+    done = profiled_days(client, table)
+    recent = {today - timedelta(days=i) for i in range(REFRESH_DAYS + 1)}
+    todo = sorted(d for d in days if d not in done or d in recent)
+    if not todo:
+        return []
+
+    columns = profiled_columns(client, table)
+    sql = profile_sql(table, date_field, columns)
+    params = {"days": todo}
+    job = budget.run_query(client, sql, params) if budget else run_query(client, sql, params)
+    profiled_at = now_params(granularity='minute')['now']
+    records = []
+    for row in job.result():
+        records += _profile_rows(table, columns, dict(row.items()), profiled_at)
+
+    # Replace the days in one delete + one load job (no streaming buffer, DML stays possible)
+    run_query(client, f"DELETE FROM `{PROFILING['table']}` WHERE table_id = @table_id AND profile_date IN UNNEST(@days)",
+              {"table_id": table, "days": todo}).result()
+    if records:
+        config = bigquery.LoadJobConfig(schema=PROFILE_SCHEMA, write_disposition="WRITE_APPEND")
+        client.load_table_from_json(records, PROFILING["table"], job_config=config).result()
+    return todo
+
+
+def load_profiles(client, table, start_date, end_date, columns=None):
+    """Stored profile rows of a table between two dates (optionally some columns only)."""
+    sql = f"""
+    SELECT * FROM `{PROFILING['table']}`
+    WHERE table_id = @table_id AND profile_date BETWEEN @start_date AND @end_date
+    """
+    params = {"table_id": table, "start_date": as_date(start_date), "end_date": as_date(end_date)}
+    if columns:
+        sql += " AND column_name IN UNNEST(@columns)"
+        params["columns"] = list(columns)
+    return list(run_query(client, sql + " ORDER BY column_name, profile_date", params).result())
+
+
+def profile_gaps(profiles, start_date, end_date):
+    """
+    Why stored profile rows do not cover [start_date, end_date], or None:
+    days never profiled, or recent days (within REFRESH_DAYS of today) last
+    profiled more than PROFILING["max_age_hours"] ago (scheduled refresh missed).
+    """
+    start, end = as_date(start_date), as_date(end_date)
+    profiled = {p.profile_date for p in profiles}
+    missing = [start + timedelta(days=i) for i in range((end - start).days + 1)
+               if start + timedelta(days=i) not in profiled]
+    if missing:
+        return f"no profile for {len(missing)} day(s) ({missing[0]} -> {missing[-1]})"
+    recent = now_params()['today'] - timedelta(days=REFRESH_DAYS)
+    ages = [hours_since(p.profiled_at) for p in profiles if p.profile_date >= recent]
+    if ages and min(ages) > PROFILING["max_age_hours"]:
+        return f"recent days profiled {min(ages)}h ago"
+    return None
+
+
+# ============================================================
+# AGGREGATION OVER DAYS
+# ============================================================
+def _order_key(data_type, value):
+    """min/max are stored as strings: compare numbers as numbers."""
+    return float(value) if data_type in NUMERIC_TYPES else value
+
+
+def summarize(profiles):
+    """
+    Combine daily profile rows per column: {column: {data_type, rows, nulls,
+    null_rate_pct, format_rule, conformance_pct, min, max, values}}.
+    values merges the top-K counts of every day.
+    """
+    summary = {}
+    for p in profiles:
+        s = summary.setdefault(p.column_name, {
+            "data_type": p.data_type, "rows": 0, "nulls": 0, "format_rule": p.format_rule,
+            "matches": 0, "min": None, "max": None, "values": {}, "days": 0,
+        })
+        s["days"] += 1
+        s["rows"] += p.row_count or 0
+        s["nulls"] += p.null_count or 0
+        s["matches"] += p.format_matches or 0
+        key = lambda v: _order_key(p.data_type, v)
+        if p.min_value is not None and (s["min"] is None or key(p.min_value) < key(s["min"])):
+            s["min"] = p.min_value
+        if p.max_value is not None and (s["max"] is None or key(p.max_value) > key(s["max"])):
+            s["max"] = p.max_value
+        for t in p.top_values or []:
+            if t["value"] is None:
+                continue  # NULLs are counted in null_count
+            s["values"][t["value"]] = s["values"].get(t["value"], 0) + t["count"]
+    for s in summary.values():
+        non_null = s["rows"] - s["nulls"]
+        s["null_rate_pct"] = round(s["nulls"] / s["rows"] * 100, 2) if s["rows"] else 0.0
+        s["conformance_pct"] = round(s["matches"] / non_null * 100, 2) if s["format_rule"] and non_null else None
+    return summary
+
+
+def main(argv=None):
+    from bq_client import get_client
+    client = get_client(BQ_PROJECT)
+    for platform, config in PLATFORMS.items():
+        if not config.get("enabled", True):
+            continue
+        table = TABLES[config["tables"][0]]
+        days = refresh_profiles(client, table, config["date_field"])
+        print(f"{table}: {len(days)} day(s) profiled")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
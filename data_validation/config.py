@@ -34,7 +34,7 @@ THRESHOLDS = {
         "critical": 6,  # > 6 hours
     },
 
-    # Duplicate rate
+    # Duplicate rate: extra rows (rows - distinct keys) / rows
     "duplicate_rate": {
         "warning": 0.1,  # > 0.1% duplicates
         "critical": 1.0, # > 1% duplicates
@@ -45,6 +45,27 @@ THRESHOLDS = {
         "warning": 1.0,   # > 1% difference
         "critical": 5.0,  # > 5% difference
     },
+
+    # Child rows whose foreign key has no parent row (REFERENTIAL_INTEGRITY)
+    "orphan_rate": {
+        "warning": 0.1,  # > 0.1% orphans
+        "critical": 1.0, # > 1% orphans
+    },
+
+    # Share of non-null values matching their format rule (PROFILING["format_rules"])
+    "format_conformance": {
+        "warning": 99.0,   # < 99% conforming
+        "critical": 95.0,  # < 95% conforming
+    },
+}
+
+# Approximate mode (soc_checks --approximate): null rate, price median and duplicate
+# checks run on a TABLESAMPLE and only rescan the full table when the
+# confidence interval of the sampled result contains a threshold above.
+APPROXIMATE_MODE = {
+    "sample_percent": 10,   # TABLESAMPLE SYSTEM (10 PERCENT)
+    "z": 1.96,              # 95% confidence intervals
+    "design_effect": 2.0,   # variance inflation: SYSTEM samples storage blocks, not rows
 }
 
 # ============================================================
@@ -62,6 +83,122 @@ TABLES = {
     "tiktok_ads": f"{BQ_PROJECT}.{BQ_DATASET}.tiktok_ads_reports_daily",
 }
 
+# Daily HyperLogLog sketches of primary keys (duplicate detection without rescanning raw rows),
+# refreshed by a scheduled `soc_checks.py --refresh-sketches`
+DUPLICATE_SKETCHES = {
+    "enabled": True,
+    "table": f"{BQ_PROJECT}.{BQ_DATASET}.soc_key_sketches",
+    "precision": 24,  # HLL++ precision: relative error ~1.04/sqrt(2^24) = 0.025%
+    "max_age_hours": 26,  # older sketches (daily refresh missed): exact scan instead
+}
+
+# Foreign keys checked by soc_checks.check_referential_integrity (one anti-join script).
+# Keys are SQL expressions normalised to the numeric Shopify order id, as in
+# sql/create_unified_tables.sql. Child rows are restricted to the last `days`
+# days, minus `grace_hours` (children can land before their order is synced).
+REFERENTIAL_INTEGRITY = {
+    "days": 7,
+    "grace_hours": 6,
+    "sample_size": 10,  # orphan keys reported per relationship
+    "relationships": [
+        {
+            "platform": "shopify",
+            "name": "line items -> orders",
+            "child": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_line_items",
+            "child_key": r"CAST(REGEXP_EXTRACT(order_id, r'(\d+)') AS INT64)",
+            "child_date": "_airbyte_extracted_at",
+            "parent": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean",
+            "parent_key": r"CAST(REGEXP_EXTRACT(admin_graphql_api_id, r'(\d+)') AS INT64)",
+        },
+        {
+            "platform": "shopify",
+            "name": "transactions -> orders",
+            "child": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_live_transactions",
+            "child_key": "SAFE_CAST(order_id AS INT64)",
+            "child_date": "created_at",
+            "parent": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean",
+            "parent_key": r"CAST(REGEXP_EXTRACT(admin_graphql_api_id, r'(\d+)') AS INT64)",
+        },
+        {
+            "platform": "shopify",
+            "name": "utm -> orders",
+            "child": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_utm",
+            "child_key": r"CAST(REGEXP_EXTRACT(order_id, r'(\d+)') AS INT64)",
+            "child_date": "created_at",
+            "parent": f"{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean",
+            "parent_key": r"CAST(REGEXP_EXTRACT(admin_graphql_api_id, r'(\d+)') AS INT64)",
+        },
+    ],
+}
+
+# Daily column profiles (column_profiler.py): one scan per table computes every
+# column's statistics, format/consistency checks read the stored profiles
+PROFILING = {
+    "table": f"{BQ_PROJECT}.{BQ_DATASET}.column_profiles",
+    "days": 7,     # default window of the profile-based checks
+    "max_age_hours": 26,  # recent profiles older than this (daily refresh missed): checks warn
+    "top_k": 10,   # most frequent values kept per column
+    "pii_columns": r"(?i)(email|phone|name|address|hash|(^|_)ip($|_))",  # no min/max/top values stored
+    # rule -> (column name pattern, value pattern); first matching rule applies to a STRING column
+    "format_rules": {
+        "currency": (r"(?i)currency", r"^[A-Z]{3}$"),
+        "iso_date": (r"(?i)(^|_)date$", r"^\d{4}-\d{2}-\d{2}"),
+        "sha256": (r"(?i)hash", r"^[0-9a-f]{64}$"),
+        "email": (r"(?i)^e?mail$", r"^[^@\s]+@[^@\s]+\.[^@\s]+$"),
+        "id": (r"(?i)(^id$|_id$|[a-z]Id$)", r"^(gid://shopify/\w+/)?\d+$"),
+    },
+}
+
+# GA4 exports (sharded events_YYYYMMDD / events_intraday_YYYYMMDD tables, ga4_events.py)
+GA4 = {
+    "datasets": {
+        "analytics_334792038": "EU",
+        "analytics_454869667": "US",
+        "analytics_454871405": "CA",
+    },
+    "rollup_table": f"{BQ_PROJECT}.{BQ_DATASET}.ga4_daily_rollup",
+    "refresh_days": 3,     # GA4 rewrites daily shards up to 72h after the day
+    "backfill_days": 90,   # first rollup run
+}
+
+# Recent days mirrored as local Parquet for the explorer's DuckDB backend (local_mirror.py)
+LOCAL_MIRROR = {
+    "days": 30,          # mirror window
+    "refresh_days": 2,   # most recent days re-exported on every sync (late rows)
+    "tables": {          # table -> date column used to partition the mirror
+        f"{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean": "created_at",
+        f"{BQ_PROJECT}.{BQ_DATASET}.facebook_insights": "date_start",
+        f"{BQ_PROJECT}.{BQ_DATASET}.shopify_utm": "created_at",
+    },
+}
+
+# ============================================================
+# QUERY BUDGETS (bytes scanned, checked by dry-run before each query)
+# ============================================================
+
+GB = 1024 ** 3
+
+QUERY_BUDGETS = {
+    # max_bytes_per_query: maximum_bytes_billed of every job (BigQuery refuses above it)
+    # run_budget: cumulative bytes for one run (one session for the explorer)
+    # on_exceed: "abort" (raise) or "sample" (TABLESAMPLE the query down to fit)
+    "soc_checks": {
+        "max_bytes_per_query": 20 * GB,
+        "run_budget": 100 * GB,
+        "on_exceed": "sample",
+    },
+    "live_reconciliation": {
+        "max_bytes_per_query": 5 * GB,
+        "run_budget": 20 * GB,
+        "on_exceed": "abort",
+    },
+    "data_explorer": {
+        "max_bytes_per_query": 10 * GB,
+        "run_budget": 50 * GB,
+        "on_exceed": "sample",  # only when the user ticks "Run on a table sample"
+    },
+}
+
 # ============================================================
 # PLATFORMS CONFIGURATION
 # ============================================================
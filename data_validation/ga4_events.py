@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+GA4 EVENTS - Date-bounded access to the sharded GA4 exports
+===========================================================
+GA4 writes one table per day (events_YYYYMMDD) plus intraday tables
+(events_intraday_YYYYMMDD) for the days not exported yet. A query on
+`events_*` without a _TABLE_SUFFIX filter reads every shard.
+
+- events_sql(): wildcard query with strict _TABLE_SUFFIX bounds. The bounds
+  are literals (digits only), so BigQuery prunes shards at planning time and
+  the dry run reports the real size. Intraday shards are read only for the
+  days after the latest daily shard, so no day is counted twice.
+- latest_shards(): latest daily / intraday day from the table list (free).
+- refresh_rollup(): per-day sessions, users, purchases and revenue of each
+  dataset persisted in GA4["rollup_table"]. Only days without a rollup, days
+  rolled up from intraday data and the last GA4["refresh_days"] days are
+  recomputed by the scheduled `python ga4_events.py`; freshness and traffic
+  checks only read the rollup (kilobytes), they never refresh it.
+
+Usage:
+    python ga4_events.py                 # refresh the rollup of every GA4 dataset (scheduled daily)
+
+    from ga4_events import events_sql
+    sql = events_sql("analytics_334792038", "event_name, COUNT(*) AS n", "2026-02-01", "2026-02-07",
+                     group_by="event_name")
+"""
+
+import re
+import sys
+from datetime import timedelta
+
+from config import BQ_PROJECT, GA4
+from query_builder import as_date, now_params, run_query
+
+SHARD_RE = re.compile(r"^events_(intraday_)?(\d{8})$")
+
+ROLLUP_SELECT = """
+    PARSE_DATE('%Y%m%d', event_date) AS event_date,
+    COUNT(DISTINCT CONCAT(user_pseudo_id, '.', CAST(
+        (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id') AS STRING))) AS sessions,
+    COUNT(DISTINCT user_pseudo_id) AS users,
+    COUNTIF(event_name = 'purchase') AS purchases,
+    ROUND(SUM(IF(event_name = 'purchase', ecommerce.purchase_revenue, 0)), 2) AS revenue,
+    COUNT(*) AS events"""
+
+
+def _suffix(day):
+    return as_date(day).strftime("%Y%m%d")
+
+
+# ============================================================
+# SHARDS
+# ============================================================
+def shard_days(client, dataset, project=BQ_PROJECT):
+    """(daily days, intraday days) present in a GA4 dataset, from the table list (not billed)."""
+    daily, intraday = set(), set()
+    for table in client.list_tables(f"{project}.{dataset}"):
+        match = SHARD_RE.match(table.table_id)
+        if match:
+            day = as_date(f"{match.group(2)[:4]}-{match.group(2)[4:6]}-{match.group(2)[6:]}")
+            (intraday if match.group(1) else daily).add(day)
+    return daily, intraday
+
+
+def latest_shards(client, dataset, project=BQ_PROJECT):
+    """{'daily': date or None, 'intraday': date or None}"""
+    daily, intraday = shard_days(client, dataset, project)
+    return {"daily": max(daily) if daily else None, "intraday": max(intraday) if intraday else None}
+
+
+def suffix_filter(start_date, end_date, latest_daily=None, include_intraday=True):
+    """
+    _TABLE_SUFFIX condition covering [start_date, end_date]: daily shards up
+    to latest_daily, intraday shards after it. latest_daily=None reads daily
+    shards for the whole range.
+    """
+    start, end = as_date(start_date), as_date(end_date)
+    daily_end = min(end, latest_daily) if latest_daily else end
+    ranges = []
+    if start <= daily_end:
+        ranges.append(f"_TABLE_SUFFIX BETWEEN '{_suffix(start)}' AND '{_suffix(daily_end)}'")
+    if include_intraday and latest_daily and end > latest_daily:
+        intraday_start = max(start, latest_daily + timedelta(days=1))
+        ranges.append(f"_TABLE_SUFFIX BETWEEN 'intraday_{_suffix(intraday_start)}' AND 'intraday_{_suffix(end)}'")
+    if not ranges:
+        return "FALSE"
+    return ranges[0] if len(ranges) == 1 else "(" + " OR ".join(ranges) + ")"
+
+
+def events_sql(dataset, select, start_date, end_date, where=None, group_by=None,
+               latest_daily=None, include_intraday=True, project=BQ_PROJECT):
+    """SELECT over `dataset.events_*` restricted to the shards of the date range."""
+    conditions = [suffix_filter(start_date, end_date, latest_daily, include_intraday)]
+    if where:
+        conditions.append(f"({where})")
+    sql = f"SELECT {select}\nFROM `{project}.{dataset}.events_*`\nWHERE " + "\n  AND ".join(conditions)
+    if group_by:
+        sql += f"\nGROUP BY {group_by}"
+    return sql
+
+
+# ============================================================
+# DAILY ROLLUP
+# ============================================================
+def create_rollup_table(client):
+    run_query(client, f"""
+        CREATE TABLE IF NOT EXISTS `{GA4["rollup_table"]}` (
+            dataset STRING,
+            event_date DATE,
+            source STRING,
+            sessions INT64,
+            users INT64,
+            purchases INT64,
+            revenue FLOAT64,
+            events INT64,
+            rolled_up_at TIMESTAMP
+        )
+        PARTITION BY event_date
+        CLUSTER BY dataset
+    """).result()
+
+
+def rollup_sources(client, dataset):
+    """{event_date: 'daily' or 'intraday'} already in the rollup for a dataset."""
+    sql = f"SELECT event_date, source FROM `{GA4['rollup_table']}` WHERE dataset = @dataset"
+    return {row.event_date: row.source for row in run_query(client, sql, {"dataset": dataset}).result()}
+
+
+def refresh_rollup(client, dataset, today=None, project=BQ_PROJECT):
+    """Recompute the rollup days of a dataset that are missing or stale. Returns the days recomputed."""
+    today = today or now_params()['today']
+    daily, intraday = shard_days(client, dataset, project)
+    existing = rollup_sources(client, dataset)
+    recent = {today - timedelta(days=i) for i in range(GA4["refresh_days"] + 1)}
+    oldest = today - timedelta(days=GA4["backfill_days"])
+
+    # daily shard wins over intraday for the same day
+    wanted = {day: "daily" for day in daily if day >= oldest}
+    wanted.update({day: "intraday" for day in intraday if day >= oldest and day not in daily})
+    days = sorted(day for day, source in wanted.items()
+                  if existing.get(day) != source or day in recent)
+    if not days:
+        return []
+
+    suffixes = [("intraday_" if wanted[day] == "intraday" else "") + _suffix(day) for day in days]
+    suffix_list = ", ".join(f"'{s}'" for s in suffixes)
+    script = f"""
+    DELETE FROM `{GA4["rollup_table"]}`
+    WHERE dataset = @dataset AND event_date IN UNNEST(@days);
+
+    INSERT INTO `{GA4["rollup_table"]}` (dataset, event_date, source, sessions, users, purchases, revenue, events, rolled_up_at)
+    SELECT @dataset, event_date, IF(STARTS_WITH(suffix, 'intraday_'), 'intraday', 'daily'),
+           sessions, users, purchases, revenue, events, @now
+    FROM (
+        SELECT _TABLE_SUFFIX AS suffix,{ROLLUP_SELECT}
+        FROM `{project}.{dataset}.events_*`
+        WHERE _TABLE_SUFFIX IN ({suffix_list})
+        GROUP BY suffix, event_date
+    );
+    """
+    run_query(client, script, {"dataset": dataset, "days": days}).result()
+    return days
+
+
+def refresh_all(client, today=None):
+    """Refresh the rollup of every GA4 dataset. Returns {dataset: days recomputed}."""
+    create_rollup_table(client)
+    return {dataset: refresh_rollup(client, dataset, today) for dataset in GA4["datasets"]}
+
+
+def rollup(client, start_date, end_date, datasets=None):
+    """Rollup rows (dataset, event_date, source, sessions, users, purchases, revenue, events) of a date range."""
+    sql = f"""
+    SELECT dataset, event_date, source, sessions, users, purchases, revenue, events
+    FROM `{GA4['rollup_table']}`
+    WHERE event_date BETWEEN @start_date AND @end_date
+      AND dataset IN UNNEST(@datasets)
+    ORDER BY dataset, event_date
+    """
+    params = {"start_date": as_date(start_date), "end_date": as_date(end_date),
+              "datasets": list(datasets or GA4["datasets"])}
+    return list(run_query(client, sql, params).result())
+
+
+def main(argv=None):
+    from bq_client import get_client
+    client = get_client(BQ_PROJECT)
+    for dataset, days in refresh_all(client).items():
+        print(f"{dataset} ({GA4['datasets'][dataset]}): {len(days)} day(s) rolled up"
+              + (f", {days[0]} -> {days[-1]}" if days else ""))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
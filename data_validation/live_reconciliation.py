@@ -16,6 +16,8 @@ Usage:
     python data_validation/live_reconciliation.py --tolerance 5
     python data_validation/live_reconciliation.py --platform shopify
     python data_validation/live_reconciliation.py --platform all
+    python data_validation/live_reconciliation.py --platform shopify --shopify-shards adaptive
+    python data_validation/live_reconciliation.py --no-history
 """
 
 import os
@@ -25,14 +27,19 @@ import time
 import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import urlencode
 
 # Fix Unicode on Windows
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
-import requests
 from dotenv import load_dotenv
-from google.cloud import bigquery
+
+from bq_client import get_client
+from query_budget import QueryBudget
+from query_builder import as_date
+from rate_limiter import ContextThreadPoolExecutor, RateLimitScheduler
+import reconciliation_history
 
 # Load env from data_validation/.env
 env_path = Path(__file__).parent / '.env'
@@ -50,6 +57,18 @@ if CREDENTIALS_PATH:
 
 TOLERANCE = 0.02  # 2% tolerance for match
 
+FB_GRAPH_URL = "https://graph.facebook.com/v18.0"
+FB_BATCH_LIMIT = 50  # Graph API max sub-requests per batch call
+
+SHOPIFY_MAX_WORKERS = 4          # concurrent shard walkers per store
+SHOPIFY_SHARD_TARGET_ORDERS = 1000  # adaptive mode: aim for ~4 pages per shard
+
+# Shared per-platform/per-account limiter fed by API usage headers
+API_SCHEDULER = RateLimitScheduler()
+
+# Dry-run pre-flight + bytes budget for the BigQuery side (config.QUERY_BUDGETS)
+BQ_BUDGET = QueryBudget.for_tool('live_reconciliation')
+
 # ANSI Colors
 class C:
     GREEN = '\033[92m'
@@ -101,6 +120,14 @@ def format_number(n):
     """Format a number with commas."""
     return f"{n:,}"
 
+def compute_diff_pct(api_val, bq_val):
+    """Percentage difference of BigQuery vs API, relative to the API value."""
+    if api_val == 0 and bq_val == 0:
+        return 0.0
+    elif api_val == 0:
+        return 100.0
+    return abs(api_val - bq_val) / api_val * 100
+
 def print_comparison_box(title, source_name, period_start, period_end, comparisons, animated=True):
     """
     Print a comparison box with source API vs BigQuery values.
@@ -125,13 +152,7 @@ def print_comparison_box(title, source_name, period_start, period_end, compariso
         api_str = formatter(api_val)
         bq_str = formatter(bq_val)
 
-        if api_val == 0 and bq_val == 0:
-            diff_pct = 0.0
-        elif api_val == 0:
-            diff_pct = 100.0
-        else:
-            diff_pct = abs(api_val - bq_val) / api_val * 100
-
+        diff_pct = compute_diff_pct(api_val, bq_val)
         is_match = diff_pct <= (TOLERANCE * 100)
         results.append(is_match)
 
@@ -156,44 +177,110 @@ def print_comparison_box(title, source_name, period_start, period_end, compariso
 # ============================================================
 # API FUNCTIONS
 # ============================================================
+def facebook_batch_request(access_token, relative_urls):
+    """
+    Send Graph API GET sub-requests packed into batch calls (max 50 per call).
+
+    relative_urls: list of relative URLs, e.g. 'act_123?fields=name'
+    Returns a list aligned with relative_urls of (http_code, body_dict).
+    Failed calls and null sub-responses map to (None, {'error': {...}}).
+    Raises RuntimeError with the API error message when the whole batch is
+    rejected (the response is an error object instead of a list), or when
+    it does not hold one response per sub-request.
+    """
+    responses = []
+    for i in range(0, len(relative_urls), FB_BATCH_LIMIT):
+        chunk = relative_urls[i:i + FB_BATCH_LIMIT]
+        batch = [{'method': 'GET', 'relative_url': url} for url in chunk]
+        try:
+            resp = API_SCHEDULER.request(
+                'facebook', 'batch', 'POST', FB_GRAPH_URL,
+                data={'access_token': access_token, 'batch': json.dumps(batch)},
+                timeout=60
+            )
+            payload = resp.json()
+        except Exception as e:
+            responses.extend([(None, {'error': {'message': f'Batch request failed: {e}'}})] * len(chunk))
+            continue
+
+        # Whole-batch failure (bad token, throttled app, ...): an error object, not a list
+        if not isinstance(payload, list):
+            error = payload.get('error', {}) if isinstance(payload, dict) else {}
+            message = error.get('message') if isinstance(error, dict) else error
+            raise RuntimeError(f"Facebook batch request failed: {message or payload}")
+        # Callers index the responses by sub-request position
+        if len(payload) != len(chunk):
+            raise RuntimeError(f"Facebook batch returned {len(payload)} response(s) "
+                               f"for {len(chunk)} sub-request(s)")
+
+        for sub in payload:
+            # Sub-requests that timed out server-side come back as null
+            if sub is None:
+                responses.append((None, {'error': {'message': 'Sub-request timed out'}}))
+                continue
+            try:
+                body = json.loads(sub.get('body') or '{}')
+            except ValueError:
+                body = {'error': {'message': 'Invalid JSON in batch sub-response'}}
+            responses.append((sub.get('code'), body))
+    return responses
+
+
+def parse_facebook_insights(data):
+    """Map an insights response body to a stats dict, or None on API error."""
+    if 'data' in data and len(data['data']) > 0:
+        row = data['data'][0]
+        return {
+            'spend': float(row.get('spend', 0)),
+            'impressions': int(row.get('impressions', 0)),
+            'clicks': int(row.get('clicks', 0)),
+        }
+    elif 'error' in data:
+        print(f"  {C.RED}  API Error: {data['error'].get('message', 'Unknown')}{C.END}")
+        return None
+    else:
+        return {'spend': 0, 'impressions': 0, 'clicks': 0}
+
+
+def get_facebook_batch_stats(account_ids, access_token, start_date, end_date):
+    """
+    Get account names and insights for all accounts through Graph API batch calls.
+
+    Returns (names, stats): names maps account_id -> name (falls back to the id),
+    stats maps account_id -> stats dict or None on API error.
+    """
+    insights_query = urlencode({
+        'time_range': json.dumps({'since': start_date, 'until': end_date}),
+        'fields': 'spend,impressions,clicks',
+        'level': 'account'
+    })
+    relative_urls = []
+    for acct_id in account_ids:
+        relative_urls.append(f"act_{acct_id}?fields=name")
+        relative_urls.append(f"act_{acct_id}/insights?{insights_query}")
+
+    responses = facebook_batch_request(access_token, relative_urls)
+
+    names = {}
+    stats = {}
+    for idx, acct_id in enumerate(account_ids):
+        _, name_body = responses[2 * idx]
+        _, insights_body = responses[2 * idx + 1]
+        names[acct_id] = name_body.get('name', str(acct_id))
+        stats[acct_id] = parse_facebook_insights(insights_body)
+    return names, stats
+
+
 def get_facebook_account_name(account_id, access_token):
     """Get Facebook account name from API."""
-    url = f"https://graph.facebook.com/v18.0/act_{account_id}"
+    url = f"{FB_GRAPH_URL}/act_{account_id}"
     params = {'access_token': access_token, 'fields': 'name'}
     try:
-        resp = requests.get(url, params=params, timeout=15)
+        resp = API_SCHEDULER.request('facebook', account_id, 'GET', url, params=params, timeout=15)
         return resp.json().get('name', account_id)
     except Exception:
         return str(account_id)
 
-def get_facebook_api_stats(account_id, access_token, start_date, end_date):
-    """Get stats from Facebook Marketing API for one account."""
-    url = f"https://graph.facebook.com/v18.0/act_{account_id}/insights"
-    params = {
-        'access_token': access_token,
-        'time_range': json.dumps({'since': start_date, 'until': end_date}),
-        'fields': 'spend,impressions,clicks',
-        'level': 'account'
-    }
-    try:
-        resp = requests.get(url, params=params, timeout=30)
-        data = resp.json()
-        if 'data' in data and len(data['data']) > 0:
-            row = data['data'][0]
-            return {
-                'spend': float(row.get('spend', 0)),
-                'impressions': int(row.get('impressions', 0)),
-                'clicks': int(row.get('clicks', 0)),
-            }
-        elif 'error' in data:
-            print(f"  {C.RED}  API Error: {data['error'].get('message', 'Unknown')}{C.END}")
-            return None
-        else:
-            return {'spend': 0, 'impressions': 0, 'clicks': 0}
-    except Exception as e:
-        print(f"  {C.RED}  Request failed: {e}{C.END}")
-        return None
-
 def get_shopify_api_order_count(store, token, start_date, end_date):
     """Get order count from Shopify REST API."""
     url = f"https://{store}.myshopify.com/admin/api/2024-01/orders/count.json"
@@ -204,7 +291,7 @@ def get_shopify_api_order_count(store, token, start_date, end_date):
         "created_at_max": f"{end_date}T23:59:59Z"
     }
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
+        resp = API_SCHEDULER.request('shopify', store, 'GET', url, headers=headers, params=params, timeout=30)
         if resp.status_code == 200:
             return {'order_count': resp.json().get('count', 0)}
         else:
@@ -215,46 +302,149 @@ def get_shopify_api_order_count(store, token, start_date, end_date):
         return None
 
 
-def get_shopify_api_revenue(store, token, start_date, end_date):
-    """Get total revenue from Shopify REST API by paginating orders."""
+SHOPIFY_TS_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _fetch_shopify_orders(store, token, created_at_min, created_at_max):
+    """
+    Page through orders created in [created_at_min, created_at_max] (both inclusive).
+
+    Returns a dict order_id -> total_price, or None on API error.
+    """
     url = f"https://{store}.myshopify.com/admin/api/2024-01/orders.json"
     headers = {"X-Shopify-Access-Token": token}
-    total_revenue = 0.0
-    total_orders = 0
+    orders_by_id = {}
     params = {
         "status": "any",
-        "created_at_min": f"{start_date}T00:00:00Z",
-        "created_at_max": f"{end_date}T23:59:59Z",
+        "created_at_min": created_at_min,
+        "created_at_max": created_at_max,
         "fields": "id,total_price",
         "limit": 250
     }
+    while url:
+        resp = API_SCHEDULER.request('shopify', store, 'GET', url, headers=headers, params=params, timeout=60)
+        if resp.status_code != 200:
+            print(f"  {C.RED}  Shopify API Error: HTTP {resp.status_code} ({created_at_min} to {created_at_max}){C.END}")
+            return None
+        for o in resp.json().get('orders', []):
+            orders_by_id[o['id']] = float(o.get('total_price', 0))
+        # Follow pagination via Link header
+        link = resp.headers.get('Link', '')
+        if 'rel="next"' in link:
+            url = link.split('>; rel="next"')[0].split('<')[-1]
+            params = None  # params are in the URL for subsequent pages
+        else:
+            url = None
+    return orders_by_id
+
+
+def _split_window(window_start, window_end, pieces):
+    """Split an inclusive second-precision window into `pieces` non-overlapping windows."""
+    total_seconds = int((window_end - window_start).total_seconds()) + 1
+    step = max(1, total_seconds // pieces)
+    windows = []
+    cursor = window_start
+    while cursor <= window_end:
+        piece_end = min(cursor + timedelta(seconds=step - 1), window_end)
+        if len(windows) == pieces - 1:
+            piece_end = window_end
+        windows.append((cursor, piece_end))
+        cursor = piece_end + timedelta(seconds=1)
+    return windows
+
+
+def shopify_time_shards(store, token, start_date, end_date, mode='day'):
+    """
+    Cut [start_date, end_date] into inclusive created_at windows.
+
+    mode='day':      one shard per calendar day (UTC).
+    mode='adaptive': per-day order counts from orders/count.json; quiet days
+                     are merged and busy days split so each shard holds
+                     roughly SHOPIFY_SHARD_TARGET_ORDERS orders.
+
+    Windows are contiguous and non-overlapping at second precision (the
+    resolution of Shopify's created_at), so no order falls in two shards.
+    Returns a list of (created_at_min, created_at_max) datetimes.
+    """
+    d_start = datetime.strptime(start_date, '%Y-%m-%d')
+    d_end = datetime.strptime(end_date, '%Y-%m-%d')
+    days = [d_start + timedelta(days=i) for i in range((d_end - d_start).days + 1)]
+    day_windows = [(d, d + timedelta(days=1, seconds=-1)) for d in days]
+
+    if mode != 'adaptive':
+        return day_windows
+
+    def count_day(day):
+        day_str = day.strftime('%Y-%m-%d')
+        data = get_shopify_api_order_count(store, token, day_str, day_str)
+        return data['order_count'] if data else None
+
+    with ContextThreadPoolExecutor(max_workers=SHOPIFY_MAX_WORKERS) as pool:
+        counts = list(pool.map(count_day, days))
+
+    # Count lookup failed: fall back to plain daily shards
+    if any(c is None for c in counts):
+        return day_windows
+
+    shards = []
+    pending_start, pending_end, pending_count = None, None, 0
+    for (w_start, w_end), count in zip(day_windows, counts):
+        if count > SHOPIFY_SHARD_TARGET_ORDERS:
+            if pending_start is not None:
+                shards.append((pending_start, pending_end))
+                pending_start, pending_count = None, 0
+            pieces = -(-count // SHOPIFY_SHARD_TARGET_ORDERS)
+            shards.extend(_split_window(w_start, w_end, pieces))
+            continue
+        if pending_start is None:
+            pending_start = w_start
+        pending_end = w_end
+        pending_count += count
+        if pending_count >= SHOPIFY_SHARD_TARGET_ORDERS:
+            shards.append((pending_start, pending_end))
+            pending_start, pending_count = None, 0
+    if pending_start is not None:
+        shards.append((pending_start, pending_end))
+    return shards
+
+
+def get_shopify_api_revenue(store, token, start_date, end_date, shard_mode='day',
+                            max_workers=SHOPIFY_MAX_WORKERS):
+    """
+    Get total revenue from Shopify REST API by paginating orders.
+
+    The date range is cut into time shards (see shopify_time_shards) which
+    are paged concurrently under the shared Shopify rate limiter. Results
+    are merged by order id so an order can never be counted twice.
+    """
     try:
-        while url:
-            resp = requests.get(url, headers=headers, params=params, timeout=60)
-            if resp.status_code != 200:
-                print(f"  {C.RED}  Shopify API Error: HTTP {resp.status_code}{C.END}")
-                break
-            orders = resp.json().get('orders', [])
-            for o in orders:
-                total_revenue += float(o.get('total_price', 0))
-                total_orders += 1
-            # Follow pagination via Link header
-            link = resp.headers.get('Link', '')
-            if 'rel="next"' in link:
-                next_url = link.split('>; rel="next"')[0].split('<')[-1]
-                url = next_url
-                params = None  # params are in the URL for subsequent pages
-            else:
-                url = None
-        return {'revenue': round(total_revenue, 2), 'order_count': total_orders}
+        shards = shopify_time_shards(store, token, start_date, end_date, shard_mode)
+        with ContextThreadPoolExecutor(max_workers=max_workers) as pool:
+            shard_results = list(pool.map(
+                lambda w: _fetch_shopify_orders(store, token,
+                                                w[0].strftime(SHOPIFY_TS_FORMAT),
+                                                w[1].strftime(SHOPIFY_TS_FORMAT)),
+                shards
+            ))
+        if any(r is None for r in shard_results):
+            return None
+        orders_by_id = {}
+        for r in shard_results:
+            orders_by_id.update(r)
+        total_revenue = sum(orders_by_id.values())
+        return {'revenue': round(total_revenue, 2), 'order_count': len(orders_by_id)}
     except Exception as e:
         print(f"  {C.RED}  Request failed: {e}{C.END}")
         return None
 
 
-def get_tiktok_api_stats(access_token, advertiser_id, start_date, end_date):
-    """Get stats from TikTok Marketing API."""
-    url = "https://business-api.tiktok.com/open_api/v1.3/report/integrated/get/"
+TIKTOK_REPORT_URL = "https://business-api.tiktok.com/open_api/v1.3/report/integrated/get/"
+TIKTOK_PAGE_SIZE = 1000
+TIKTOK_MAX_WORKERS = 4
+
+
+def _fetch_tiktok_report_page(access_token, advertiser_id, start_date, end_date, page):
+    """Fetch one page of the TikTok daily report. Returns the 'data' payload, or None on error."""
     headers = {'Access-Token': access_token}
     params = {
         "advertiser_id": advertiser_id,
@@ -264,29 +454,81 @@ def get_tiktok_api_stats(access_token, advertiser_id, start_date, end_date):
         "data_level": "AUCTION_ADVERTISER",
         "start_date": start_date,
         "end_date": end_date,
-        "page": 1,
-        "page_size": 1000
+        "page": page,
+        "page_size": TIKTOK_PAGE_SIZE
     }
+    resp = API_SCHEDULER.request('tiktok', advertiser_id, 'GET', TIKTOK_REPORT_URL,
+                                 headers=headers, params=params, timeout=30)
+    data = resp.json()
+    if data.get('code') == 0 and 'data' in data:
+        return data['data']
+    print(f"  {C.RED}  TikTok API Error ({advertiser_id}, page {page}): {data.get('message', 'Unknown')}{C.END}")
+    return None
+
+
+def _sum_tiktok_rows(rows, total):
+    """Add report rows' metrics into total (in place)."""
+    for row in rows:
+        m = row.get('metrics', {})
+        total['spend'] += float(m.get('spend', 0) or 0)
+        total['impressions'] += int(float(m.get('impressions', 0) or 0))
+        total['clicks'] += int(float(m.get('clicks', 0) or 0))
+    return total
+
+
+def get_tiktok_api_stats(access_token, advertiser_id, start_date, end_date):
+    """
+    Get stats from TikTok Marketing API for one advertiser.
+
+    Reads page_info.total_page from the first page and fetches any
+    remaining pages concurrently, so reports over 1000 rows are complete.
+    """
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        data = resp.json()
-        if data.get('code') == 0 and 'data' in data:
-            rows = data['data'].get('list', [])
-            total = {'spend': 0.0, 'impressions': 0, 'clicks': 0}
-            for row in rows:
-                m = row.get('metrics', {})
-                total['spend'] += float(m.get('spend', 0) or 0)
-                total['impressions'] += int(float(m.get('impressions', 0) or 0))
-                total['clicks'] += int(float(m.get('clicks', 0) or 0))
-            return total
-        else:
-            print(f"  {C.RED}  TikTok API Error: {data.get('message', 'Unknown')}{C.END}")
+        first = _fetch_tiktok_report_page(access_token, advertiser_id, start_date, end_date, 1)
+        if first is None:
+            return None
+        total_page = int((first.get('page_info') or {}).get('total_page', 1) or 1)
+
+        pages = [first]
+        if total_page > 1:
+            with ContextThreadPoolExecutor(max_workers=TIKTOK_MAX_WORKERS) as pool:
+                pages.extend(pool.map(
+                    lambda p: _fetch_tiktok_report_page(access_token, advertiser_id, start_date, end_date, p),
+                    range(2, total_page + 1)
+                ))
+        if any(p is None for p in pages):
             return None
+
+        total = {'spend': 0.0, 'impressions': 0, 'clicks': 0}
+        for page in pages:
+            _sum_tiktok_rows(page.get('list', []), total)
+        return total
     except Exception as e:
         print(f"  {C.RED}  Request failed: {e}{C.END}")
         return None
 
 
+def get_tiktok_multi_advertiser_stats(access_token, advertiser_ids, start_date, end_date):
+    """
+    Get stats summed across several TikTok advertisers, fetched in parallel.
+
+    Returns the same shape as get_tiktok_api_stats, or None if any
+    advertiser fails (a partial total would look like a mismatch).
+    """
+    with ContextThreadPoolExecutor(max_workers=TIKTOK_MAX_WORKERS) as pool:
+        results = list(pool.map(
+            lambda adv: get_tiktok_api_stats(access_token, adv, start_date, end_date),
+            advertiser_ids
+        ))
+    if not results or any(r is None for r in results):
+        return None
+    total = {'spend': 0.0, 'impressions': 0, 'clicks': 0}
+    for r in results:
+        for key in total:
+            total[key] += r[key]
+    return total
+
+
 # ============================================================
 # BIGQUERY FUNCTIONS
 # ============================================================
@@ -298,11 +540,12 @@ def get_bq_facebook_stats(client, account_id, start_date, end_date):
         COALESCE(SUM(impressions), 0) AS total_impressions,
         COALESCE(SUM(clicks), 0) AS total_clicks
     FROM `{BQ_PROJECT}.{BQ_DATASET}.facebook_insights`
-    WHERE date_start BETWEEN '{start_date}' AND '{end_date}'
-    AND account_id = '{account_id}'
+    WHERE date_start BETWEEN @start_date AND @end_date
+    AND account_id = @account_id
     """
+    params = {'start_date': as_date(start_date), 'end_date': as_date(end_date), 'account_id': str(account_id)}
     try:
-        row = list(client.query(sql).result())[0]
+        row = list(BQ_BUDGET.run_query(client, sql, params).result())[0]
         return {
             'spend': float(row.total_spend or 0),
             'impressions': int(row.total_impressions or 0),
@@ -320,10 +563,11 @@ def get_bq_tiktok_stats(client, start_date, end_date):
         COALESCE(SUM(impressions), 0) AS total_impressions,
         COALESCE(SUM(clicks), 0) AS total_clicks
     FROM `{BQ_PROJECT}.{BQ_DATASET}.tiktok_ads_reports_daily`
-    WHERE report_date BETWEEN '{start_date}' AND '{end_date}'
+    WHERE report_date BETWEEN @start_date AND @end_date
     """
+    params = {'start_date': as_date(start_date), 'end_date': as_date(end_date)}
     try:
-        row = list(client.query(sql).result())[0]
+        row = list(BQ_BUDGET.run_query(client, sql, params).result())[0]
         return {
             'spend': float(row.total_spend or 0),
             'impressions': int(row.total_impressions or 0),
@@ -340,10 +584,11 @@ def get_bq_shopify_stats(client, start_date, end_date):
         COUNT(*) AS order_count,
         COALESCE(ROUND(SUM(CAST(total_price AS FLOAT64)), 2), 0) AS total_revenue
     FROM `{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean`
-    WHERE DATE(created_at) BETWEEN '{start_date}' AND '{end_date}'
+    WHERE DATE(created_at) BETWEEN @start_date AND @end_date
     """
+    params = {'start_date': as_date(start_date), 'end_date': as_date(end_date)}
     try:
-        row = list(client.query(sql).result())[0]
+        row = list(BQ_BUDGET.run_query(client, sql, params).result())[0]
         return {
             'order_count': int(row.order_count or 0),
             'revenue': float(row.total_revenue or 0),
@@ -373,13 +618,17 @@ def get_bq_data_freshness(client, platform):
     else:
         return None
     try:
-        row = list(client.query(sql).result())[0]
+        row = list(BQ_BUDGET.run_query(client, sql).result())[0]
         return row.last_sync
     except Exception:
         return None
 
 
-def main():
+def main(argv=None, bq_client=None):
+    """
+    Run the reconciliation. argv defaults to sys.argv; bq_client lets a
+    caller (run_all_checks) share an already authenticated client.
+    """
     parser = argparse.ArgumentParser(description='Live Reconciliation Demo')
     parser.add_argument('--days', type=int, default=14, help='Number of days to compare (default: 14)')
     parser.add_argument('--start-date', type=str, help='Start date (YYYY-MM-DD). Overrides --days')
@@ -388,13 +637,18 @@ def main():
     parser.add_argument('--no-animation', action='store_true', help='Disable animation delays')
     parser.add_argument('--platform', type=str, default='all',
                         help='Platform(s) to check: all, facebook, tiktok, shopify (default: all)')
-    args = parser.parse_args()
+    parser.add_argument('--no-history', action='store_true',
+                        help='Do not append this run to the local reconciliation history store')
+    parser.add_argument('--shopify-shards', type=str, default='day', choices=['day', 'adaptive'],
+                        help='Shopify order sharding: one shard per day, or adaptive by order density (default: day)')
+    args = parser.parse_args(argv)
 
     global TOLERANCE
     if args.tolerance is not None:
         TOLERANCE = args.tolerance / 100.0
 
     animated = not args.no_animation
+    BQ_BUDGET.reset()
 
     # Date handling: custom dates override --days
     if args.start_date and args.end_date:
@@ -424,6 +678,7 @@ def main():
     print(f"  {C.DIM}  Tolerance: {TOLERANCE*100:.0f}%{C.END}")
 
     all_results = []  # (platform, metric, match_bool)
+    history_rows = []  # (platform, metric, api_value, bq_value, diff_pct, match_bool)
     selected = args.platform.lower()
     run_facebook = selected in ('all', 'facebook')
     run_tiktok = selected in ('all', 'tiktok')
@@ -441,7 +696,7 @@ def main():
     print_step(step, total_steps, "CONNECT — BigQuery")
     print_progress("Connecting to BigQuery", animated)
     try:
-        bq_client = bigquery.Client(project=BQ_PROJECT)
+        bq_client = bq_client or get_client(BQ_PROJECT)
         # Quick test query
         list(bq_client.query(f"SELECT 1").result())
         print(f"  {C.GREEN}  Connected to project '{BQ_PROJECT}', dataset '{BQ_DATASET}'{C.END}")
@@ -475,11 +730,17 @@ def main():
         if not fb_access_token or not fb_account_ids:
             print(f"  {C.YELLOW}  Facebook credentials not configured — skipping{C.END}")
         else:
-            for acct_id in fb_account_ids:
-                name = get_facebook_account_name(acct_id, fb_access_token)
-                fb_account_names[acct_id] = name
-                print_progress(f"Querying account: {name} ({acct_id})", animated)
-                stats = get_facebook_api_stats(acct_id, fb_access_token, start_date, end_date)
+            print_progress(f"Querying {len(fb_account_ids)} account(s) via batch API", animated)
+            try:
+                fb_account_names, fb_batch_stats = get_facebook_batch_stats(
+                    fb_account_ids, fb_access_token, start_date, end_date
+                )
+            except RuntimeError as e:
+                print(f"  {C.RED}  {e}{C.END}")
+                fb_batch_stats = {}
+            for acct_id in fb_batch_stats:
+                name = fb_account_names[acct_id]
+                stats = fb_batch_stats[acct_id]
                 if stats:
                     fb_api_results[acct_id] = stats
                     print(f"  {C.GREEN}  {name}: spend={format_money(stats['spend'])}, impressions={format_number(stats['impressions'])}, clicks={format_number(stats['clicks'])}{C.END}")
@@ -513,6 +774,7 @@ def main():
                 print(f"\n  {C.YELLOW}  {name}: No activity in this period — skipped{C.END}")
                 print(f"  {C.DIM}  Tip: Try a different date range (e.g. --start-date 2024-11-01 --end-date 2024-12-01){C.END}")
                 all_results.append((f"Facebook ({name})", "All metrics", None))  # None = skipped
+                history_rows.append((f"Facebook ({name})", "All metrics", 0, 0, 0.0, None))
                 continue
 
             comparisons = [
@@ -528,8 +790,10 @@ def main():
                 comparisons, animated
             )
 
-            for (metric_name, _, _, _), matched in zip(comparisons, results):
+            for (metric_name, api_val, bq_val, _), matched in zip(comparisons, results):
                 all_results.append((f"Facebook ({name})", metric_name, matched))
+                history_rows.append((f"Facebook ({name})", metric_name, api_val, bq_val,
+                                     compute_diff_pct(api_val, bq_val), matched))
 
     # ── TIKTOK ──────────────────────────────────────────────
     if run_tiktok:
@@ -537,14 +801,16 @@ def main():
         print_step(step, total_steps, "TIKTOK API — Calling TikTok Marketing API v1.3")
 
         tt_access_token = os.getenv('TIKTOK_ACCESS_TOKEN')
-        tt_advertiser_id = os.getenv('TIKTOK_ADVERTISER_ID')
+        # TIKTOK_ADVERTISER_IDS (comma-separated) takes precedence over TIKTOK_ADVERTISER_ID
+        tt_advertiser_ids = [a.strip() for a in os.getenv(
+            'TIKTOK_ADVERTISER_IDS', os.getenv('TIKTOK_ADVERTISER_ID', '')).split(',') if a.strip()]
 
         tt_api_stats = None
-        if not tt_access_token or not tt_advertiser_id:
+        if not tt_access_token or not tt_advertiser_ids:
             print(f"  {C.YELLOW}  TikTok credentials not configured — skipping{C.END}")
         else:
-            print_progress(f"Querying advertiser {tt_advertiser_id}", animated)
-            tt_api_stats = get_tiktok_api_stats(tt_access_token, tt_advertiser_id, start_date, end_date)
+            print_progress(f"Querying advertiser(s) {', '.join(tt_advertiser_ids)}", animated)
+            tt_api_stats = get_tiktok_multi_advertiser_stats(tt_access_token, tt_advertiser_ids, start_date, end_date)
             if tt_api_stats:
                 print(f"  {C.GREEN}  TikTok: spend={format_money(tt_api_stats['spend'])}, impressions={format_number(tt_api_stats['impressions'])}, clicks={format_number(tt_api_stats['clicks'])}{C.END}")
             else:
@@ -577,8 +843,10 @@ def main():
                 comparisons, animated
             )
 
-            for (metric_name, _, _, _), matched in zip(comparisons, results):
+            for (metric_name, api_val, bq_val, _), matched in zip(comparisons, results):
                 all_results.append(("TikTok", metric_name, matched))
+                history_rows.append(("TikTok", metric_name, api_val, bq_val,
+                                     compute_diff_pct(api_val, bq_val), matched))
         else:
             print(f"  {C.YELLOW}  Skipped — missing API or BigQuery data{C.END}")
 
@@ -599,8 +867,9 @@ def main():
             count_data = get_shopify_api_order_count(sh_store, sh_token, start_date, end_date)
             if count_data:
                 print(f"  {C.GREEN}  Order count (API): {format_number(count_data['order_count'])}{C.END}")
-                print_progress("Fetching revenue (paginated)", animated)
-                revenue_data = get_shopify_api_revenue(sh_store, sh_token, start_date, end_date)
+                print_progress(f"Fetching revenue (paginated, {args.shopify_shards} shards)", animated)
+                revenue_data = get_shopify_api_revenue(sh_store, sh_token, start_date, end_date,
+                                                       shard_mode=args.shopify_shards)
                 if revenue_data:
                     sh_api_stats = {
                         'order_count': count_data['order_count'],
@@ -634,8 +903,10 @@ def main():
                 comparisons, animated
             )
 
-            for (metric_name, _, _, _), matched in zip(comparisons, results):
+            for (metric_name, api_val, bq_val, _), matched in zip(comparisons, results):
                 all_results.append(("Shopify", metric_name, matched))
+                history_rows.append(("Shopify", metric_name, api_val, bq_val,
+                                     compute_diff_pct(api_val, bq_val), matched))
         else:
             print(f"  {C.YELLOW}  Skipped — missing API or BigQuery data{C.END}")
 
@@ -685,9 +956,17 @@ def main():
     if skipped_results:
         print(f"  {C.YELLOW}  ({len(skipped_results)} account(s) skipped — no activity in period){C.END}")
 
+    print(f"  {C.DIM}  {BQ_BUDGET.summary_line()}{C.END}")
     print(f"  {C.CYAN}{'=' * width}{C.END}")
     print()
 
+    if not args.no_history and history_rows:
+        try:
+            run_id = reconciliation_history.record_run(start_date, end_date, TOLERANCE * 100, history_rows)
+            print(f"  {C.DIM}  Saved to history (run #{run_id}): {reconciliation_history.HISTORY_DB}{C.END}")
+        except Exception as e:
+            print(f"  {C.YELLOW}  Could not save history: {e}{C.END}")
+
     return 0 if total_mismatch == 0 else 1
 
 
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+LOCAL MIRROR - Recent partitions as Parquet, queried with DuckDB
+================================================================
+The explorer's "Local (DuckDB)" backend runs the same SQL text against the
+last LOCAL_MIRROR["days"] days of a few hot tables (config.LOCAL_MIRROR),
+mirrored as one Parquet file per day under BQ_MIRROR_DIR
+(default <tmp>/hulken_mirror-<uid>/<table>/YYYY-MM-DD.parquet). The
+directory is private to the user (0700): a mirror directory owned by
+someone else or accessible to other users is never read nor written.
+
+- sync(): exports missing days (and re-exports the most recent ones) with
+  one query per table, split into daily files on the client, drops days
+  outside the window
+- translate(): light BigQuery -> DuckDB dialect translation (backtick table
+  names, DATE(), DATE_SUB/DATE_ADD, DATE_DIFF, SAFE_CAST, SAFE_DIVIDE,
+  COUNTIF, FLOAT64/INT64/STRING, @params)
+- run(): raises NotMirrored when a table is not mirrored, its mirror has
+  not been synced today, or the query's WHERE clause does not bound the
+  table's date column within the mirror window: the caller falls back to
+  BigQuery
+
+Usage:
+    python local_mirror.py sync
+
+    from local_mirror import run, NotMirrored
+    try:
+        df = run(sql)
+    except NotMirrored:
+        df = client.query(sql).to_dataframe()
+"""
+
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from config import LOCAL_MIRROR
+from private_files import private_dir, user_temp_path
+from query_builder import PARAM_RE, as_date, now_params, run_query
+
+MIRROR_DIR = Path(os.getenv('BQ_MIRROR_DIR', user_temp_path('hulken_mirror')))
+
+TABLE_RE = re.compile(r"`([\w-]+)\.(\w+)\.(\w+)`")
+# Lower bound of a date predicate: DATE_SUB(@today, INTERVAL 30 DAY), a literal date, @param, CURRENT_DATE()
+BOUND = (r"(?:DATE_SUB\(\s*(?:@today|CURRENT_DATE\(\))\s*,\s*INTERVAL\s+(?P<days>\d+)\s+DAY\s*\)"
+         r"|(?:DATE\s+|TIMESTAMP\s+)?'(?P<literal>\d{4}-\d{2}-\d{2})[^']*'"
+         r"|@(?P<param>\w+)|(?P<current>CURRENT_DATE\(\)))")
+# End of a WHERE clause at its own nesting level
+CLAUSE_END_RE = re.compile(r"\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|QUALIFY|WINDOW|LIMIT|UNION|EXCEPT|INTERSECT)\b|;", re.IGNORECASE)
+DAY_COLUMN = "_mirror_day"
+TYPES = {"FLOAT64": "DOUBLE", "INT64": "BIGINT", "STRING": "VARCHAR", "BOOL": "BOOLEAN", "NUMERIC": "DECIMAL(38, 9)"}
+
+
+class NotMirrored(Exception):
+    """The query needs data the local mirror does not have."""
+
+
+def table_dir(table):
+    return MIRROR_DIR / table.replace(".", "_")
+
+
+def mirrored_days(table):
+    """Days present in the mirror for a table."""
+    directory = table_dir(table)
+    if not directory.exists():
+        return []
+    return sorted(date.fromisoformat(p.stem) for p in directory.glob("*.parquet"))
+
+
+# ============================================================
+# SYNC
+# ============================================================
+def sync(client, today=None, budget=None, progress=print):
+    """Bring every mirrored table up to date. Returns the number of days exported."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    today = today or now_params()['today']
+    window = [today - timedelta(days=i) for i in range(LOCAL_MIRROR["days"])]
+    refresh = set(window[:LOCAL_MIRROR["refresh_days"]])
+    private_dir(MIRROR_DIR)
+    exported = 0
+    for table, date_column in LOCAL_MIRROR["tables"].items():
+        directory = table_dir(table)
+        directory.mkdir(mode=0o700, exist_ok=True)
+        present = set(mirrored_days(table))
+        for day in present - set(window):
+            (directory / f"{day.isoformat()}.parquet").unlink(missing_ok=True)
+        days = sorted(set(window) - present | refresh)
+        if not days:
+            continue
+        # One scan for all the days (the tables are not partitioned by day)
+        sql = (f"SELECT DATE({date_column}) AS {DAY_COLUMN}, * FROM `{table}` "
+               f"WHERE DATE({date_column}) IN UNNEST(@days)")
+        job = budget.run_query(client, sql, {"days": days}) if budget else run_query(client, sql, {"days": days})
+        data = job.to_arrow(create_bqstorage_client=False)
+        columns = [name for name in data.column_names if name != DAY_COLUMN]
+        for day in days:
+            rows = data.filter(pc.equal(data[DAY_COLUMN], pa.scalar(day, pa.date32()))).select(columns)
+            path = directory / f"{day.isoformat()}.parquet"
+            partial = path.with_name(path.name + ".part")
+            pq.write_table(rows, str(partial))
+            partial.replace(path)
+            exported += 1
+            if progress:
+                progress(f"{table} {day}: {rows.num_rows:,} rows")
+    return exported
+
+
+# ============================================================
+# DIALECT TRANSLATION
+# ============================================================
+def _split_args(text):
+    """Split a call's argument list on top-level commas."""
+    args, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(text):
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+
+def _rewrite_calls(sql, name, rewrite):
+    """Replace every NAME(args) call (innermost first) with rewrite(args); None keeps the call."""
+    pattern = re.compile(rf"\b{name}\s*\(", re.IGNORECASE)
+    pos = 0
+    while True:
+        match = pattern.search(sql, pos)
+        if not match:
+            return sql
+        depth, end = 1, match.end()
+        while end < len(sql) and depth:
+            depth += {"(": 1, ")": -1}.get(sql[end], 0)
+            end += 1
+        inner = _rewrite_calls(sql[match.end():end - 1], name, rewrite)
+        replacement = rewrite(_split_args(inner))
+        if replacement is None:
+            replacement = f"{sql[match.start():match.end()]}{inner})"
+        sql = sql[:match.start()] + replacement + sql[end:]
+        pos = match.start() + len(replacement)
+
+
+def translate(sql):
+    """BigQuery SQL -> DuckDB SQL over the mirror views. Returns (sql, tables)."""
+    tables = [".".join(m) for m in TABLE_RE.findall(sql)]
+    sql = TABLE_RE.sub(lambda m: f'"{m.group(3)}"', sql)
+    sql = _rewrite_calls(sql, "DATE", lambda a: f"CAST({a[0]} AS DATE)" if len(a) == 1 else None)
+    sql = _rewrite_calls(sql, "DATE_SUB", lambda a: f"CAST({a[0]} - {a[1]} AS DATE)")
+    sql = _rewrite_calls(sql, "DATE_ADD", lambda a: f"CAST({a[0]} + {a[1]} AS DATE)")
+    sql = _rewrite_calls(sql, "DATE_DIFF", lambda a: f"date_diff('{a[2].lower()}', {a[1]}, {a[0]})")
+    sql = _rewrite_calls(sql, "SAFE_DIVIDE", lambda a: f"({a[0]} / NULLIF({a[1]}, 0))")
+    sql = _rewrite_calls(sql, "COUNTIF", lambda a: f"count_if({a[0]})")
+    sql = re.sub(r"\bSAFE_CAST\s*\(", "TRY_CAST(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bAS\s+(FLOAT64|INT64|STRING|BOOL|NUMERIC)\b",
+                 lambda m: f"AS {TYPES[m.group(1).upper()]}", sql, flags=re.IGNORECASE)
+    sql = PARAM_RE.sub(lambda m: f"${m.group(1)}", sql)
+    return sql, tables
+
+
+def _where_clauses(sql):
+    """Text of every WHERE clause (main query and subqueries)."""
+    clauses = []
+    for match in re.finditer(r"\bWHERE\b", sql, re.IGNORECASE):
+        depth, end, quote = 0, match.end(), None
+        while end < len(sql):
+            ch = sql[end]
+            if quote:
+                quote = None if ch == quote else quote
+            elif ch in "'\"":
+                quote = ch
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and CLAUSE_END_RE.match(sql, end):
+                break
+            end += 1
+        clauses.append(sql[match.end():end])
+    return clauses
+
+
+def _top_level(text):
+    """`text` with everything inside parentheses or quotes blanked out (same length)."""
+    out, depth, quote = [], 0, None
+    for ch in text:
+        if quote:
+            quote = None if ch == quote else quote
+            out.append(" ")
+        elif ch in "'\"":
+            quote = ch
+            out.append(" ")
+        elif ch == "(":
+            depth += 1
+            out.append(ch if depth == 1 else " ")
+        elif ch == ")":
+            out.append(ch if depth == 1 else " ")
+            depth -= 1
+        else:
+            out.append(ch if depth == 0 else " ")
+    return "".join(out)
+
+
+def _bound_value(match, params):
+    if match["days"]:
+        return params["today"] - timedelta(days=int(match["days"]))
+    if match["literal"]:
+        return as_date(match["literal"])
+    if match["current"]:
+        return params["today"]
+    value = params.get(match["param"])
+    if value is None:
+        return None
+    return value.date() if isinstance(value, datetime) else as_date(value)
+
+
+def earliest_date(sql, column, params):
+    """
+    Lowest date a WHERE predicate on `column` (`column >= bound`, `> bound`,
+    `= bound` or `BETWEEN bound AND ...`, optionally qualified or inside DATE())
+    lets the query read, or None when no WHERE clause bounds it. Only
+    top-level ANDed predicates count: a bound in a SELECT expression, a CASE
+    or one branch of an OR does not limit the rows read.
+    """
+    name = rf"(?:`?\w+`?\.)?`?{re.escape(column)}`?"
+    predicate = re.compile(rf"(?:\bDATE\(\s*{name}\s*\)|(?<![\w.`]){name}\b)\s*(?:>=|>|=(?!=)|\bBETWEEN\b)\s*{BOUND}",
+                           re.IGNORECASE)
+    bounds = []
+    for clause in _where_clauses(sql):
+        top = _top_level(clause)
+        if re.search(r"\bOR\b", top, re.IGNORECASE):
+            continue
+        for match in predicate.finditer(clause):
+            if top[match.start()] != " ":
+                bound = _bound_value(match, params)
+                if bound is not None:
+                    bounds.append(bound)
+    return min(bounds) if bounds else None
+
+
+# ============================================================
+# EXECUTION
+# ============================================================
+def run(sql, params=None):
+    """Run BigQuery SQL on the local mirror with DuckDB. Returns a DataFrame or raises NotMirrored."""
+    try:
+        import duckdb
+    except ImportError:
+        raise NotMirrored("duckdb is not installed")
+
+    params = dict(params or {})
+    referenced = set(PARAM_RE.findall(sql))
+    defaults = now_params()
+    params.update({name: defaults[name] for name in ('now', 'today') if name in referenced and name not in params})
+
+    local_sql, tables = translate(sql)
+    if not tables:
+        raise NotMirrored("no table referenced")
+    if MIRROR_DIR.exists():
+        try:
+            private_dir(MIRROR_DIR)
+        except PermissionError as e:
+            raise NotMirrored(str(e))
+    bound_params = {**defaults, **params}
+    for table in tables:
+        if table not in LOCAL_MIRROR["tables"]:
+            raise NotMirrored(f"{table} is not mirrored")
+        days = mirrored_days(table)
+        if not days:
+            raise NotMirrored(f"{table} has not been synced yet")
+        if days[-1] < defaults['today']:
+            raise NotMirrored(f"{table} is mirrored up to {days[-1]} only (sync the mirror)")
+        column = LOCAL_MIRROR["tables"][table]
+        earliest = earliest_date(sql, column, bound_params)
+        if earliest is None:
+            raise NotMirrored(f"no WHERE bound on {table.rsplit('.', 1)[-1]}.{column}")
+        if earliest < days[0]:
+            raise NotMirrored(f"{table} is mirrored from {days[0]} only")
+
+    conn = duckdb.connect()
+    try:
+        # BigQuery's DATE(timestamp) is in UTC, DuckDB's uses the session time zone
+        conn.execute("SET TimeZone = 'UTC'")
+        for table in set(tables):
+            name = table.rsplit(".", 1)[-1]
+            conn.execute(f"CREATE VIEW \"{name}\" AS SELECT * FROM read_parquet('{table_dir(table) / '*.parquet'}', union_by_name = true)")
+        try:
+            return conn.execute(local_sql, {k: v for k, v in params.items() if k in referenced}).df()
+        except duckdb.Error as e:
+            raise NotMirrored(f"not runnable locally: {e}")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["sync"]:
+        print(__doc__)
+        return
+    from bq_client import get_client
+    from config import BQ_PROJECT
+    days = sync(get_client(BQ_PROJECT))
+    print(f"Local mirror: {days} day(s) exported -> {MIRROR_DIR}")
+
+
+if __name__ == "__main__":
+    main()
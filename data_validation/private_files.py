@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+PRIVATE FILES - Per-user locations for local copies of query results
+====================================================================
+The result cache, exports, local mirror and table catalog keep BigQuery
+data (orders, customer PII) on local disk. Their default locations live
+under the shared temp directory, so each one is suffixed with the user id
+and directories are created 0700: other local users can neither read the
+files nor plant files the tools would serve back as query results.
+
+Usage:
+    from private_files import private_dir, user_temp_path
+
+    EXPORT_DIR = Path(os.getenv('BQ_EXPORT_DIR', user_temp_path('hulken_exports')))
+    private_dir(EXPORT_DIR)   # raises PermissionError when not private
+"""
+
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+USER_SUFFIX = f"-{os.getuid()}" if hasattr(os, "getuid") else ""
+
+
+def user_temp_path(name):
+    """<tmp>/<name>-<uid>[.ext]: default path of a per-user file or directory."""
+    stem, dot, ext = name.partition(".")
+    return Path(tempfile.gettempdir()) / f"{stem}{USER_SUFFIX}{dot}{ext}"
+
+
+def private_dir(path):
+    """
+    Create `path` (0700) if needed and return it. Raises PermissionError when
+    it is a symlink, is owned by another user, or is group/world accessible.
+    """
+    path = Path(path)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, "getuid"):  # Windows: per-user temp directory
+        return path
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} is not private to this user (owner, mode or symlink)")
+    return path
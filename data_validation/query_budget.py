@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+QUERY BUDGET - Dry-run pre-flight and bytes-billed guardrails
+=============================================================
+Every query goes through a dry run first (free, returns the bytes the
+query would scan), then runs with maximum_bytes_billed set to the tool's
+per-query cap, so BigQuery itself refuses anything larger.
+
+Each tool also has a cumulative budget for the run (QUERY_BUDGETS in
+config.py). When a query would exceed the per-query cap or the remaining
+budget:
+- on_exceed="abort":  BudgetExceeded is raised, nothing is billed
+- on_exceed="sample": the query is rewritten with TABLESAMPLE SYSTEM on its
+  tables, at the percentage that fits, when the caller allows it
+  (allow_sample=True: only for rate/median style checks, never for counts).
+  BigQuery only samples base tables, once per query: a query reading a view
+  or the same table twice raises BudgetExceeded instead (sample_blocker).
+
+Usage:
+    from query_budget import QueryBudget, BudgetExceeded
+
+    budget = QueryBudget.for_tool("soc_checks")
+    job = budget.run_query(client, sql, params, allow_sample=True)
+    print(budget.summary_line())
+"""
+
+import re
+import threading
+
+from google.cloud import bigquery
+
+from bq_client import when_done
+from config import QUERY_BUDGETS
+from query_builder import job_config
+
+# FROM/JOIN `project.dataset.table` not already sampled
+SAMPLE_TABLE_RE = re.compile(
+    r"(\b(?:FROM|JOIN)\s+`([\w-]+\.\w+\.\w+)`)(?!\s+TABLESAMPLE)", re.IGNORECASE
+)
+# Every FROM/JOIN `project.dataset.table`, sampled or not
+READ_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+`([\w-]+\.\w+\.\w+)`", re.IGNORECASE)
+MIN_SAMPLE_PERCENT = 1
+
+
+class BudgetExceeded(Exception):
+    """A query would scan more than its tool's budget allows."""
+
+
+def format_bytes(num_bytes):
+    """Human readable size (GB with 2 decimals below 1 TB)."""
+    num_bytes = num_bytes or 0
+    if num_bytes >= 1024 ** 4:
+        return f"{num_bytes / 1024 ** 4:.2f} TB"
+    if num_bytes >= 1024 ** 3:
+        return f"{num_bytes / 1024 ** 3:.2f} GB"
+    return f"{num_bytes / 1024 ** 2:.1f} MB"
+
+
+def sample_sql(sql, percent):
+    """Add TABLESAMPLE SYSTEM (percent) to every table the query reads."""
+    return SAMPLE_TABLE_RE.sub(rf"\1 TABLESAMPLE SYSTEM ({percent} PERCENT)", sql)
+
+
+def sample_blocker(client, sql):
+    """
+    Why sample_sql(sql) cannot run, or None: TABLESAMPLE only applies to base
+    tables (not views), and a table can be sampled only once per query.
+    """
+    tables = READ_TABLE_RE.findall(sql)
+    if not tables:
+        return "no table to sample"
+    for table in dict.fromkeys(tables):
+        if tables.count(table) > 1:
+            return f"{table} is read more than once"
+    for table in dict.fromkeys(tables):
+        table_type = client.get_table(table).table_type
+        if table_type != "TABLE":
+            return f"{table} is a {table_type.lower().replace('_', ' ')}"
+    return None
+
+
+class QueryBudget:
+    """Per-query cap and cumulative bytes budget for one tool run."""
+
+    def __init__(self, tool, max_bytes_per_query, run_budget, on_exceed="abort"):
+        if on_exceed not in ("abort", "sample"):
+            raise ValueError(f"on_exceed must be 'abort' or 'sample', got {on_exceed!r}")
+        self.tool = tool
+        self.max_bytes_per_query = max_bytes_per_query
+        self.run_budget = run_budget
+        self.on_exceed = on_exceed
+        self.lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def for_tool(cls, tool):
+        """Budget configured for a tool in config.QUERY_BUDGETS."""
+        return cls(tool, **QUERY_BUDGETS[tool])
+
+    def reset(self):
+        """Start a new run: forget bytes already spent."""
+        with self.lock:
+            self.spent = 0       # bytes billed by finished jobs
+            self.reserved = 0    # dry-run estimates of jobs not recorded yet
+            self.history = []    # one dict per query
+
+    @property
+    def remaining(self):
+        return max(self.run_budget - self.spent - self.reserved, 0)
+
+    # ── Pre-flight ───────────────────────────────────────────
+    def estimate(self, client, sql, params=None):
+        """Bytes the query would scan (dry run, not billed)."""
+        config = job_config(sql, params, base=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False))
+        return client.query(sql, job_config=config).total_bytes_processed or 0
+
+    def plan(self, estimated, allow_sample=False):
+        """
+        Decide how to run a query of `estimated` bytes.
+        Returns the TABLESAMPLE percentage (100 = full query) or raises BudgetExceeded.
+        """
+        limit = min(self.max_bytes_per_query, self.remaining)
+        if estimated <= limit:
+            return 100
+        if self.on_exceed == "sample" and allow_sample:
+            percent = int(100 * limit / estimated)
+            if percent >= MIN_SAMPLE_PERCENT:
+                return percent
+        raise BudgetExceeded(self._exceeded(estimated))
+
+    def _exceeded(self, estimated):
+        return (f"{self.tool}: query would scan {format_bytes(estimated)}, "
+                f"limit {format_bytes(self.max_bytes_per_query)} per query, "
+                f"{format_bytes(self.remaining)} left in the run budget")
+
+    # ── Execution ────────────────────────────────────────────
+    def run_query(self, client, sql, params=None, allow_sample=False, base=None, presampled_percent=100):
+        """
+        Dry-run, check the budget, then start the query with maximum_bytes_billed.
+        The returned job has the same interface as client.query(); the plan is
+        appended to self.history (see last_sample_percent).
+
+        presampled_percent: the SQL already reads its tables through
+        TABLESAMPLE at this rate (the dry run reports the unsampled size).
+        """
+        estimated = self.estimate(client, sql, params) * presampled_percent // 100
+        with self.lock:
+            percent = self.plan(estimated, allow_sample)
+            expected = estimated * percent // 100
+            self.reserved += expected
+
+        if percent < 100:
+            blocker = sample_blocker(client, sql)
+            if blocker:
+                with self.lock:
+                    self.reserved -= expected
+                    reason = self._exceeded(estimated)
+                raise BudgetExceeded(f"{reason}; cannot run on a sample: {blocker}")
+
+        run_sql = sql if percent == 100 else sample_sql(sql, percent)
+        config = job_config(run_sql, params, base=base)
+        config.maximum_bytes_billed = self.max_bytes_per_query
+        entry = {"estimated_bytes": estimated, "sample_percent": percent, "billed_bytes": None}
+        try:
+            job = client.query(run_sql, job_config=config)
+        except Exception:
+            with self.lock:
+                self.reserved -= expected
+            raise
+        with self.lock:
+            self.history.append(entry)
+        # Billed bytes are recorded when the caller sees the job finish (no polling thread)
+        return when_done(job, lambda j: self._record(entry, expected, j))
+
+    def _record(self, entry, expected, job):
+        with self.lock:
+            self.reserved -= expected
+            entry["billed_bytes"] = getattr(job, "total_bytes_billed", None) or 0
+            self.spent += entry["billed_bytes"]
+
+    @property
+    def last_sample_percent(self):
+        """TABLESAMPLE percentage of the last query started (100 = not sampled)."""
+        with self.lock:
+            return self.history[-1]["sample_percent"] if self.history else 100
+
+    def summary_line(self):
+        with self.lock:
+            estimated = sum(e["estimated_bytes"] for e in self.history)
+            sampled = sum(1 for e in self.history if e["sample_percent"] < 100)
+            return (f"Budget {self.tool}: {len(self.history)} query(ies), "
+                    f"est. {format_bytes(estimated)}, billed {format_bytes(self.spent)} "
+                    f"of {format_bytes(self.run_budget)}"
+                    + (f", {sampled} sampled" if sampled else ""))
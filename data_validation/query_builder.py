@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+QUERY BUILDER - Deterministic, parameterised SQL
+================================================
+BigQuery never serves a query from its 24h result cache when the SQL calls
+CURRENT_DATE()/CURRENT_TIMESTAMP(). Here "now" is resolved on the client,
+truncated to a bucket (BQ_NOW_GRANULARITY: minute, hour or day; default
+hour), and passed as a query parameter: the same check run twice within a
+bucket sends byte-identical SQL and parameters, so the second run is a
+cache hit (unless the underlying tables changed).
+
+Values (dates, ids, ...) are passed as query parameters instead of being
+interpolated into the SQL text.
+
+Standard parameters, bound automatically when the SQL references them:
+    @now    TIMESTAMP, current UTC time truncated to the granularity
+    @today  DATE, current UTC date (same as CURRENT_DATE())
+
+Usage:
+    from query_builder import run_query, date_filter
+
+    where, params = date_filter("created_at", "2026-01-01", "2026-01-31")
+    job = run_query(client, f"SELECT COUNT(*) AS n FROM `t` {where}", params)
+
+    job = run_query(client, "SELECT ... WHERE d >= DATE_SUB(@today, INTERVAL 7 DAY)")
+"""
+
+import os
+import re
+import copy
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from google.cloud import bigquery
+
+NOW_GRANULARITY = os.getenv('BQ_NOW_GRANULARITY', 'hour')
+
+_TRUNCATE = {
+    'minute': dict(second=0, microsecond=0),
+    'hour': dict(minute=0, second=0, microsecond=0),
+    'day': dict(hour=0, minute=0, second=0, microsecond=0),
+}
+
+# @name references (not @@system variables)
+PARAM_RE = re.compile(r"(?<![@\w])@(\w+)")
+
+
+# ============================================================
+# "NOW" ON THE CLIENT
+# ============================================================
+def bucketed_now(granularity=None, now=None):
+    """Current UTC time truncated to the granularity (minute, hour or day)."""
+    granularity = granularity or NOW_GRANULARITY
+    if granularity not in _TRUNCATE:
+        raise ValueError(f"Unknown granularity: {granularity} (expected minute, hour or day)")
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(timezone.utc).replace(**_TRUNCATE[granularity])
+
+
+def now_params(granularity=None, now=None):
+    """Values of the standard @now / @today parameters."""
+    now = now or datetime.now(timezone.utc)
+    return {
+        'now': bucketed_now(granularity, now),
+        'today': now.astimezone(timezone.utc).date(),
+    }
+
+
+# ============================================================
+# PARAMETERS
+# ============================================================
+def _param_type(value):
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, Decimal):
+        return "NUMERIC"
+    if isinstance(value, datetime):
+        return "TIMESTAMP" if value.tzinfo else "DATETIME"
+    if isinstance(value, date):
+        return "DATE"
+    return "STRING"
+
+
+def query_parameter(name, value):
+    """BigQuery query parameter with its type inferred from the Python value."""
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        return bigquery.ArrayQueryParameter(name, _param_type(values[0]) if values else "STRING", values)
+    return bigquery.ScalarQueryParameter(name, _param_type(value), value)
+
+
+def as_date(value):
+    """'YYYY-MM-DD' string (or date) -> date."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def job_config(sql, params=None, granularity=None, base=None):
+    """
+    QueryJobConfig binding `params` plus the standard @now/@today
+    parameters the SQL references. `base` is an existing config to extend.
+    """
+    params = dict(params or {})
+    referenced = set(PARAM_RE.findall(sql))
+    standard = [name for name in ('now', 'today') if name in referenced and name not in params]
+    if standard:
+        defaults = now_params(granularity)
+        params.update({name: defaults[name] for name in standard})
+
+    config = copy.deepcopy(base) if base else bigquery.QueryJobConfig()
+    if params:
+        config.query_parameters = list(config.query_parameters or []) + [
+            query_parameter(name, value) for name, value in params.items()
+        ]
+    return config
+
+
+def run_query(client, sql, params=None, granularity=None, job_config_base=None):
+    """Start a parameterised query job (see job_config)."""
+    return client.query(sql, job_config=job_config(sql, params, granularity, job_config_base))
+
+
+# ============================================================
+# COMMON CLAUSES
+# ============================================================
+def date_filter(column, start_date=None, end_date=None, prefix="WHERE"):
+    """
+    Date range clause on DATE(column) with @start_date/@end_date parameters.
+    Returns (clause, params); ("", {}) when the range is not set.
+    """
+    if not (start_date and end_date):
+        return "", {}
+    return (f"{prefix} DATE({column}) BETWEEN @start_date AND @end_date",
+            {'start_date': as_date(start_date), 'end_date': as_date(end_date)})
+
+
+def hours_since(value, now=None):
+    """Whole hours elapsed since a DATE/DATETIME/TIMESTAMP value (naive values are UTC)."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return int((now - value).total_seconds() // 3600)
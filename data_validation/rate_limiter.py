@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+RATE LIMITER - Usage-header driven request scheduling
+======================================================
+Token-bucket scheduler per platform and per account for the source APIs
+called by live_reconciliation.py.
+
+Each (platform, key) pair gets its own limiter:
+- a token bucket capping the request rate (requests/second)
+- an in-flight cap that grows while the quota is comfortable and shrinks
+  (AIMD) as the platform reports usage approaching its limit
+
+Usage is read from the response headers each platform sends back:
+- Facebook: x-app-usage, x-ad-account-usage, x-business-use-case-usage
+- Shopify:  X-Shopify-Shop-Api-Call-Limit ("32/40")
+- TikTok:   no usage header, static QPS plus throttling error codes
+
+Usage:
+    from rate_limiter import RateLimitScheduler
+
+    scheduler = RateLimitScheduler()
+    resp = scheduler.request('shopify', store, 'GET', url, headers=headers, params=params)
+
+    # Fan requests out; workers inherit the caller's contextvars (output capture)
+    with ContextThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(fetch, shards))
+"""
+
+import json
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# ============================================================
+# PLATFORM LIMITS
+# ============================================================
+# rate:            sustained requests/second per key
+# burst:           token bucket capacity
+# max_in_flight:   upper bound for concurrent requests per key
+# backoff_seconds: pause applied when throttled without a hint from the API
+PLATFORM_LIMITS = {
+    'facebook': {'rate': 5.0, 'burst': 10, 'max_in_flight': 8, 'backoff_seconds': 60},
+    'shopify': {'rate': 2.0, 'burst': 40, 'max_in_flight': 4, 'backoff_seconds': 2},
+    'tiktok': {'rate': 10.0, 'burst': 10, 'max_in_flight': 8, 'backoff_seconds': 5},
+}
+
+# Usage (% of quota) watermarks driving in-flight adjustments
+USAGE_LOW = 50.0       # below: allow one more request in flight
+USAGE_HIGH = 75.0      # above: halve requests in flight
+USAGE_CRITICAL = 95.0  # above: pause the key until quota regains
+
+# Throttling error codes returned in the response body
+FACEBOOK_THROTTLE_CODES = {4, 17, 32, 613, 80000, 80003, 80004, 80014}
+TIKTOK_THROTTLE_CODES = {40100, 40133}  # returned with HTTP 200
+
+MAX_RETRIES = 3
+
+
+# ============================================================
+# USAGE HEADER PARSING
+# ============================================================
+def _header(headers, name):
+    """Case-insensitive header lookup (plain dicts included)."""
+    if headers is None:
+        return None
+    for k, v in headers.items():
+        if k.lower() == name.lower():
+            return v
+    return None
+
+
+def parse_facebook_usage(headers):
+    """
+    Return (usage_pct, regain_seconds) from Facebook usage headers.
+
+    usage_pct is the highest percentage reported across app, ad account
+    and business use case usage; None when no header is present.
+    """
+    usage = []
+    regain_seconds = 0
+
+    app_usage = _header(headers, 'x-app-usage')
+    if app_usage:
+        try:
+            data = json.loads(app_usage)
+            usage.extend(float(data.get(k, 0)) for k in ('call_count', 'total_cputime', 'total_time'))
+        except (ValueError, AttributeError):
+            pass
+
+    account_usage = _header(headers, 'x-ad-account-usage')
+    if account_usage:
+        try:
+            data = json.loads(account_usage)
+            usage.append(float(data.get('acc_id_util_pct', 0)))
+            regain_seconds = max(regain_seconds, int(data.get('reset_time_duration', 0) or 0))
+        except (ValueError, AttributeError):
+            pass
+
+    buc_usage = _header(headers, 'x-business-use-case-usage')
+    if buc_usage:
+        try:
+            data = json.loads(buc_usage)
+            for entries in data.values():
+                for entry in entries:
+                    usage.extend(float(entry.get(k, 0)) for k in ('call_count', 'total_cputime', 'total_time'))
+                    # estimated_time_to_regain_access is expressed in minutes
+                    regain_seconds = max(regain_seconds,
+                                         int(entry.get('estimated_time_to_regain_access', 0) or 0) * 60)
+        except (ValueError, AttributeError):
+            pass
+
+    return (max(usage) if usage else None), regain_seconds
+
+
+def parse_shopify_usage(headers):
+    """Return (usage_pct, regain_seconds) from X-Shopify-Shop-Api-Call-Limit."""
+    value = _header(headers, 'X-Shopify-Shop-Api-Call-Limit')
+    if not value:
+        return None, 0
+    try:
+        used, limit = (int(x) for x in value.split('/'))
+        return used / limit * 100, 0
+    except (ValueError, ZeroDivisionError):
+        return None, 0
+
+
+def parse_tiktok_usage(headers):
+    """TikTok sends no usage header: QPS is enforced by the token bucket only."""
+    return None, 0
+
+
+USAGE_PARSERS = {
+    'facebook': parse_facebook_usage,
+    'shopify': parse_shopify_usage,
+    'tiktok': parse_tiktok_usage,
+}
+
+
+# ============================================================
+# LIMITERS
+# ============================================================
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens/second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    Rate and concurrency limiter for one (platform, key) pair.
+
+    In-flight requests start at 1 and follow AIMD on reported usage:
+    +1 below USAGE_LOW, halved above USAGE_HIGH, paused above USAGE_CRITICAL
+    or when the platform throttles.
+    """
+
+    def __init__(self, platform, key, rate, burst, max_in_flight, backoff_seconds):
+        self.platform = platform
+        self.key = key
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.backoff_seconds = backoff_seconds
+        self.allowed_in_flight = 1
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_usage = None
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free in-flight slot, any pause to expire, and a token."""
+        with self.cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.cond.wait(pause)
+                    continue
+                if self.in_flight < self.allowed_in_flight:
+                    self.in_flight += 1
+                    break
+                self.cond.wait()
+        self.bucket.acquire()
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def report_usage(self, usage_pct, regain_seconds=0):
+        """Adjust allowed in-flight requests from the usage a platform reported."""
+        with self.cond:
+            self.last_usage = usage_pct
+            if usage_pct is None:
+                # No signal: grow slowly, the token bucket still caps QPS
+                self.allowed_in_flight = min(self.max_in_flight, self.allowed_in_flight + 1)
+            elif usage_pct >= USAGE_CRITICAL:
+                self.allowed_in_flight = 1
+                self.paused_until = time.monotonic() + (regain_seconds or self.backoff_seconds)
+            elif usage_pct >= USAGE_HIGH:
+                self.allowed_in_flight = max(1, self.allowed_in_flight // 2)
+            elif usage_pct < USAGE_LOW:
+                self.allowed_in_flight = min(self.max_in_flight, self.allowed_in_flight + 1)
+            self.cond.notify_all()
+
+    def throttled(self, retry_after=None):
+        """Platform rejected a request: drop to one in flight and pause."""
+        with self.cond:
+            self.allowed_in_flight = 1
+            self.paused_until = time.monotonic() + (retry_after or self.backoff_seconds)
+            self.cond.notify_all()
+
+
+class RateLimitScheduler:
+    """Registry of AdaptiveLimiter per (platform, key) plus a throttle-aware request helper."""
+
+    def __init__(self, limits=None, session=None):
+        self.limits = limits or PLATFORM_LIMITS
+        self.session = session or requests
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, platform, key='default'):
+        """Get (or lazily create) the limiter for a platform and account key."""
+        with self.lock:
+            if (platform, key) not in self.limiters:
+                self.limiters[(platform, key)] = AdaptiveLimiter(platform, key, **self.limits[platform])
+            return self.limiters[(platform, key)]
+
+    def request(self, platform, key, method, url, **kwargs):
+        """
+        Perform an HTTP request under the (platform, key) limiter.
+
+        Reads usage headers to adapt concurrency, and retries up to
+        MAX_RETRIES times on HTTP 429 or platform throttling codes after
+        honouring Retry-After. Returns the last requests.Response.
+        """
+        limiter = self.limiter(platform, key)
+        parse_usage = USAGE_PARSERS.get(platform, parse_tiktok_usage)
+
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            finally:
+                limiter.release()
+
+            if resp.status_code == 429 or self._body_throttled(platform, resp):
+                retry_after = _header(resp.headers, 'Retry-After')
+                try:
+                    retry_after = float(retry_after) if retry_after else None
+                except ValueError:
+                    retry_after = None
+                limiter.throttled(retry_after)
+                if attempt < MAX_RETRIES:
+                    continue
+                return resp
+
+            usage_pct, regain_seconds = parse_usage(resp.headers)
+            limiter.report_usage(usage_pct, regain_seconds)
+            return resp
+        return resp
+
+    @staticmethod
+    def _body_throttled(platform, resp):
+        """Detect throttling reported in the JSON body rather than the status code."""
+        if platform not in ('facebook', 'tiktok'):
+            return False
+        try:
+            data = resp.json()
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+        if platform == 'facebook':
+            return (data.get('error') or {}).get('code') in FACEBOOK_THROTTLE_CODES
+        return data.get('code') in TIKTOK_THROTTLE_CODES
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor running each task in a copy of the submitting thread's
+    contextvars, so state bound to the caller (run_all_checks output capture)
+    follows the requests fanned out to the pool.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
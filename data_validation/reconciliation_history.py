@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+RECONCILIATION HISTORY - Local store of every live_reconciliation run
+=====================================================================
+Each run of live_reconciliation.py appends its per-platform, per-metric
+API and BigQuery values to a local SQLite file, so trends can be read
+back instantly without calling the APIs or BigQuery again.
+
+Usage:
+    # Diff trend for one metric (last 14 days of runs), one series per window length
+    # (daily runs over a rolling window form one series)
+    python data_validation/reconciliation_history.py trend --platform Facebook --metric Spend
+
+    # Only runs over one window / one series per exact window
+    python data_validation/reconciliation_history.py trend --start-date 2026-02-01 --end-date 2026-02-07
+    python data_validation/reconciliation_history.py regressions --exact-window
+
+    # Last run where every metric matched (overall and per platform/metric)
+    python data_validation/reconciliation_history.py last-good
+
+    # Metrics that just flipped to MISMATCH or whose diff keeps growing
+    python data_validation/reconciliation_history.py regressions
+
+    # Use another store file
+    python data_validation/reconciliation_history.py trend --db /tmp/history.db
+"""
+
+import sys
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Fix Unicode on Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+HISTORY_DB = Path(__file__).parent / 'reconciliation_history.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    tolerance_pct REAL NOT NULL,
+    total_checks INTEGER NOT NULL,
+    total_match INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    run_at TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    api_value REAL,
+    bq_value REAL,
+    diff_pct REAL,
+    status TEXT NOT NULL  -- MATCH, MISMATCH, SKIPPED
+);
+CREATE INDEX IF NOT EXISTS idx_results_metric ON results (platform, metric, run_at);
+CREATE INDEX IF NOT EXISTS idx_results_window ON results (platform, metric, start_date, end_date, run_at);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results (run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_run_at ON runs (run_at);
+"""
+
+# ANSI Colors
+class C:
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    WHITE = '\033[97m'
+    BOLD = '\033[1m'
+    DIM = '\033[2m'
+    END = '\033[0m'
+
+
+def connect(db_path=HISTORY_DB):
+    """Open the history store, creating tables and indexes if needed."""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_run(start_date, end_date, tolerance_pct, rows, db_path=HISTORY_DB, run_at=None):
+    """
+    Append one reconciliation run to the store.
+
+    rows: list of (platform, metric, api_value, bq_value, diff_pct, matched)
+          where matched is True/False, or None for a skipped comparison.
+    Returns the new run_id.
+    """
+    run_at = run_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    checked = [r for r in rows if r[5] is not None]
+    conn = connect(db_path)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (run_at, start_date, end_date, tolerance_pct, total_checks, total_match) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_at, start_date, end_date, tolerance_pct,
+                 len(checked), sum(1 for r in checked if r[5]))
+            )
+            run_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO results (run_id, run_at, platform, metric, start_date, end_date, "
+                "api_value, bq_value, diff_pct, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, run_at, platform, metric, start_date, end_date, api_val, bq_val, diff_pct,
+                     'SKIPPED' if matched is None else 'MATCH' if matched else 'MISMATCH')
+                    for platform, metric, api_val, bq_val, diff_pct, matched in rows
+                ]
+            )
+        return run_id
+    finally:
+        conn.close()
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+# Days in the reconciled window (inclusive): runs over rolling windows of the
+# same length form one series
+WINDOW_DAYS = "(CAST(julianday(end_date) - julianday(start_date) AS INTEGER) + 1)"
+
+
+def _series_columns(exact):
+    """Columns identifying a series: window length, or the exact window."""
+    return ["platform", "metric", "window_days"] + (["start_date", "end_date"] if exact else [])
+
+
+def _window_filter(sql, params, start_date=None, end_date=None):
+    """Restrict a results query to runs over one reconciled window."""
+    if start_date:
+        sql += " AND start_date = ?"
+        params.append(start_date)
+    if end_date:
+        sql += " AND end_date = ?"
+        params.append(end_date)
+    return sql, params
+
+
+def get_trend(conn, platform=None, metric=None, days=14, start_date=None, end_date=None, exact=False):
+    """
+    Results for matching platform/metric over the last `days` days of runs,
+    grouped by window length (exact=True: by exact window), oldest run first.
+    """
+    since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    sql = f"SELECT *, {WINDOW_DAYS} AS window_days FROM results WHERE run_at >= ? AND status != 'SKIPPED'"
+    params = [since]
+    if platform:
+        sql += " AND platform LIKE ?"
+        params.append(f"%{platform}%")
+    if metric:
+        sql += " AND metric = ?"
+        params.append(metric)
+    sql, params = _window_filter(sql, params, start_date, end_date)
+    sql += f" ORDER BY {', '.join(_series_columns(exact))}, run_at"
+    return conn.execute(sql, params).fetchall()
+
+
+def get_last_good(conn):
+    """
+    Return (last_full_match_run, per_metric) where per_metric lists the
+    latest MATCH per (platform, metric).
+    """
+    last_run = conn.execute(
+        "SELECT * FROM runs WHERE total_checks > 0 AND total_match = total_checks "
+        "ORDER BY run_at DESC LIMIT 1"
+    ).fetchone()
+    per_metric = conn.execute(
+        "SELECT platform, metric, MAX(run_at) AS last_match FROM results "
+        "WHERE status = 'MATCH' GROUP BY platform, metric ORDER BY platform, metric"
+    ).fetchall()
+    return last_run, per_metric
+
+
+def get_regressions(conn, window=3, start_date=None, end_date=None, exact=False):
+    """
+    Find (platform, metric, window length) series that regressed on their
+    latest run. Only runs over windows of the same length are compared (daily
+    runs over a rolling window form one series), so changing the window is
+    never reported as a regression; exact=True compares runs over the exact
+    same (start_date, end_date) only:
+    - 'NEW MISMATCH': latest is MISMATCH, the previous run was MATCH
+    - 'DIFF GROWING': diff_pct strictly increased over the last `window` runs
+    Returns a list of dicts ordered by platform/metric/window.
+    """
+    columns = _series_columns(exact)
+    sql, params = _window_filter(
+        f"SELECT DISTINCT platform, metric, {WINDOW_DAYS} AS window_days"
+        + (", start_date, end_date" if exact else "")
+        + " FROM results WHERE status != 'SKIPPED'",
+        [], start_date, end_date)
+    keys = conn.execute(sql + f" ORDER BY {', '.join(columns)}", params).fetchall()
+    regressions = []
+    for key in keys:
+        where = " AND ".join(f"{WINDOW_DAYS if c == 'window_days' else c} = ?" for c in columns)
+        series_sql, series_params = _window_filter(
+            f"SELECT run_at, start_date, end_date, diff_pct, status FROM results "
+            f"WHERE {where} AND status != 'SKIPPED'",
+            [key[c] for c in columns], start_date, end_date)
+        recent = conn.execute(series_sql + " ORDER BY run_at DESC LIMIT ?",
+                              series_params + [max(window, 2)]).fetchall()
+        if len(recent) < 2:
+            continue
+        latest, previous = recent[0], recent[1]
+        kind = None
+        if latest['status'] == 'MISMATCH' and previous['status'] == 'MATCH':
+            kind = 'NEW MISMATCH'
+        elif len(recent) >= window:
+            diffs = [r['diff_pct'] for r in reversed(recent[:window])]
+            if all(b > a for a, b in zip(diffs, diffs[1:])):
+                kind = 'DIFF GROWING'
+        if kind:
+            regressions.append({
+                'platform': key['platform'],
+                'metric': key['metric'],
+                'window_days': key['window_days'],
+                'start_date': latest['start_date'],
+                'end_date': latest['end_date'],
+                'kind': kind,
+                'run_at': latest['run_at'],
+                'diff_pct': latest['diff_pct'],
+                'previous_diff_pct': previous['diff_pct'],
+            })
+    return regressions
+
+
+# ============================================================
+# CLI
+# ============================================================
+def _status_color(status):
+    return C.GREEN if status == 'MATCH' else C.RED
+
+
+def print_trend(conn, platform, metric, days, start_date=None, end_date=None, exact=False):
+    rows = get_trend(conn, platform, metric, days, start_date, end_date, exact)
+    if not rows:
+        print(f"{C.YELLOW}No history for the last {days} days.{C.END}")
+        return
+    columns = _series_columns(exact)
+    current = None
+    for r in rows:
+        if tuple(r[c] for c in columns) != current:
+            current = tuple(r[c] for c in columns)
+            window = f"{r['start_date']} to {r['end_date']}" if exact else f"{r['window_days']}-day window"
+            print(f"\n{C.CYAN}{C.BOLD}{r['platform']} — {r['metric']} ({window}){C.END}")
+            print(f"  {C.DIM}{'Run at':<20} {'Period':<23} {'API':>14} {'BigQuery':>14} {'Diff':>8}{C.END}")
+        period = f"{r['start_date']}..{r['end_date']}"
+        color = _status_color(r['status'])
+        print(f"  {r['run_at']:<20} {period:<23} {r['api_value'] or 0:>14,.2f} "
+              f"{r['bq_value'] or 0:>14,.2f} {color}{r['diff_pct'] or 0:>7.2f}%{C.END}")
+
+
+def print_last_good(conn):
+    last_run, per_metric = get_last_good(conn)
+    if last_run:
+        print(f"\n{C.GREEN}{C.BOLD}Last fully matching run: {last_run['run_at']} "
+              f"({last_run['start_date']} to {last_run['end_date']}, "
+              f"{last_run['total_match']}/{last_run['total_checks']} MATCH){C.END}")
+    else:
+        print(f"\n{C.YELLOW}No fully matching run recorded.{C.END}")
+    if per_metric:
+        print(f"\n{C.CYAN}{C.BOLD}Last MATCH per metric{C.END}")
+        for r in per_metric:
+            print(f"  {r['platform']:<28} {r['metric']:<14} {r['last_match']}")
+
+
+def print_regressions(conn, window, start_date=None, end_date=None, exact=False):
+    regressions = get_regressions(conn, window, start_date, end_date, exact)
+    if not regressions:
+        print(f"\n{C.GREEN}No regressions detected.{C.END}")
+        return
+    print(f"\n{C.RED}{C.BOLD}{len(regressions)} regression(s){C.END}")
+    for r in regressions:
+        period = f"{r['start_date']}..{r['end_date']}"
+        print(f"  {r['platform']:<28} {r['metric']:<14} {period:<23} {C.RED}{r['kind']:<13}{C.END} "
+              f"{r['previous_diff_pct'] or 0:.2f}% -> {r['diff_pct'] or 0:.2f}%  ({r['run_at']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconciliation history queries')
+    parser.add_argument('command', choices=['trend', 'last-good', 'regressions'])
+    parser.add_argument('--platform', type=str, help='Platform filter (substring, e.g. Facebook)')
+    parser.add_argument('--metric', type=str, help='Metric name (e.g. Spend, Revenue)')
+    parser.add_argument('--days', type=int, default=14, help='Trend window in days (default: 14)')
+    parser.add_argument('--window', type=int, default=3,
+                        help='Runs compared for growing-diff detection (default: 3)')
+    parser.add_argument('--start-date', type=str, help='Only runs reconciling this start date (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, help='Only runs reconciling this end date (YYYY-MM-DD)')
+    parser.add_argument('--exact-window', action='store_true',
+                        help='One series per exact (start, end) window instead of per window length')
+    parser.add_argument('--db', type=str, default=str(HISTORY_DB), help='History store path')
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"{C.YELLOW}No history store at {args.db}. Run live_reconciliation.py first.{C.END}")
+        return 1
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'trend':
+            print_trend(conn, args.platform, args.metric, args.days, args.start_date, args.end_date,
+                        args.exact_window)
+        elif args.command == 'last-good':
+            print_last_good(conn)
+        else:
+            print_regressions(conn, args.window, args.start_date, args.end_date, args.exact_window)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
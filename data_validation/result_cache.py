@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+RESULT CACHE - Query results shared by every process on the machine
+===================================================================
+st.cache_data only lives inside one Streamlit process, and BigQuery's own
+result cache is per user. This cache stores results on disk
+(BQ_RESULT_CACHE_DIR, default <tmp>/hulken_result_cache-<uid>, private to
+the user) so every explorer session and worker process reuses them: a hit
+costs zero bytes billed. DataFrames are stored as Parquet, other values as JSON.
+
+Query results are keyed by:
+- the normalised SQL (comments and whitespace removed)
+- the parameter values, including the resolved @now/@today buckets
+- the last_modified_time of every table the SQL reads (a metadata call,
+  not billed): any write to a source table changes the key
+
+Queries on metadata (__TABLES__, INFORMATION_SCHEMA) or on tables that
+cannot be resolved only have a time-to-live (UNVERSIONED_TTL_S). Every
+entry expires after MAX_AGE_S at the latest.
+
+Usage:
+    from result_cache import cached_query, cached_call
+
+    df, hit = cached_query(client, sql, budget=budget)
+    schema = cached_call("schema", ("ads_data", "orders"), lambda: ..., ttl_s=300)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from private_files import private_dir, user_temp_path
+from query_builder import PARAM_RE, now_params, run_query
+
+CACHE_DIR = Path(os.getenv('BQ_RESULT_CACHE_DIR', user_temp_path('hulken_result_cache')))
+MAX_AGE_S = 24 * 3600
+UNVERSIONED_TTL_S = 300
+VERSION_TTL_S = 60  # how long a table's last_modified_time is trusted in-process
+
+# `project.dataset.table` references (metadata tables are skipped)
+TABLE_RE = re.compile(r"`([\w-]+\.\w+\.\w+)`")
+COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+_versions = {}  # table -> (checked_at, last_modified_ms)
+_versions_lock = threading.Lock()
+_insecure_warned = set()
+
+
+# ============================================================
+# KEYS
+# ============================================================
+def normalise_sql(sql):
+    """SQL without comments, runs of whitespace or a trailing semicolon."""
+    return " ".join(COMMENT_RE.sub(" ", sql).split()).rstrip(";").strip()
+
+
+def table_version(client, table):
+    """last_modified_time of a table in ms, or None for views/metadata/unknown tables."""
+    if table.rsplit(".", 1)[-1].startswith("__"):
+        return None
+    now = time.monotonic()
+    with _versions_lock:
+        cached = _versions.get(table)
+    if cached and now - cached[0] < VERSION_TTL_S:
+        return cached[1]
+    try:
+        t = client.get_table(table)
+        version = int(t.modified.timestamp() * 1000) if t.modified and t.table_type == "TABLE" else None
+    except Exception:
+        version = None
+    with _versions_lock:
+        _versions[table] = (now, version)
+    return version
+
+
+def query_key(client, sql, params=None):
+    """(cache key, versioned) for a query: versioned is False when no source table could be resolved."""
+    sql = normalise_sql(sql)
+    params = dict(params or {})
+    referenced = set(PARAM_RE.findall(sql))
+    defaults = now_params()
+    params.update({name: defaults[name] for name in ('now', 'today') if name in referenced and name not in params})
+    tables = sorted(set(TABLE_RE.findall(sql)))
+    versions = {table: table_version(client, table) for table in tables}
+    versioned = bool(versions) and all(v is not None for v in versions.values())
+    payload = json.dumps({"sql": sql, "params": params, "tables": versions}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest(), versioned
+
+
+# ============================================================
+# STORAGE
+# ============================================================
+# DataFrames are stored as Parquet, other values as JSON: loading an entry
+# never executes code, whoever wrote the file. The directory must also be
+# private to the current user (mode 0700, same owner), otherwise the cache
+# is bypassed so another local user cannot feed results to the explorer.
+def _path(key, fmt):
+    return CACHE_DIR / f"{key}.{fmt}"
+
+
+def _private_dir():
+    """Create CACHE_DIR (0700) if needed; False when it is not private to this user."""
+    try:
+        private_dir(CACHE_DIR)
+    except PermissionError as e:
+        if CACHE_DIR not in _insecure_warned:
+            _insecure_warned.add(CACHE_DIR)
+            print(f"result_cache: {e}, cache disabled", file=sys.stderr)
+        return False
+    except OSError:
+        return False
+    return True
+
+
+def get(key, ttl_s=MAX_AGE_S, fmt="json"):
+    """Cached value for a key, or None when missing or older than ttl_s."""
+    path = _path(key, fmt)
+    if not _private_dir():
+        return None
+    try:
+        if time.time() - path.stat().st_mtime > min(ttl_s, MAX_AGE_S):
+            return None
+        if fmt == "parquet":
+            import pandas as pd
+            return pd.read_parquet(path)
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def put(key, value, fmt="json"):
+    """
+    Store a value (atomic rename: readers in other processes never see partial
+    files). Values that cannot be serialised are not cached.
+    """
+    if not _private_dir():
+        return
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        if fmt == "parquet":
+            os.close(fd)
+            value.to_parquet(tmp, index=False)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+        os.replace(tmp, _path(key, fmt))
+    except (OSError, ValueError, TypeError, NotImplementedError):
+        Path(tmp).unlink(missing_ok=True)
+
+
+def cleanup(max_age_s=MAX_AGE_S):
+    """Delete expired entries."""
+    if not CACHE_DIR.exists() or not _private_dir():
+        return
+    cutoff = time.time() - max_age_s
+    for path in CACHE_DIR.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+# ============================================================
+# CACHED CALLS
+# ============================================================
+def cached_query(client, sql, params=None, budget=None):
+    """
+    DataFrame of a query, from the shared cache when the source tables have
+    not changed. The query runs through `budget` (QueryBudget) when given.
+    Returns (DataFrame, hit).
+    """
+    key, versioned = query_key(client, sql, params)
+    df = get(key, MAX_AGE_S if versioned else UNVERSIONED_TTL_S, fmt="parquet")
+    if df is not None:
+        return df, True
+    job = budget.run_query(client, sql, params) if budget else run_query(client, sql, params)
+    df = job.to_dataframe()
+    put(key, df, fmt="parquet")
+    return df, False
+
+
+def cached_call(name, args, fn, ttl_s=UNVERSIONED_TTL_S):
+    """fn() cached under (name, args) for ttl_s seconds, e.g. metadata lookups. fn() must return JSON data."""
+    key = hashlib.sha256(json.dumps([name, list(args)], default=str).encode()).hexdigest()
+    value = get(key, ttl_s)
+    if value is None:
+        value = fn()
+        put(key, value)
+    return value
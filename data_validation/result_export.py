@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+RESULT EXPORT - Stream query results to a compressed file
+=========================================================
+Exports the destination table of a finished query job without ever holding
+the whole result in memory:
+
+- export_to_file(): reads the table page by page (tabledata.list, Arrow
+  record batches of EXPORT_CHUNK_ROWS rows) and appends each chunk to a
+  CSV.gz or Parquet file on disk. Memory stays at one chunk.
+- extract_to_gcs(): for results above EXPORT_MAX_LOCAL_ROWS, an extract job
+  writes the files straight to Cloud Storage (BQ_EXPORT_BUCKET); nothing
+  goes through this process. signed_urls() then gives time-limited download
+  links, so large files never go through the explorer (Streamlit keeps the
+  data of a download button in memory). Credentials without a private key
+  (ADC user login, VM metadata) cannot sign: the gs:// URI is shown instead.
+
+Files are written to EXPORT_DIR (BQ_EXPORT_DIR, default
+<tmp>/hulken_exports-<uid>, private to the user) and removed after
+EXPORT_RETENTION_HOURS by cleanup_exports(); extracted files under
+gs://BQ_EXPORT_BUCKET/EXPORT_GCS_PREFIX by cleanup_gcs_exports() (needs
+storage.objects.delete on the bucket).
+
+Usage:
+    from result_export import export_to_file, EXPORT_FORMATS
+
+    path, rows = export_to_file(client, "project.dataset.table", "csv.gz")
+"""
+
+import os
+import sys
+import gzip
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from google.cloud import bigquery
+
+from private_files import private_dir, user_temp_path
+
+EXPORT_DIR = Path(os.getenv('BQ_EXPORT_DIR', user_temp_path('hulken_exports')))
+EXPORT_BUCKET = os.getenv('BQ_EXPORT_BUCKET', '')
+EXPORT_GCS_PREFIX = "explorer_exports"
+EXPORT_CHUNK_ROWS = int(os.getenv('BQ_EXPORT_CHUNK_ROWS', '50000'))
+EXPORT_MAX_LOCAL_ROWS = int(os.getenv('BQ_EXPORT_MAX_LOCAL_ROWS', '100000'))
+EXPORT_RETENTION_HOURS = 24
+
+# format -> (file extension, mime type, extract job format, extract job compression)
+EXPORT_FORMATS = {
+    "csv.gz": (".csv.gz", "application/gzip", bigquery.DestinationFormat.CSV, bigquery.Compression.GZIP),
+    "parquet": (".parquet", "application/octet-stream", bigquery.DestinationFormat.PARQUET, bigquery.Compression.SNAPPY),
+}
+
+
+def _record_batches(client, table):
+    """Arrow record batches of a table, EXPORT_CHUNK_ROWS rows at a time."""
+    rows = client.list_rows(table, page_size=EXPORT_CHUNK_ROWS)
+    return rows.to_arrow_iterable(bqstorage_client=None)
+
+
+def _empty_table(client, table):
+    """Zero-row Arrow table with the table's schema."""
+    return client.list_rows(table, max_results=0).to_arrow(create_bqstorage_client=False)
+
+
+def export_to_file(client, table, fmt, name=None, progress=None):
+    """
+    Stream a table into EXPORT_DIR/<name><ext>, one chunk at a time.
+    progress(rows_written) is called after every chunk.
+    Returns (path, rows_written).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {', '.join(EXPORT_FORMATS)})")
+    import pyarrow.parquet as pq
+
+    private_dir(EXPORT_DIR)
+    name = name or table.replace(':', '_').replace('.', '_')
+    path = EXPORT_DIR / f"{name}{EXPORT_FORMATS[fmt][0]}"
+    partial = path.with_name(path.name + '.part')
+
+    written = 0
+    try:
+        if fmt == "parquet":
+            writer = None
+            try:
+                for batch in _record_batches(client, table):
+                    if writer is None:
+                        writer = pq.ParquetWriter(str(partial), batch.schema, compression="snappy")
+                    writer.write_batch(batch)
+                    written += batch.num_rows
+                    if progress:
+                        progress(written)
+            finally:
+                if writer is not None:
+                    writer.close()
+            if writer is None:
+                # Empty result: still produce a file with the schema
+                pq.write_table(_empty_table(client, table), str(partial))
+        else:
+            with gzip.open(partial, "wt", encoding="utf-8", newline="") as out:
+                for batch in _record_batches(client, table):
+                    # pandas keeps nested/repeated columns readable in CSV
+                    batch.to_pandas().to_csv(out, index=False, header=written == 0)
+                    written += batch.num_rows
+                    if progress:
+                        progress(written)
+                if not written:
+                    _empty_table(client, table).to_pandas().to_csv(out, index=False)
+        partial.replace(path)
+    except Exception:
+        partial.unlink(missing_ok=True)
+        raise
+    return path, written
+
+
+def extract_to_gcs(client, table, fmt, name):
+    """
+    Extract job writing the table to gs://BQ_EXPORT_BUCKET/EXPORT_GCS_PREFIX/<name>/part-*<ext>.
+    Returns the destination URI pattern once the job is done.
+    """
+    if not EXPORT_BUCKET:
+        raise RuntimeError("BQ_EXPORT_BUCKET is not set: large results cannot be extracted to Cloud Storage")
+    ext, _, destination_format, compression = EXPORT_FORMATS[fmt]
+    uri = f"gs://{EXPORT_BUCKET}/{EXPORT_GCS_PREFIX}/{name}/part-*{ext}"
+    config = bigquery.ExtractJobConfig(destination_format=destination_format, compression=compression)
+    client.extract_table(table, uri, job_config=config).result()
+    return uri
+
+
+def signed_urls(uri, project=None, hours=EXPORT_RETENTION_HOURS):
+    """
+    [(file name, V4 signed GET URL valid `hours` hours)] of the files an
+    extract job wrote to `uri` (gs://bucket/prefix/part-*<ext>), or None when
+    the credentials cannot sign (no private key: ADC user login, VM metadata).
+    """
+    from google.auth.exceptions import GoogleAuthError
+    from google.cloud import storage
+
+    bucket_name, pattern = uri[len("gs://"):].split("/", 1)
+    prefix = pattern.split("*", 1)[0]
+    bucket = storage.Client(project=project).bucket(bucket_name)
+    try:
+        return [
+            (blob.name.rsplit("/", 1)[-1],
+             blob.generate_signed_url(version="v4", expiration=timedelta(hours=hours), method="GET"))
+            for blob in bucket.list_blobs(prefix=prefix)
+        ]
+    except (AttributeError, GoogleAuthError) as e:
+        # google-cloud-storage raises AttributeError for credentials without a private key
+        print(f"result_export: cannot sign download links ({e})", file=sys.stderr)
+        return None
+
+
+def cleanup_exports(max_age_hours=EXPORT_RETENTION_HOURS):
+    """Delete export files older than max_age_hours."""
+    if not EXPORT_DIR.exists():
+        return
+    try:
+        private_dir(EXPORT_DIR)
+    except PermissionError:
+        return  # not ours: never delete another user's files
+    cutoff = time.time() - max_age_hours * 3600
+    for path in EXPORT_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def cleanup_gcs_exports(project=None, max_age_hours=EXPORT_RETENTION_HOURS):
+    """Delete extracted files under gs://BQ_EXPORT_BUCKET/EXPORT_GCS_PREFIX/ older than max_age_hours."""
+    if not EXPORT_BUCKET:
+        return
+    from google.api_core.exceptions import GoogleAPIError
+    from google.cloud import storage
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    try:
+        bucket = storage.Client(project=project).bucket(EXPORT_BUCKET)
+        for blob in bucket.list_blobs(prefix=f"{EXPORT_GCS_PREFIX}/"):
+            if blob.time_created and blob.time_created < cutoff:
+                blob.delete()
+    except GoogleAPIError as e:
+        print(f"result_export: cannot delete expired exports in gs://{EXPORT_BUCKET} ({e})", file=sys.stderr)
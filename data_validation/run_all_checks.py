@@ -6,7 +6,17 @@ Ce script combine TOUTES les vérifications en un seul endroit:
   1. Validation API vs BigQuery (live_reconciliation.py)
   2. Détection tables vides/nouvelles (table_monitoring.py)  
   3. Surveillance syncs Airbyte
-  4. Vérification qualité des données
+  4. Vérification qualité des données (soc_checks.py)
+
+Les checks sont importés et exécutés dans ce processus avec un seul
+client BigQuery authentifié (pas de démarrage Python / auth par check).
+--isolate relance un check dans un sous-processus (timeout 5 min) pour
+les checks susceptibles de planter.
+
+Chaque check déclare ses prérequis (ex: "BigQuery joignable"); les
+checks indépendants tournent en parallèle (--workers) et chaque résultat
+est affiché dès qu'il est terminé. Si un prérequis échoue, les checks
+qui en dépendent sont marqués SKIPPED.
 
 Usage:
     # Routine quotidienne (tout vérifier)
@@ -23,15 +33,38 @@ Usage:
 
     # Sauvegarder le rapport
     python run_all_checks.py --output report.txt
+
+    # Isoler certains checks dans un sous-processus
+    python run_all_checks.py --isolate reconciliation,soc
+    python run_all_checks.py --isolate all
+
+    # Exécution séquentielle (un check à la fois)
+    python run_all_checks.py --workers 1
+
+    # Contrôles SOC approximatifs (TABLESAMPLE, ~10x moins de données scannées)
+    python run_all_checks.py --approximate
 """
 
+import io
 import os
 import sys
 import subprocess
 import argparse
+import contextlib
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+SCRIPT_DIR = Path(__file__).parent
+
+# Same credentials as the individual check scripts
+load_dotenv(SCRIPT_DIR / '.env')
+BQ_PROJECT = os.getenv('BIGQUERY_PROJECT', 'hulken')
+
 # ANSI Colors
 class C:
     GREEN = '\033[92m'
@@ -85,13 +118,217 @@ def run_command(cmd, description, verbose=False):
         return False, str(e)
 
 
-def check_airbyte_connections(verbose=False):
+# ============================================================
+# OUTPUT CAPTURE (thread-safe)
+# ============================================================
+_capture_buffer = contextvars.ContextVar('capture_buffer', default=None)
+
+
+class ContextStdout:
+    """
+    sys.stdout proxy routing writes to the capture buffer of the current context.
+
+    contextlib.redirect_stdout swaps a process-wide object, which would mix
+    the output of checks running concurrently. The buffer lives in a
+    contextvar: each check's worker thread has its own, and pools started by
+    a check (rate_limiter.ContextThreadPoolExecutor) copy it to their threads.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, text):
+        return (_capture_buffer.get() or self.target).write(text)
+
+    def flush(self):
+        (_capture_buffer.get() or self.target).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+@contextlib.contextmanager
+def capture_output():
+    """Capture everything printed from the current context (and the threads it spawns) into a StringIO."""
+    if not isinstance(sys.stdout, ContextStdout):
+        sys.stdout = ContextStdout(sys.stdout)
+    buffer = io.StringIO()
+    token = _capture_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _capture_buffer.reset(token)
+
+
+def run_in_process(func, description, verbose=False):
+    """Run a check function in this process, capturing its output like run_command."""
+    print(f"{C.BLUE}▶ {description}...{C.END}")
+
+    buffer = io.StringIO()
+    try:
+        with capture_output() as buffer:
+            returncode = func()
+    except SystemExit as e:
+        # sys.exit() / sys.exit(None) is success, sys.exit("message") a failure
+        returncode = 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+    except Exception:
+        print(f"{C.RED}✗ {description} - ERREUR{C.END}")
+        print(f"{C.RED}{traceback.format_exc()}{C.END}")
+        return False, buffer.getvalue()
+
+    output = buffer.getvalue()
+    if not returncode:
+        print(f"{C.GREEN}✓ {description} - OK{C.END}")
+        if verbose:
+            print(output)
+        return True, output
+    else:
+        print(f"{C.RED}✗ {description} - ÉCHEC{C.END}")
+        if verbose:
+            print(output)
+        return False, output
+
+
+# ============================================================
+# CHECKS
+# ============================================================
+# Each check has an in-process entry point taking the shared client and
+# a script command line used when the check is isolated (--isolate).
+def _reconciliation_in_process(client):
+    import live_reconciliation
+    return live_reconciliation.main(['--no-animation'], bq_client=client)
+
+
+def _tables_in_process(client):
+    import table_monitoring
+    return table_monitoring.main(['--check'], client=client)
+
+
+def _soc_in_process(client, approximate=False):
+    import soc_checks
+    return soc_checks.main(['--approximate'] if approximate else [], bq_client=client)
+
+
+def _bigquery_probe(client):
+    list(client.query("SELECT 1").result())
+    print(f"Connecté au projet '{BQ_PROJECT}'")
+    return 0
+
+
+CHECKS = {
+    'bigquery': {
+        'title': '0. CONNEXION BigQuery',
+        'description': 'BigQuery joignable',
+        'result_name': 'Connexion BigQuery',
+        'requires': [],
+        'in_process': _bigquery_probe,
+    },
+    'reconciliation': {
+        'title': '1. VALIDATION API vs BigQuery',
+        'description': 'Vérification cohérence API ↔ BigQuery',
+        'result_name': 'API vs BigQuery',
+        'in_process': _reconciliation_in_process,
+        'script': ['live_reconciliation.py', '--no-animation'],
+        'requires': ['bigquery'],
+    },
+    'tables': {
+        'title': '2. DÉTECTION TABLES',
+        'description': 'Vérification tables vides/nouvelles/stale',
+        'result_name': 'Monitoring tables',
+        'in_process': _tables_in_process,
+        'script': ['table_monitoring.py', '--check'],
+        'requires': ['bigquery'],
+    },
+    'airbyte': {
+        'title': '3. SURVEILLANCE AIRBYTE',
+        'result_name': 'Syncs Airbyte',
+        'requires': ['bigquery'],
+    },
+    'soc': {
+        'title': '4. QUALITÉ DES DONNÉES (SOC)',
+        'description': 'Contrôles SOC (prix, doublons, NULL, fraîcheur)',
+        'result_name': 'Qualité données (SOC)',
+        'in_process': _soc_in_process,
+        'script': ['soc_checks.py'],
+        'requires': ['bigquery'],
+    },
+}
+
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+def with_prerequisites(names):
+    """Add every (transitive) prerequisite of the selected checks, in CHECKS order."""
+    needed = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(CHECKS[name].get('requires', []))
+    return [name for name in CHECKS if name in needed]
+
+
+def schedule_checks(names, run_check, on_complete, max_workers=4):
+    """
+    Run checks concurrently as soon as their prerequisites have passed.
+
+    run_check(name) -> (success, output) runs in a bounded worker pool;
+    on_complete(name, status, output, elapsed) is called from this thread
+    as each check finishes, with status True/False, or None when skipped
+    because a prerequisite failed. Wall time follows the critical path.
+    Returns {name: status}.
+    """
+    status = {}
+    pending = list(names)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                requires = CHECKS[name].get('requires', [])
+                if any(dep in status and not status[dep] for dep in requires):
+                    pending.remove(name)
+                    status[name] = None
+                    on_complete(name, None, '', 0.0)
+                elif all(status.get(dep) is True for dep in requires):
+                    pending.remove(name)
+                    started = datetime.now()
+                    running[pool.submit(run_check, name)] = (name, started)
+
+            if not running:
+                # Remaining checks wait on prerequisites that were never scheduled
+                for name in pending:
+                    status[name] = None
+                    on_complete(name, None, '', 0.0)
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started = running.pop(future)
+                elapsed = (datetime.now() - started).total_seconds()
+                try:
+                    success, output = future.result()
+                except Exception:
+                    success, output = False, traceback.format_exc()
+                status[name] = bool(success)
+                on_complete(name, status[name], output, elapsed)
+    return status
+
+
+def get_shared_client():
+    """One authenticated BigQuery client shared by all in-process checks."""
+    from bq_client import get_client
+    return get_client(BQ_PROJECT)
+
+
+def check_airbyte_connections(verbose=False, client=None):
     """Vérifie l'état des connections Airbyte via BigQuery."""
     print(f"{C.BLUE}▶ Vérification syncs Airbyte...{C.END}")
     
     try:
-        from google.cloud import bigquery
-        client = bigquery.Client(project='hulken')
+        client = client or get_shared_client()
         
         # Vérifier la fraîcheur des syncs
         sources = {
@@ -104,7 +341,7 @@ def check_airbyte_connections(verbose=False):
         for source_name, table_name in sources.items():
             query = f"""
             SELECT MAX(_airbyte_extracted_at) AS last_sync
-            FROM `hulken.ads_data.{table_name}`
+            FROM `{BQ_PROJECT}.ads_data.{table_name}`
             """
             
             result = list(client.query(query).result())
@@ -146,6 +383,14 @@ def main():
                         help='Seulement détection tables')
     parser.add_argument('--only-airbyte', action='store_true',
                         help='Seulement syncs Airbyte')
+    parser.add_argument('--only-soc', action='store_true',
+                        help='Seulement contrôles qualité SOC')
+    parser.add_argument('--isolate', type=str, default='',
+                        help='Checks à exécuter en sous-processus: reconciliation,tables,soc ou all')
+    parser.add_argument('--approximate', action='store_true',
+                        help='Contrôles SOC sur échantillon (scan complet seulement près d\'un seuil)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Nombre de checks exécutés en parallèle (défaut: 4)')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Afficher tous les détails')
     parser.add_argument('--output', type=str,
@@ -159,35 +404,57 @@ def main():
     # Header
     print_header("SUPER VALIDATION - Vérification complète")
     print(f"{C.DIM}Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{C.END}\n")
-    
-    results = {}
-    
-    # 1. Validation API vs BigQuery
-    if not args.only_tables and not args.only_airbyte:
-        print_header("1. VALIDATION API vs BigQuery")
-        success, output = run_command(
-            'python data_validation/live_reconciliation.py --no-animation',
-            'Vérification cohérence API ↔ BigQuery',
-            args.verbose
-        )
-        results['API vs BigQuery'] = success
-    
-    # 2. Détection tables vides/nouvelles
-    if not args.only_reconciliation and not args.only_airbyte:
-        print_header("2. DÉTECTION TABLES")
-        success, output = run_command(
-            'python data_validation/table_monitoring.py --check',
-            'Vérification tables vides/nouvelles/stale',
-            args.verbose
-        )
-        results['Monitoring tables'] = success
-    
-    # 3. Vérification syncs Airbyte
-    if not args.only_reconciliation and not args.only_tables:
-        print_header("3. SURVEILLANCE AIRBYTE")
-        success = check_airbyte_connections(args.verbose)
-        results['Syncs Airbyte'] = success
-    
+
+    only = [name for name in CHECKS if getattr(args, f'only_{name}', False)]
+    selected = only or [name for name in CHECKS if name != 'bigquery']
+    isolated = set(CHECKS) if args.isolate == 'all' else {
+        name.strip() for name in args.isolate.split(',') if name.strip()
+    }
+
+    # Shared client for every in-process check (created once, authenticated once)
+    client = None
+    try:
+        client = get_shared_client()
+    except Exception as e:
+        print(f"{C.RED}✗ Connexion BigQuery impossible: {e}{C.END}")
+
+    def run_check(name):
+        """Run one check in a worker thread; everything it prints is captured."""
+        check = CHECKS[name]
+        with capture_output() as buffer:
+            if name == 'airbyte':
+                success = check_airbyte_connections(args.verbose, client)
+            elif name == 'bigquery' and client is None:
+                print(f"{C.RED}✗ {check['description']} - ÉCHEC{C.END}")
+                success = False
+            elif name in isolated:
+                cmd = ' '.join([f'"{sys.executable}"', f'"{SCRIPT_DIR / check["script"][0]}"']
+                               + check['script'][1:]
+                               + (['--approximate'] if name == 'soc' and args.approximate else []))
+                success, _ = run_command(cmd, check['description'], args.verbose)
+            elif name == 'soc':
+                success, _ = run_in_process(
+                    lambda: check['in_process'](client, args.approximate), check['description'], args.verbose
+                )
+            else:
+                success, _ = run_in_process(
+                    lambda: check['in_process'](client), check['description'], args.verbose
+                )
+        return success, buffer.getvalue()
+
+    def on_complete(name, status, output, elapsed):
+        """Stream each result as soon as its check finishes."""
+        check = CHECKS[name]
+        print_header(check['title'])
+        if status is None:
+            print(f"{C.YELLOW}⏭ {check['result_name']} - SKIPPED (prérequis en échec){C.END}")
+        else:
+            sys.stdout.write(output)
+            print(f"{C.DIM}  ({elapsed:.1f}s){C.END}")
+
+    statuses = schedule_checks(with_prerequisites(selected), run_check, on_complete, args.workers)
+    results = {CHECKS[name]['result_name']: bool(statuses[name]) for name in CHECKS if name in statuses}
+
     # Summary
     print_header("RÉSUMÉ FINAL")
     
@@ -198,7 +465,13 @@ def main():
         else:
             print(f"  {C.RED}✗{C.END} {check_name}")
             all_passed = False
-    
+
+    if client is not None:
+        from bq_client import METRICS
+        bq_summary = METRICS.summary_line()
+        if bq_summary:
+            print(f"\n  {C.DIM}{bq_summary}{C.END}")
+
     print()
     if all_passed:
         print(f"{C.GREEN}{C.BOLD}🎉 TOUT EST OK!{C.END}")
@@ -5,6 +5,9 @@ Data integrity, format, and freshness validation functions.
 """
 
 import os
+import sys
+import math
+import argparse
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
@@ -12,9 +15,18 @@ import pandas as pd
 from google.cloud import bigquery
 from dotenv import load_dotenv
 
+from bq_client import get_client
+from query_builder import run_query, hours_since, now_params, date_filter as build_date_filter
+from query_budget import QueryBudget, sample_sql, sample_blocker
+from column_profiler import StaleProfiles, load_profiles, profile_gaps, summarize
+
 # Import configuration
 from config import (
     THRESHOLDS,
+    APPROXIMATE_MODE,
+    DUPLICATE_SKETCHES,
+    PROFILING,
+    REFERENTIAL_INTEGRITY,
     BQ_PROJECT,
     BQ_DATASET,
     TABLES,
@@ -49,12 +61,119 @@ class SOCResult:
         }
 
 
+# ============================================================
+# SAMPLING STATISTICS (approximate mode)
+# ============================================================
+
+def proportion_ci(
+    successes: int,
+    n: int,
+    z: float = APPROXIMATE_MODE["z"],
+    design_effect: float = APPROXIMATE_MODE["design_effect"]
+) -> tuple:
+    """Wilson interval (fractions) for successes/n, n deflated by the design effect."""
+    if n <= 0:
+        return 0.0, 1.0
+    n_eff = max(n / design_effect, 1.0)
+    p = successes / n
+    denom = 1 + z * z / n_eff
+    center = (p + z * z / (2 * n_eff)) / denom
+    half = z * math.sqrt(p * (1 - p) / n_eff + z * z / (4 * n_eff * n_eff)) / denom
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+def median_ci(values, z: float = APPROXIMATE_MODE["z"]) -> tuple:
+    """Distribution-free interval of the median from the order statistics of a sample."""
+    values = sorted(float(v) for v in values if v is not None and not pd.isna(v))
+    n = len(values)
+    if n == 0:
+        return None, None
+    half = z * math.sqrt(n) / 2
+    low = max(int(math.floor(n / 2 - half)), 0)
+    high = min(int(math.ceil(n / 2 + half)), n - 1)
+    return values[low], values[high]
+
+
+def duplicate_rate_bounds(low: float, high: float, fraction: float) -> tuple:
+    """
+    True duplicate-key rate (percent) bounds from a rate observed on a
+    TABLESAMPLE SYSTEM sample of `fraction`. SYSTEM samples storage blocks:
+    a duplicated key is seen as duplicated when two of its rows are sampled,
+    with a probability between fraction**2 (copies in different blocks) and
+    fraction (copies in the same block). Per sampled row the observed rate is
+    therefore between fraction x and 1 x the true rate.
+    """
+    return low * 100, min(high / fraction, 1.0) * 100
+
+
+def contains_threshold(low: float, high: float, thresholds) -> bool:
+    """True if any threshold lies inside [low, high] (the sample cannot decide)."""
+    return any(low <= t <= high for t in thresholds)
+
+
 class SOCValidator:
     """SOC validation checks for data quality"""
 
-    def __init__(self):
-        self.bq_client = bigquery.Client(project=BQ_PROJECT)
+    def __init__(
+        self,
+        bq_client: Optional[bigquery.Client] = None,
+        budget: Optional[QueryBudget] = None,
+        approximate: bool = False,
+        sample_percent: Optional[int] = None
+    ):
+        self.bq_client = bq_client or get_client(BQ_PROJECT)
+        # Dry-run pre-flight + bytes budget (config.QUERY_BUDGETS["soc_checks"])
+        self.budget = budget or QueryBudget.for_tool("soc_checks")
+        # Approximate mode: sampled null/price/duplicate checks (config.APPROXIMATE_MODE)
+        self.approximate = approximate
+        self.sample_percent = sample_percent or APPROXIMATE_MODE["sample_percent"]
         self.results: List[SOCResult] = []
+        self._profiles: Dict[tuple, Any] = {}  # summary or StaleProfiles
+
+    def _query(
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]] = None,
+        allow_sample: bool = False,
+        presampled_percent: int = 100
+    ):
+        """Start a budgeted query job; allow_sample lets rate checks run on a TABLESAMPLE."""
+        return self.budget.run_query(self.bq_client, query, params, allow_sample=allow_sample,
+                                     presampled_percent=presampled_percent)
+
+    def _approximate_or_exact(self, query: str, params: Dict[str, Any], fetch, assess, allow_sample: bool = False):
+        """
+        Run a check query, on a TABLESAMPLE first in approximate mode.
+
+        fetch(job) turns the job into data; assess(data, fraction) returns
+        (conclusive, interval_details). When the sample's confidence interval
+        contains a threshold the check escalates to the exact query. Queries
+        BigQuery cannot sample (views, a table read twice) run exact.
+        Returns (data, fraction, sampling) where fraction is 1.0 for exact
+        data and sampling describes the approximation (None in exact mode).
+        """
+        blocker = sample_blocker(self.bq_client, query) if self.approximate else None
+        if blocker:
+            data = fetch(self._query(query, params, allow_sample=allow_sample))
+            return data, 1.0, {"mode": f"exact (cannot sample: {blocker})"}
+        if self.approximate:
+            fraction = self.sample_percent / 100
+            data = fetch(self._query(sample_sql(query, self.sample_percent), params,
+                                     presampled_percent=self.sample_percent))
+            conclusive, intervals = assess(data, fraction)
+            sample = {"sample_percent": self.sample_percent,
+                      "confidence_z": APPROXIMATE_MODE["z"], **intervals}
+            if conclusive:
+                return data, fraction, {"mode": "sampled", **sample}
+            data = fetch(self._query(query, params, allow_sample=allow_sample))
+            return data, 1.0, {"mode": "exact (escalated: sample near threshold)", "sample": sample}
+        return fetch(self._query(query, params, allow_sample=allow_sample)), 1.0, None
+
+    def _sample_details(self, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Flag results computed on a sample because of the bytes budget."""
+        if self.budget.last_sample_percent < 100:
+            details["sample_percent"] = self.budget.last_sample_percent
+        return details
 
     # ============================================================
     # PRICE FORMAT VALIDATION
@@ -97,45 +216,68 @@ class SOCValidator:
         price_field = config["price_field"]
         date_field = config["date_field"]
 
-        # Build date filter
-        date_filter = ""
-        if start_date and end_date:
-            date_filter = f"WHERE DATE({date_field}) BETWEEN '{start_date}' AND '{end_date}'"
+        # Build date filter (dates passed as query parameters)
+        date_filter, params = build_date_filter(date_field, start_date, end_date)
 
-        query = f"""
+        # Counts and max are exact (one column, cheap): an outlier outside the
+        # sampled blocks must not turn CRITICAL into PASS. Only the median may
+        # come from a sample.
+        counts_query = f"""
+        SELECT
+            COUNT({price_field}) as total_count,
+            MAX({price_field}) as max_price,
+            COUNTIF({price_field} > @warning_price) as suspicious_count,
+            COUNTIF({price_field} > @critical_price) as critical_count
+        FROM `{table}`
+        {date_filter}
+        """
+        counts_params = {**params,
+                         "warning_price": THRESHOLDS['price_anomaly']['warning'],
+                         "critical_price": THRESHOLDS['price_anomaly']['critical']}
+
+        median_query = f"""
         SELECT
             {price_field} as price,
-            COUNT(*) OVER() as total_count,
-            PERCENTILE_CONT({price_field}, 0.5) OVER() as median_price,
-            MAX({price_field}) OVER() as max_price
+            PERCENTILE_CONT({price_field}, 0.5) OVER() as median_price
         FROM `{table}`
         {date_filter}
         LIMIT 1000
         """
 
+        def assess(df, fraction):
+            # Median interval from the sampled prices
+            low, high = median_ci(df['price']) if not df.empty else (None, None)
+            conclusive = (low is not None and not contains_threshold(
+                low, high, [THRESHOLDS['price_anomaly']['median_threshold']]))
+            return conclusive, {"median_ci": [low, high]}
+
         try:
-            df = self.bq_client.query(query).to_dataframe()
+            counts = list(self._query(counts_query, counts_params).result())[0]
 
-            if df.empty:
+            if not counts.total_count:
                 return SOCResult(
                     check_name=check_name,
                     status="WARNING",
                     message="No price data found for the specified period"
                 )
 
-            median_price = df['median_price'].iloc[0]
-            max_price = df['max_price'].iloc[0]
+            df, fraction, sampling = self._approximate_or_exact(
+                median_query, params, lambda job: job.to_dataframe(), assess, allow_sample=True
+            )
 
-            # Count suspicious prices
-            suspicious_count = len(df[df['price'] > THRESHOLDS['price_anomaly']['warning']])
-            critical_count = len(df[df['price'] > THRESHOLDS['price_anomaly']['critical']])
+            median_price = df['median_price'].iloc[0] if not df.empty else None
+            max_price = counts.max_price
+            suspicious_count = counts.suspicious_count
+            critical_count = counts.critical_count
 
-            details = {
+            details = self._sample_details({
                 "median_price": float(median_price) if median_price else 0,
                 "max_price": float(max_price) if max_price else 0,
                 "suspicious_count": suspicious_count,
                 "critical_count": critical_count
-            }
+            })
+            if sampling:
+                details["approximate"] = sampling
 
             # Check for cents error (median > $1000 is suspicious)
             if median_price and median_price > THRESHOLDS['price_anomaly']['median_threshold']:
@@ -167,7 +309,8 @@ class SOCValidator:
             return SOCResult(
                 check_name=check_name,
                 status="PASS",
-                message=f"Price format OK. Median: ${median_price:,.2f}",
+                message=(f"Price format OK. Median: ${median_price:,.2f}" if median_price is not None
+                         else "Price format OK (no price in the sampled blocks for the median)"),
                 details=details
             )
 
@@ -189,7 +332,9 @@ class SOCValidator:
         end_date: str = None
     ) -> SOCResult:
         """
-        Detect duplicate records by primary key.
+        Detect duplicate records by primary key. The duplicate rate is the
+        share of extra rows (rows - distinct keys) / rows, for the exact scan,
+        the sampled scan and the HLL sketches alike.
         """
         check_name = f"Duplicate Detection ({platform})"
 
@@ -205,11 +350,27 @@ class SOCValidator:
         primary_key = config["primary_key"]
         date_field = config["date_field"]
 
-        # Build date filter
-        date_filter = ""
-        if start_date and end_date:
-            date_filter = f"WHERE DATE({date_field}) BETWEEN '{start_date}' AND '{end_date}'"
+        # Daily HLL sketches first: raw rows are only rescanned when the
+        # estimate is too close to a threshold or the sketches are unavailable
+        sketch = None
+        if DUPLICATE_SKETCHES["enabled"]:
+            try:
+                sketch = self.estimate_duplicates_from_sketches(
+                    platform, table, primary_key, date_field, start_date, end_date
+                )
+            except Exception as e:
+                sketch = {"error": str(e)}
+            if sketch.get("conclusive"):
+                return self._duplicate_result(
+                    check_name, sketch["duplicate_rate_pct"], sketch["excess_rows"], "extra rows",
+                    {"method": "hll_sketch", **sketch}
+                )
+
+        # Build date filter (dates passed as query parameters)
+        date_filter, params = build_date_filter(date_field, start_date, end_date)
 
+        # The table is read once (a sampled table may appear only once per
+        # query): key counts and the row total come from the same rows
         query = f"""
         WITH counts AS (
             SELECT
@@ -218,22 +379,29 @@ class SOCValidator:
             FROM `{table}`
             {date_filter}
             GROUP BY {primary_key}
-            HAVING COUNT(*) > 1
         )
         SELECT
-            COUNT(*) as duplicate_keys,
-            SUM(cnt) as total_duplicate_rows,
-            (SELECT COUNT(*) FROM `{table}` {date_filter}) as total_rows
+            COUNTIF(cnt > 1) as duplicate_keys,
+            SUM(IF(cnt > 1, cnt, 0)) as total_duplicate_rows,
+            SUM(cnt - 1) as excess_rows,
+            SUM(cnt) as total_rows
         FROM counts
         """
 
-        try:
-            result = list(self.bq_client.query(query).result())[0]
+        def assess(result, fraction):
+            low, high = proportion_ci(result.excess_rows or 0, result.total_rows or 0)
+            low, high = duplicate_rate_bounds(low, high, fraction)
+            thresholds = [THRESHOLDS['duplicate_rate']['warning'], THRESHOLDS['duplicate_rate']['critical']]
+            return (result.total_rows or 0) > 0 and not contains_threshold(low, high, thresholds), \
+                {"duplicate_rate_ci_pct": [round(low, 4), round(high, 4)]}
 
-            duplicate_keys = result.duplicate_keys or 0
-            total_duplicate_rows = result.total_duplicate_rows or 0
-            total_rows = result.total_rows or 0
+        try:
+            result, fraction, sampling = self._approximate_or_exact(
+                query, params, lambda job: list(job.result())[0], assess
+            )
 
+            sampled_rows = result.total_rows or 0
+            total_rows = round(sampled_rows / fraction)
             if total_rows == 0:
                 return SOCResult(
                     check_name=check_name,
@@ -241,44 +409,196 @@ class SOCValidator:
                     message="No data found for the specified period"
                 )
 
-            duplicate_rate = (duplicate_keys / total_rows * 100) if total_rows > 0 else 0
+            # Sampled rates are scaled back with the upper end of the block
+            # sampling bounds (duplicate_rate_bounds); exact when fraction is 1
+            observed_rate = (result.excess_rows or 0) / sampled_rows
+            _, duplicate_rate = duplicate_rate_bounds(observed_rate, observed_rate, fraction)
+            excess_rows = round(duplicate_rate / 100 * total_rows)
+            duplicate_keys = round((result.duplicate_keys or 0) / sampled_rows / fraction * total_rows)
+            total_duplicate_rows = round((result.total_duplicate_rows or 0) / sampled_rows / fraction * total_rows)
 
             details = {
                 "duplicate_keys": duplicate_keys,
                 "total_duplicate_rows": total_duplicate_rows,
+                "excess_rows": excess_rows,
                 "total_rows": total_rows,
                 "duplicate_rate_pct": round(duplicate_rate, 4)
             }
+            if sampling:
+                details["approximate"] = sampling
+            if sketch:
+                details["sketch"] = sketch
 
-            if duplicate_rate > THRESHOLDS['duplicate_rate']['critical']:
-                return SOCResult(
-                    check_name=check_name,
-                    status="CRITICAL",
-                    message=f"High duplicate rate: {duplicate_rate:.2f}% ({duplicate_keys:,} keys)",
-                    details=details
-                )
+            return self._duplicate_result(check_name, duplicate_rate, excess_rows, "extra rows", details)
 
-            if duplicate_rate > THRESHOLDS['duplicate_rate']['warning']:
-                return SOCResult(
-                    check_name=check_name,
-                    status="WARNING",
-                    message=f"Duplicate rate: {duplicate_rate:.2f}% ({duplicate_keys:,} keys)",
-                    details=details
-                )
+        except Exception as e:
+            return SOCResult(
+                check_name=check_name,
+                status="ERROR",
+                message=f"Query failed: {str(e)}"
+            )
 
+    def _duplicate_result(
+        self,
+        check_name: str,
+        duplicate_rate: float,
+        count: int,
+        count_label: str,
+        details: Dict[str, Any]
+    ) -> SOCResult:
+        """Status of a duplicate check from its rate (percent of extra rows)."""
+        if duplicate_rate > THRESHOLDS['duplicate_rate']['critical']:
             return SOCResult(
                 check_name=check_name,
-                status="PASS",
-                message=f"No significant duplicates. Rate: {duplicate_rate:.4f}%",
+                status="CRITICAL",
+                message=f"High duplicate rate: {duplicate_rate:.2f}% ({count:,} {count_label})",
                 details=details
             )
 
-        except Exception as e:
+        if duplicate_rate > THRESHOLDS['duplicate_rate']['warning']:
             return SOCResult(
                 check_name=check_name,
-                status="ERROR",
-                message=f"Query failed: {str(e)}"
+                status="WARNING",
+                message=f"Duplicate rate: {duplicate_rate:.2f}% ({count:,} {count_label})",
+                details=details
+            )
+
+        return SOCResult(
+            check_name=check_name,
+            status="PASS",
+            message=f"No significant duplicates. Rate: {duplicate_rate:.4f}%",
+            details=details
+        )
+
+    # ============================================================
+    # DUPLICATE SKETCHES (HyperLogLog)
+    # ============================================================
+
+    def refresh_key_sketches(self, platform: str, table: str, primary_key: str, date_field: str) -> int:
+        """
+        Store one HLL_COUNT.INIT sketch of the primary key per day in the
+        sketch table. Only days from the last sketched one onwards are
+        (re)computed - that day may have been partial; the first run backfills.
+        Writes to the sketch table: run as an explicit step
+        (soc_checks.py --refresh-sketches), never from a check. The days are
+        replaced by one MERGE (atomic: a failure leaves the previous sketches
+        in place) that goes through the dry-run budget. Returns the number of
+        days sketched.
+        """
+        sketch_table = DUPLICATE_SKETCHES["table"]
+        table_def = bigquery.Table(sketch_table, schema=[
+            bigquery.SchemaField("platform", "STRING"),
+            bigquery.SchemaField("table_id", "STRING"),
+            bigquery.SchemaField("key_column", "STRING"),
+            bigquery.SchemaField("day", "DATE"),
+            bigquery.SchemaField("row_count", "INT64"),
+            bigquery.SchemaField("key_sketch", "BYTES"),
+            bigquery.SchemaField("sketched_at", "TIMESTAMP"),
+        ])
+        table_def.time_partitioning = bigquery.TimePartitioning(field="day")
+        table_def.clustering_fields = ["table_id", "key_column"]
+        self.bq_client.create_table(table_def, exists_ok=True)
+
+        key = {"table_id": table, "key_column": primary_key}
+        since = list(run_query(self.bq_client, f"""
+            SELECT MAX(day) AS since FROM `{sketch_table}`
+            WHERE table_id = @table_id AND key_column = @key_column
+        """, key).result())[0].since
+
+        day_filter = f"WHERE DATE({date_field}) >= @since" if since else ""
+        params = {"platform": platform, **key, **({"since": since} if since else {})}
+        # ON FALSE: every new sketch is inserted, the stored days >= @since are deleted
+        replace = ("WHEN NOT MATCHED BY SOURCE AND t.table_id = @table_id AND t.key_column = @key_column "
+                   "AND t.day >= @since THEN DELETE") if since else ""
+        merge = f"""
+        MERGE `{sketch_table}` AS t
+        USING (
+            SELECT
+                @platform AS platform, @table_id AS table_id, @key_column AS key_column,
+                DATE({date_field}) AS day,
+                COUNT(*) AS row_count,
+                HLL_COUNT.INIT(CAST({primary_key} AS STRING), {DUPLICATE_SKETCHES["precision"]}) AS key_sketch,
+                @now AS sketched_at
+            FROM `{table}`
+            {day_filter}
+            GROUP BY day
+        ) AS s
+        ON FALSE
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (platform, table_id, key_column, day, row_count, key_sketch, sketched_at)
+            VALUES (s.platform, s.table_id, s.key_column, s.day, s.row_count, s.key_sketch, s.sketched_at)
+        {replace}
+        """
+        job = self._query(merge, params)
+        job.result()
+        return job.dml_stats.inserted_row_count if job.dml_stats else 0
+
+    def refresh_sketches(self, platforms: List[str] = None) -> Dict[str, int]:
+        """Refresh the key sketches of every enabled platform. Returns {platform: days sketched}."""
+        sketched = {}
+        for platform in platforms or list(PLATFORMS):
+            config = PLATFORMS[platform]
+            if not config.get("enabled", True):
+                continue
+            sketched[platform] = self.refresh_key_sketches(
+                platform, TABLES.get(config["tables"][0]), config["primary_key"], config["date_field"]
             )
+        return sketched
+
+    def estimate_duplicates_from_sketches(
+        self,
+        platform: str,
+        table: str,
+        primary_key: str,
+        date_field: str,
+        start_date: str = None,
+        end_date: str = None
+    ) -> Dict[str, Any]:
+        """
+        Duplicate rate from HLL_COUNT.MERGE over the stored daily sketches:
+        extra rows = rows - distinct keys. Read-only: the sketches are
+        written by refresh_key_sketches (soc_checks.py --refresh-sketches).
+        conclusive is False when the HLL error interval contains a
+        duplicate_rate threshold or the sketches are older than
+        DUPLICATE_SKETCHES["max_age_hours"].
+        """
+        day_filter, params = build_date_filter("day", start_date, end_date, prefix="AND")
+        query = f"""
+        SELECT
+            SUM(row_count) AS total_rows,
+            HLL_COUNT.MERGE(key_sketch) AS distinct_keys,
+            COUNT(*) AS days,
+            MAX(sketched_at) AS sketched_at
+        FROM `{DUPLICATE_SKETCHES["table"]}`
+        WHERE table_id = @table_id AND key_column = @key_column
+        {day_filter}
+        """
+        result = list(self._query(query, {"table_id": table, "key_column": primary_key, **params}).result())[0]
+
+        total_rows = result.total_rows or 0
+        distinct_keys = result.distinct_keys or 0
+        if total_rows == 0:
+            return {"total_rows": 0, "conclusive": False}
+        age_hours = hours_since(result.sketched_at)
+        if age_hours is None or age_hours > DUPLICATE_SKETCHES["max_age_hours"]:
+            return {"total_rows": total_rows, "conclusive": False,
+                    "stale": f"sketches refreshed {age_hours}h ago"}
+
+        # HLL++ relative standard error on the distinct count
+        error = APPROXIMATE_MODE["z"] * 1.04 / math.sqrt(2 ** DUPLICATE_SKETCHES["precision"])
+        excess_rows = max(total_rows - distinct_keys, 0)
+        low = max(total_rows - distinct_keys * (1 + error), 0) / total_rows * 100
+        high = max(total_rows - distinct_keys * (1 - error), 0) / total_rows * 100
+        thresholds = [THRESHOLDS['duplicate_rate']['warning'], THRESHOLDS['duplicate_rate']['critical']]
+        return {
+            "total_rows": total_rows,
+            "distinct_keys_estimate": distinct_keys,
+            "excess_rows": excess_rows,
+            "duplicate_rate_pct": round(excess_rows / total_rows * 100, 4),
+            "duplicate_rate_ci_pct": [round(low, 4), round(high, 4)],
+            "days": result.days,
+            "conclusive": not contains_threshold(low, high, thresholds),
+        }
 
     # ============================================================
     # NULL RATE MONITORING
@@ -318,10 +638,8 @@ class SOCValidator:
             else:
                 critical_fields = [config["primary_key"]]
 
-        # Build date filter
-        date_filter = ""
-        if start_date and end_date:
-            date_filter = f"WHERE DATE({date_field}) BETWEEN '{start_date}' AND '{end_date}'"
+        # Build date filter (dates passed as query parameters)
+        date_filter, params = build_date_filter(date_field, start_date, end_date)
 
         # Build null count query for each field
         null_checks = ", ".join([
@@ -337,8 +655,22 @@ class SOCValidator:
         {date_filter}
         """
 
+        def assess(result, fraction):
+            thresholds = [THRESHOLDS['null_rate']['warning'], THRESHOLDS['null_rate']['critical']]
+            intervals = {}
+            conclusive = (result.total_rows or 0) > 0
+            for field in critical_fields:
+                null_count = getattr(result, f"null_{field.replace('.', '_')}", 0) or 0
+                low, high = proportion_ci(null_count, result.total_rows or 0)
+                intervals[field] = [round(low * 100, 2), round(high * 100, 2)]
+                if contains_threshold(low * 100, high * 100, thresholds):
+                    conclusive = False
+            return conclusive, {"null_rate_ci_pct": intervals}
+
         try:
-            result = list(self.bq_client.query(query).result())[0]
+            result, fraction, sampling = self._approximate_or_exact(
+                query, params, lambda job: list(job.result())[0], assess, allow_sample=True
+            )
             total_rows = result.total_rows
 
             if total_rows == 0:
@@ -363,12 +695,14 @@ class SOCValidator:
                     max_null_rate = rate
                     worst_field = field
 
-            details = {
+            details = self._sample_details({
                 "total_rows": total_rows,
                 "null_rates": null_rates,
                 "max_null_rate": max_null_rate,
                 "worst_field": worst_field
-            }
+            })
+            if sampling:
+                details["approximate"] = sampling
 
             if max_null_rate > THRESHOLDS['null_rate']['critical']:
                 return SOCResult(
@@ -428,16 +762,16 @@ class SOCValidator:
         SELECT
             MAX({date_field}) as latest_record,
             MIN({date_field}) as earliest_record,
-            COUNT(*) as total_records,
-            TIMESTAMP_DIFF(CURRENT_TIMESTAMP(), MAX({date_field}), HOUR) as hours_since_last
+            COUNT(*) as total_records
         FROM `{table}`
         """
 
         try:
-            result = list(self.bq_client.query(query).result())[0]
+            # Lag computed here rather than with CURRENT_TIMESTAMP() so the query stays cacheable
+            result = list(self._query(query).result())[0]
 
             latest_record = result.latest_record
-            hours_since_last = result.hours_since_last or 0
+            hours_since_last = hours_since(latest_record) or 0
             total_records = result.total_records or 0
 
             if total_records == 0:
@@ -511,9 +845,7 @@ class SOCValidator:
         table = TABLES.get(config["tables"][0])
         date_field = config["date_field"]
 
-        date_filter = ""
-        if start_date and end_date:
-            date_filter = f"WHERE DATE({date_field}) BETWEEN '{start_date}' AND '{end_date}'"
+        date_filter, params = build_date_filter(date_field, start_date, end_date)
 
         query = f"""
         SELECT
@@ -524,7 +856,7 @@ class SOCValidator:
         """
 
         try:
-            result = list(self.bq_client.query(query).result())[0]
+            result = list(self._query(query, params).result())[0]
 
             details = {
                 "total_count": result.total_count,
@@ -554,6 +886,296 @@ class SOCValidator:
                 message=f"Query failed: {str(e)}"
             )
 
+    # ============================================================
+    # FORMAT CHECKS (stored column profiles)
+    # ============================================================
+
+    def column_profiles(
+        self,
+        platform: str,
+        start_date: str = None,
+        end_date: str = None
+    ) -> Dict[str, Any]:
+        """
+        Per-column summary of the stored daily profiles of a platform's table
+        (see column_profiler.summarize), shared by every format check of the
+        run. Read-only: profiles are written by the scheduled column_profiler.py.
+        Raises StaleProfiles when days are missing or the refresh is late.
+        """
+        config = PLATFORMS[platform]
+        table = TABLES.get(config["tables"][0])
+        if not (start_date and end_date):
+            today = now_params()['today']
+            start_date = (today - timedelta(days=PROFILING["days"])).isoformat()
+            end_date = (today - timedelta(days=1)).isoformat()
+        key = (table, start_date, end_date)
+        if key not in self._profiles:
+            profiles = load_profiles(self.bq_client, table, start_date, end_date)
+            gap = profile_gaps(profiles, start_date, end_date)
+            self._profiles[key] = (StaleProfiles(f"Column profiles of {table.rsplit('.', 1)[-1]}: {gap}, "
+                                                 "run python column_profiler.py") if gap
+                                   else summarize(profiles))
+        if isinstance(self._profiles[key], StaleProfiles):
+            raise self._profiles[key]
+        return self._profiles[key]
+
+    def _conformance_result(
+        self,
+        check_name: str,
+        columns: Dict[str, Any],
+        details: Dict[str, Any]
+    ) -> SOCResult:
+        """Status from the worst format conformance among `columns` (summaries with a format rule)."""
+        rates = {name: c["conformance_pct"] for name, c in columns.items() if c["conformance_pct"] is not None}
+        details["conformance_pct"] = rates
+        if not rates:
+            return SOCResult(check_name=check_name, status="PASS",
+                             message="No values to validate in the profiled columns", details=details)
+
+        worst_field = min(rates, key=rates.get)
+        worst = rates[worst_field]
+        rule = columns[worst_field]["format_rule"]
+        if worst < THRESHOLDS['format_conformance']['critical']:
+            return SOCResult(check_name=check_name, status="CRITICAL",
+                             message=f"Only {worst:.1f}% of '{worst_field}' match the {rule} format",
+                             details=details)
+        if worst < THRESHOLDS['format_conformance']['warning']:
+            return SOCResult(check_name=check_name, status="WARNING",
+                             message=f"{worst:.1f}% of '{worst_field}' match the {rule} format",
+                             details=details)
+        return SOCResult(check_name=check_name, status="PASS",
+                         message=f"Formats valid. Lowest: {worst:.1f}% in '{worst_field}'",
+                         details=details)
+
+    def check_currency_consistency(
+        self,
+        platform: str = "shopify",
+        start_date: str = None,
+        end_date: str = None
+    ) -> SOCResult:
+        """
+        Currency columns hold ISO codes and a single currency (from column profiles).
+        """
+        check_name = f"Currency Consistency ({platform})"
+
+        if platform not in PLATFORMS:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Unknown platform: {platform}")
+
+        try:
+            profiles = self.column_profiles(platform, start_date, end_date)
+            columns = {name: c for name, c in profiles.items() if c["format_rule"] == "currency"}
+            if not columns:
+                return SOCResult(check_name=check_name, status="PASS", message="No currency column")
+
+            currencies = {name: c["values"] for name, c in columns.items()}
+            result = self._conformance_result(check_name, columns, {"currencies": currencies})
+            if result.status != "PASS":
+                return result
+
+            mixed = {name: values for name, values in currencies.items() if len(values) > 1}
+            if mixed:
+                name, values = next(iter(mixed.items()))
+                total = sum(values.values())
+                shares = ", ".join(f"{v} {n / total * 100:.1f}%" for v, n in
+                                   sorted(values.items(), key=lambda kv: -kv[1]))
+                return SOCResult(check_name=check_name, status="WARNING",
+                                 message=f"Mixed currencies in '{name}': {shares}", details=result.details)
+
+            single = ", ".join(f"{name}={next(iter(values), '-')}" for name, values in currencies.items())
+            return SOCResult(check_name=check_name, status="PASS",
+                             message=f"Single currency: {single}", details=result.details)
+
+        except StaleProfiles as e:
+            return SOCResult(check_name=check_name, status="WARNING", message=str(e))
+        except Exception as e:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Query failed: {str(e)}")
+
+    def check_date_format(
+        self,
+        platform: str = "shopify",
+        start_date: str = None,
+        end_date: str = None
+    ) -> SOCResult:
+        """
+        Date strings follow YYYY-MM-DD and date/timestamp columns stay in a
+        plausible range (from column profiles).
+        """
+        check_name = f"Date Format Validation ({platform})"
+
+        if platform not in PLATFORMS:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Unknown platform: {platform}")
+
+        try:
+            profiles = self.column_profiles(platform, start_date, end_date)
+            string_dates = {name: c for name, c in profiles.items() if c["format_rule"] == "iso_date"}
+            tomorrow = (now_params()['today'] + timedelta(days=1)).isoformat()
+            out_of_range = {
+                name: [c["min"], c["max"]] for name, c in profiles.items()
+                if c["data_type"] in ("DATE", "DATETIME", "TIMESTAMP") and c["min"] is not None
+                and (c["min"][:10] < "2000-01-01" or c["max"][:10] > tomorrow)
+            }
+            result = self._conformance_result(check_name, string_dates, {"out_of_range": out_of_range})
+            if result.status == "PASS" and out_of_range:
+                name, (low, high) = next(iter(out_of_range.items()))
+                return SOCResult(check_name=check_name, status="WARNING",
+                                 message=f"Implausible dates in '{name}': {low} -> {high}",
+                                 details=result.details)
+            return result
+
+        except StaleProfiles as e:
+            return SOCResult(check_name=check_name, status="WARNING", message=str(e))
+        except Exception as e:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Query failed: {str(e)}")
+
+    def check_id_format(
+        self,
+        platform: str = "shopify",
+        start_date: str = None,
+        end_date: str = None
+    ) -> SOCResult:
+        """
+        Identifier columns (primary key and *_id) match the id format (from column profiles).
+        """
+        check_name = f"ID Format Validation ({platform})"
+
+        if platform not in PLATFORMS:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Unknown platform: {platform}")
+
+        try:
+            profiles = self.column_profiles(platform, start_date, end_date)
+            primary_key = PLATFORMS[platform]["primary_key"]
+            columns = {name: c for name, c in profiles.items() if c["format_rule"] == "id"}
+            details = {}
+            if primary_key in profiles:
+                details["primary_key_null_rate_pct"] = profiles[primary_key]["null_rate_pct"]
+            result = self._conformance_result(check_name, columns, details)
+            if profiles.get(primary_key, {}).get("nulls"):
+                return SOCResult(check_name=check_name, status="CRITICAL",
+                                 message=f"{profiles[primary_key]['nulls']:,} NULL values in primary key '{primary_key}'",
+                                 details=result.details)
+            return result
+
+        except StaleProfiles as e:
+            return SOCResult(check_name=check_name, status="WARNING", message=str(e))
+        except Exception as e:
+            return SOCResult(check_name=check_name, status="ERROR", message=f"Query failed: {str(e)}")
+
+    # ============================================================
+    # REFERENTIAL INTEGRITY (anti-joins)
+    # ============================================================
+
+    def check_referential_integrity(self, platforms: List[str] = None) -> List[SOCResult]:
+        """
+        Orphan child rows of every REFERENTIAL_INTEGRITY relationship, in one
+        multi-statement script: each parent's keys are read once into a temp
+        table, then one anti-join per relationship counts the recent child
+        rows without a parent and samples their keys.
+        """
+        relationships = [r for r in REFERENTIAL_INTEGRITY["relationships"]
+                         if platforms is None or r["platform"] in platforms]
+        if not relationships:
+            return []
+
+        parents = {}
+        statements = []
+        for r in relationships:
+            parent = (r["parent"], r["parent_key"])
+            if parent not in parents:
+                parents[parent] = f"parent_keys_{len(parents)}"
+                statements.append(
+                    f"CREATE TEMP TABLE {parents[parent]} AS "
+                    f"SELECT DISTINCT {r['parent_key']} AS key FROM `{r['parent']}`;"
+                )
+
+        orphan = "c.key IS NOT NULL AND p.key IS NULL"
+        selects = [f"""
+        SELECT
+            {i} AS relationship,
+            COUNT(*) AS child_rows,
+            COUNTIF(c.key IS NULL) AS null_keys,
+            COUNTIF({orphan}) AS orphan_rows,
+            COUNT(DISTINCT IF({orphan}, c.key, NULL)) AS orphan_keys,
+            ARRAY_AGG(DISTINCT IF({orphan}, CAST(c.key AS STRING), NULL) IGNORE NULLS
+                      LIMIT {REFERENTIAL_INTEGRITY["sample_size"]}) AS sample_orphans
+        FROM (
+            SELECT {r['child_key']} AS key
+            FROM `{r['child']}`
+            WHERE CAST({r['child_date']} AS TIMESTAMP) >= @since
+              AND CAST({r['child_date']} AS TIMESTAMP) < @cutoff
+        ) c
+        LEFT JOIN {parents[(r['parent'], r['parent_key'])]} p ON c.key = p.key"""
+                   for i, r in enumerate(relationships)]
+        script = "\n".join(statements) + "\n" + "\n        UNION ALL".join(selects) + ";"
+
+        # Window resolved here (bucketed "now") so identical runs hit the cache
+        now = now_params()['now']
+        params = {
+            "since": now - timedelta(days=REFERENTIAL_INTEGRITY["days"]),
+            "cutoff": now - timedelta(hours=REFERENTIAL_INTEGRITY["grace_hours"]),
+        }
+
+        try:
+            # Scripts cannot be dry-run reliably: cap them with the per-query limit instead
+            limit = bigquery.QueryJobConfig(maximum_bytes_billed=self.budget.max_bytes_per_query)
+            rows = {row.relationship: row for row in
+                    run_query(self.bq_client, script, params, job_config_base=limit).result()}
+        except Exception as e:
+            return [SOCResult(
+                check_name="Referential Integrity",
+                status="ERROR",
+                message=f"Query failed: {str(e)}"
+            )]
+
+        return [self._orphan_result(r, rows.get(i), params) for i, r in enumerate(relationships)]
+
+    def _orphan_result(self, relationship: Dict[str, Any], row, params: Dict[str, Any]) -> SOCResult:
+        """Status of one relationship from its anti-join counts."""
+        check_name = f"Referential Integrity ({relationship['name']})"
+        child_rows = row.child_rows if row else 0
+        if not child_rows:
+            return SOCResult(
+                check_name=check_name,
+                status="WARNING",
+                message=f"No child rows in the last {REFERENTIAL_INTEGRITY['days']} days"
+            )
+
+        orphan_rate = row.orphan_rows / child_rows * 100
+        details = {
+            "child_table": relationship["child"],
+            "parent_table": relationship["parent"],
+            "window": [str(params["since"]), str(params["cutoff"])],
+            "child_rows": child_rows,
+            "null_keys": row.null_keys,
+            "orphan_rows": row.orphan_rows,
+            "orphan_keys": row.orphan_keys,
+            "orphan_rate_pct": round(orphan_rate, 4),
+            "sample_orphans": list(row.sample_orphans or []),
+        }
+        example = f" (e.g. {', '.join(details['sample_orphans'][:3])})" if details["sample_orphans"] else ""
+
+        if orphan_rate > THRESHOLDS['orphan_rate']['critical']:
+            return SOCResult(
+                check_name=check_name,
+                status="CRITICAL",
+                message=f"{row.orphan_rows:,} orphan rows ({orphan_rate:.2f}%){example}",
+                details=details
+            )
+
+        if orphan_rate > THRESHOLDS['orphan_rate']['warning']:
+            return SOCResult(
+                check_name=check_name,
+                status="WARNING",
+                message=f"{row.orphan_rows:,} orphan rows ({orphan_rate:.2f}%){example}",
+                details=details
+            )
+
+        return SOCResult(
+            check_name=check_name,
+            status="PASS",
+            message=f"{child_rows:,} rows checked, {row.orphan_rows:,} orphans ({orphan_rate:.4f}%)",
+            details=details
+        )
+
     # ============================================================
     # RUN ALL CHECKS
     # ============================================================
@@ -571,6 +1193,8 @@ class SOCValidator:
             platforms = ["shopify", "facebook", "tiktok"]
 
         self.results = []
+        self._profiles = {}
+        self.budget.reset()
 
         for platform in platforms:
             # Skip disabled platforms
@@ -583,6 +1207,12 @@ class SOCValidator:
             self.results.append(self.check_null_rates(platform, start_date, end_date))
             self.results.append(self.check_data_freshness(platform))
             self.results.append(self.check_record_count(platform, start_date, end_date))
+            self.results.append(self.check_currency_consistency(platform, start_date, end_date))
+            self.results.append(self.check_date_format(platform, start_date, end_date))
+            self.results.append(self.check_id_format(platform, start_date, end_date))
+
+        enabled = [p for p in platforms if PLATFORMS.get(p, {}).get("enabled", True)]
+        self.results.extend(self.check_referential_integrity(enabled))
 
         return self.results
 
@@ -638,13 +1268,37 @@ def check_data_freshness(platform: str = "shopify") -> SOCResult:
     return validator.check_data_freshness(platform)
 
 
-if __name__ == "__main__":
-    # Run checks for all platforms
+def check_referential_integrity(platforms: List[str] = None) -> List[SOCResult]:
+    """Standalone referential integrity checks."""
+    validator = SOCValidator()
+    return validator.check_referential_integrity(platforms)
+
+
+def main(argv: Optional[List[str]] = None, bq_client: Optional[bigquery.Client] = None) -> int:
+    """Run checks for all platforms and print a report. Returns 1 on CRITICAL/ERROR."""
+    parser = argparse.ArgumentParser(description="SOC validation checks")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Null rate, price and duplicate checks on a TABLESAMPLE "
+                             "(full scan only when the result is near a threshold)")
+    parser.add_argument("--sample-percent", type=int, default=APPROXIMATE_MODE["sample_percent"],
+                        help=f"Sample size in approximate mode (default: {APPROXIMATE_MODE['sample_percent']})")
+    parser.add_argument("--refresh-sketches", action="store_true",
+                        help="Only refresh the daily primary key sketches used by the duplicate checks "
+                             "(scheduled step, writes to DUPLICATE_SKETCHES['table'])")
+    args = parser.parse_args(argv)
+
+    if args.refresh_sketches:
+        validator = SOCValidator(bq_client)
+        for platform, days in validator.refresh_sketches().items():
+            print(f"{platform}: {days} day(s) sketched")
+        print(validator.budget.summary_line())
+        return 0
+
     print("=" * 60)
     print("    SOC VALIDATION CHECKS")
     print("=" * 60)
 
-    validator = SOCValidator()
+    validator = SOCValidator(bq_client, approximate=args.approximate, sample_percent=args.sample_percent)
     results = validator.run_all_checks()
 
     for result in results:
@@ -657,10 +1311,20 @@ if __name__ == "__main__":
 
         print(f"\n{status_icon} {result.check_name}")
         print(f"    {result.message}")
+        approximate = (result.details or {}).get("approximate")
+        if approximate:
+            print(f"    ({approximate['mode']}, {validator.sample_percent}% sample)")
 
     print("\n" + "=" * 60)
     summary = validator.get_summary()
     print(f"SUMMARY: {summary['passed']} passed, {summary['warnings']} warnings, "
           f"{summary['critical']} critical, {summary['errors']} errors")
     print(f"OVERALL: {summary['overall_status']}")
+    print(validator.budget.summary_line())
     print("=" * 60)
+
+    return 1 if summary["critical"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+TABLE CATALOG - Local SQLite index of every table and column
+============================================================
+Listing tables, reading schemas and querying __TABLES__ dataset by dataset
+is slow, especially on the GA4 datasets and their hundreds of daily
+events_YYYYMMDD shards. This module copies the project's metadata into a
+local SQLite file (BQ_CATALOG_PATH, default <tmp>/hulken_catalog-<uid>.sqlite)
+with two region-level INFORMATION_SCHEMA queries per region
+(BQ_CATALOG_REGIONS, default "us"):
+
+- TABLES + TABLE_STORAGE  -> tables (type, rows, logical bytes, last modified)
+- COLUMN_FIELD_PATHS      -> columns (nested fields included, e.g. event_params.key),
+                             kept for the latest shard of each sharded table only
+
+Reads (list_tables, overview, search_columns) never touch BigQuery.
+start_background_refresh() keeps the file fresh from a daemon thread; all
+processes of the user share the same file.
+
+Usage:
+    python table_catalog.py                 # refresh now
+    python table_catalog.py email_hash      # which tables have a column like "email_hash"
+
+    from table_catalog import search_columns
+    search_columns("email_hash")
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from config import BQ_PROJECT
+from private_files import user_temp_path
+from query_builder import run_query
+
+CATALOG_PATH = os.getenv('BQ_CATALOG_PATH', str(user_temp_path('hulken_catalog.sqlite')))
+CATALOG_REGIONS = [r.strip() for r in os.getenv('BQ_CATALOG_REGIONS', 'us').split(',') if r.strip()]
+REFRESH_INTERVAL_S = 3600
+
+# events_20260201 -> events_*, events_intraday_20260201 -> events_intraday_*
+SHARD_RE = re.compile(r"^(.*_)\d{8}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    dataset TEXT, table_name TEXT, table_group TEXT, table_type TEXT,
+    row_count INTEGER, size_bytes INTEGER, creation_time TEXT, last_modified TEXT,
+    PRIMARY KEY (dataset, table_name)
+);
+CREATE TABLE IF NOT EXISTS columns (
+    dataset TEXT, table_group TEXT, table_name TEXT, column_name TEXT,
+    data_type TEXT, description TEXT
+);
+CREATE INDEX IF NOT EXISTS columns_name ON columns (column_name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+TABLES_SQL = """
+SELECT t.table_schema AS dataset, t.table_name, t.table_type,
+       s.total_rows AS row_count, s.total_logical_bytes AS size_bytes,
+       t.creation_time, s.storage_last_modified_time AS last_modified
+FROM `{project}`.`region-{region}`.INFORMATION_SCHEMA.TABLES t
+LEFT JOIN `{project}`.`region-{region}`.INFORMATION_SCHEMA.TABLE_STORAGE s
+  ON s.table_schema = t.table_schema AND s.table_name = t.table_name AND NOT s.deleted
+"""
+
+# Columns of the most recent shard only: every events_YYYYMMDD has the same schema
+COLUMNS_SQL = r"""
+SELECT table_schema AS dataset, table_name,
+       REGEXP_REPLACE(table_name, r'_\d{{8}}$', '_*') AS table_group,
+       field_path AS column_name, data_type, description
+FROM `{project}`.`region-{region}`.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS
+WHERE TRUE
+QUALIFY table_name = MAX(table_name) OVER (PARTITION BY table_schema, REGEXP_REPLACE(table_name, r'_\d{{8}}$', '_*'))
+"""
+
+_refresh_lock = threading.Lock()
+_background = None
+
+
+def table_group(table_name):
+    """Name shared by all shards of a date-sharded table (events_* for events_20260201)."""
+    match = SHARD_RE.match(table_name)
+    return f"{match.group(1)}*" if match else table_name
+
+
+def connect(path=None):
+    """Open (and create if needed) the catalog."""
+    conn = sqlite3.connect(path or CATALOG_PATH, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+# ============================================================
+# REFRESH
+# ============================================================
+def refresh(client, regions=None, project=BQ_PROJECT, path=None):
+    """Rebuild the catalog from INFORMATION_SCHEMA. Returns (tables, columns) counts."""
+    regions = regions or CATALOG_REGIONS
+    table_rows, column_rows = [], []
+    for region in regions:
+        for row in run_query(client, TABLES_SQL.format(project=project, region=region)).result():
+            table_rows.append((row.dataset, row.table_name, table_group(row.table_name), row.table_type,
+                               row.row_count, row.size_bytes, _iso(row.creation_time), _iso(row.last_modified)))
+        for row in run_query(client, COLUMNS_SQL.format(project=project, region=region)).result():
+            column_rows.append((row.dataset, row.table_group, row.table_name, row.column_name,
+                                row.data_type, row.description))
+
+    with _refresh_lock:
+        conn = connect(path)
+        try:
+            with conn:  # one transaction: readers see the old or the new catalog, never half of it
+                conn.execute("DELETE FROM tables")
+                conn.execute("DELETE FROM columns")
+                conn.executemany("INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?, ?, ?, ?)", table_rows)
+                conn.executemany("INSERT INTO columns VALUES (?, ?, ?, ?, ?, ?)", column_rows)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('refreshed_at', ?)",
+                             (datetime.now(timezone.utc).isoformat(),))
+        finally:
+            conn.close()
+    return len(table_rows), len(column_rows)
+
+
+def refreshed_at(path=None):
+    """UTC datetime of the last refresh, or None if the catalog was never built."""
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+    finally:
+        conn.close()
+    return datetime.fromisoformat(row[0]) if row else None
+
+
+def start_background_refresh(client, interval_s=REFRESH_INTERVAL_S, path=None):
+    """Daemon thread refreshing the catalog whenever it is older than interval_s (once per process)."""
+    global _background
+
+    def loop():
+        while True:
+            # Any error (SQLite "database is locked" included) must not end the thread
+            try:
+                last = refreshed_at(path)
+                age = (datetime.now(timezone.utc) - last).total_seconds() if last else None
+                if age is None or age >= interval_s:
+                    refresh(client, path=path)
+                    age = 0
+            except Exception as e:
+                print(f"Catalog refresh failed: {e}")
+                age = interval_s - 300  # retry in 5 minutes
+            time.sleep(max(interval_s - age, 60))
+
+    with _refresh_lock:
+        if _background is None or not _background.is_alive():
+            _background = threading.Thread(target=loop, name="table-catalog-refresh", daemon=True)
+            _background.start()
+    return _background
+
+
+# ============================================================
+# READS (local only)
+# ============================================================
+def _read(sql, params=(), path=None):
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def list_tables(dataset, path=None):
+    """Tables and views of a dataset: table, type."""
+    return _read("SELECT table_name AS \"table\", table_type AS type FROM tables WHERE dataset = ? "
+                 "ORDER BY table_name", (dataset,), path)
+
+
+def overview(dataset, path=None):
+    """Size summary of a dataset, same columns as the __TABLES__ overview."""
+    return _read("SELECT table_name, row_count, ROUND(size_bytes / 1024.0 / 1024.0, 1) AS size_mb, "
+                 "last_modified FROM tables WHERE dataset = ? ORDER BY row_count DESC", (dataset,), path)
+
+
+def search_columns(pattern, dataset=None, limit=500, path=None):
+    """
+    Tables having a column (or nested field) whose name contains `pattern`,
+    case-insensitive. Sharded tables appear once (events_*) with their shard count.
+    """
+    where = "c.column_name LIKE ? COLLATE NOCASE"
+    params = [f"%{pattern}%"]
+    if dataset:
+        where += " AND c.dataset = ?"
+        params.append(dataset)
+    sql = f"""
+        SELECT c.dataset, c.table_group AS "table", c.column_name AS "column", c.data_type AS type,
+               COUNT(t.table_name) AS shards, SUM(t.row_count) AS row_count
+        FROM columns c
+        LEFT JOIN tables t ON t.dataset = c.dataset AND t.table_group = c.table_group
+        WHERE {where}
+        GROUP BY c.dataset, c.table_group, c.column_name, c.data_type
+        ORDER BY c.dataset, c.table_group, c.column_name
+        LIMIT ?
+    """
+    return _read(sql, params + [limit], path)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        print(search_columns(argv[0]).to_string(index=False))
+        return
+    from bq_client import get_client
+    tables, columns = refresh(get_client(BQ_PROJECT))
+    print(f"Catalog refreshed: {tables} tables, {columns} columns -> {CATALOG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
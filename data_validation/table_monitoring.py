@@ -30,7 +30,7 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
-from google.cloud import bigquery
+from bq_client import get_client
 
 # Load env
 env_path = Path(__file__).parent / '.env'
@@ -294,7 +294,11 @@ def check_tables(client, datasets, output_file=None):
     return status
 
 
-def main():
+def main(argv=None, client=None):
+    """
+    CLI entry point. argv defaults to sys.argv; client lets a caller
+    (run_all_checks) share an already authenticated BigQuery client.
+    """
     parser = argparse.ArgumentParser(description='Monitor BigQuery tables for issues')
     parser.add_argument('--create-baseline', action='store_true',
                         help='Create baseline of current tables')
@@ -305,11 +309,11 @@ def main():
     parser.add_argument('--output', type=str, default=None,
                         help='Save report to file')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Connect to BigQuery
     try:
-        client = bigquery.Client(project=BQ_PROJECT)
+        client = client or get_client(BQ_PROJECT)
         # Test connection
         list(client.query("SELECT 1").result())
     except Exception as e:
@@ -0,0 +1,63 @@
+import pytest
+
+from bq_client import when_done
+
+
+class FakeJob:
+    """Query job finishing on its `polls_left`-th reload."""
+
+    def __init__(self, polls_left=2, error=None):
+        self.state = "RUNNING"
+        self.polls_left = polls_left
+        self.error = error
+
+    def reload(self):
+        self.polls_left -= 1
+        if self.polls_left <= 0:
+            self.state = "DONE"
+
+    def done(self):
+        if self.state != "DONE":
+            self.reload()
+        return self.state == "DONE"
+
+    def result(self):
+        while not self.done():
+            pass
+        if self.error:
+            raise self.error
+        return []
+
+
+def test_fires_once_when_poll_loop_sees_done():
+    seen = []
+    job = when_done(FakeJob(polls_left=3), seen.append)
+    job.reload()
+    job.reload()
+    assert seen == []
+    job.reload()
+    job.result()
+    job.done()
+    assert seen == [job]
+
+
+def test_fires_from_result():
+    seen = []
+    job = when_done(FakeJob(), seen.append)
+    job.result()
+    assert seen == [job]
+
+
+def test_fires_when_result_raises():
+    seen = []
+    job = when_done(FakeJob(error=RuntimeError("boom")), seen.append)
+    with pytest.raises(RuntimeError):
+        job.result()
+    assert seen == [job]
+
+
+def test_stacked_hooks_all_fire():
+    seen = []
+    job = when_done(when_done(FakeJob(), lambda j: seen.append("metrics")), lambda j: seen.append("budget"))
+    job.result()
+    assert sorted(seen) == ["budget", "metrics"]
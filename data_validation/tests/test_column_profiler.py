@@ -0,0 +1,48 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import column_profiler
+from column_profiler import profile_gaps
+
+TODAY = date(2026, 2, 13)
+NOW = datetime(2026, 2, 13, 8, tzinfo=timezone.utc)
+
+
+def _profiles(days, profiled_at):
+    return [SimpleNamespace(profile_date=d, profiled_at=profiled_at) for d in days]
+
+
+def _days(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _freeze(monkeypatch):
+    monkeypatch.setattr(column_profiler, "now_params", lambda: {"now": NOW, "today": TODAY})
+    monkeypatch.setattr(column_profiler, "hours_since",
+                        lambda value: int((NOW - value).total_seconds() // 3600))
+
+
+def test_complete_and_fresh(monkeypatch):
+    _freeze(monkeypatch)
+    days = _days(date(2026, 2, 6), date(2026, 2, 12))
+    assert profile_gaps(_profiles(days, NOW - timedelta(hours=3)), days[0], days[-1]) is None
+
+
+def test_missing_days(monkeypatch):
+    _freeze(monkeypatch)
+    days = _days(date(2026, 2, 6), date(2026, 2, 10))
+    assert (profile_gaps(_profiles(days, NOW - timedelta(hours=3)), "2026-02-06", "2026-02-12")
+            == "no profile for 2 day(s) (2026-02-11 -> 2026-02-12)")
+
+
+def test_recent_days_stale(monkeypatch):
+    _freeze(monkeypatch)
+    days = _days(date(2026, 2, 6), date(2026, 2, 12))
+    assert profile_gaps(_profiles(days, NOW - timedelta(hours=30)), days[0], days[-1]) == \
+        "recent days profiled 30h ago"
+
+
+def test_old_window_never_stale(monkeypatch):
+    _freeze(monkeypatch)
+    days = _days(date(2026, 1, 1), date(2026, 1, 7))
+    assert profile_gaps(_profiles(days, datetime(2026, 1, 8, tzinfo=timezone.utc)), days[0], days[-1]) is None
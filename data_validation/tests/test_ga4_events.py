@@ -0,0 +1,33 @@
+from datetime import date
+
+from ga4_events import suffix_filter
+
+
+def test_daily_shards_only():
+    assert suffix_filter("2026-02-01", "2026-02-07") == "_TABLE_SUFFIX BETWEEN '20260201' AND '20260207'"
+
+
+def test_range_before_latest_daily_shard():
+    assert (suffix_filter("2026-02-01", "2026-02-07", latest_daily=date(2026, 2, 10))
+            == "_TABLE_SUFFIX BETWEEN '20260201' AND '20260207'")
+
+
+def test_intraday_shards_after_latest_daily_shard():
+    assert suffix_filter(date(2026, 2, 8), date(2026, 2, 13), latest_daily=date(2026, 2, 11)) == (
+        "(_TABLE_SUFFIX BETWEEN '20260208' AND '20260211' "
+        "OR _TABLE_SUFFIX BETWEEN 'intraday_20260212' AND 'intraday_20260213')")
+
+
+def test_range_entirely_after_latest_daily_shard():
+    assert (suffix_filter("2026-02-12", "2026-02-13", latest_daily=date(2026, 2, 11))
+            == "_TABLE_SUFFIX BETWEEN 'intraday_20260212' AND 'intraday_20260213'")
+
+
+def test_without_intraday():
+    assert (suffix_filter("2026-02-08", "2026-02-13", latest_daily=date(2026, 2, 11), include_intraday=False)
+            == "_TABLE_SUFFIX BETWEEN '20260208' AND '20260211'")
+    assert suffix_filter("2026-02-12", "2026-02-13", latest_daily=date(2026, 2, 11), include_intraday=False) == "FALSE"
+
+
+def test_empty_range():
+    assert suffix_filter("2026-02-13", "2026-02-12") == "FALSE"
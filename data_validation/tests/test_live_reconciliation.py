@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import live_reconciliation
+from live_reconciliation import _split_window, facebook_batch_request
+
+START = datetime(2026, 2, 13)
+
+
+def _assert_partition(windows, start, end):
+    """Windows are contiguous at second precision and cover exactly [start, end]."""
+    assert windows[0][0] == start
+    assert windows[-1][1] == end
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start == previous_end + timedelta(seconds=1)
+    assert all(s <= e for s, e in windows)
+
+
+@pytest.mark.parametrize("pieces", [1, 2, 3, 4, 7, 24])
+def test_split_day(pieces):
+    end = START + timedelta(days=1) - timedelta(seconds=1)
+    windows = _split_window(START, end, pieces)
+    assert len(windows) == pieces
+    _assert_partition(windows, START, end)
+
+
+def test_split_uneven_remainder_goes_to_last_window():
+    end = START + timedelta(seconds=9)  # 10 seconds, 3 pieces
+    windows = _split_window(START, end, 3)
+    assert [(s.second, e.second) for s, e in windows] == [(0, 2), (3, 5), (6, 9)]
+
+
+def test_split_more_pieces_than_seconds():
+    end = START + timedelta(seconds=2)
+    windows = _split_window(START, end, 10)
+    assert len(windows) == 3
+    _assert_partition(windows, START, end)
+
+
+# ── Facebook batch responses ─────────────────────────────────
+class FakeScheduler:
+    """API_SCHEDULER returning one canned batch payload."""
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def request(self, *args, **kwargs):
+        return type("Response", (), {"json": lambda _: self.payload})()
+
+
+def test_facebook_batch_aligned_with_sub_requests(monkeypatch):
+    monkeypatch.setattr(live_reconciliation, "API_SCHEDULER", FakeScheduler(
+        [{"code": 200, "body": '{"name": "Main"}'}, None]))
+    assert facebook_batch_request("token", ["act_1?fields=name", "act_1/insights"]) == [
+        (200, {"name": "Main"}), (None, {"error": {"message": "Sub-request timed out"}})]
+
+
+def test_facebook_batch_short_payload(monkeypatch):
+    monkeypatch.setattr(live_reconciliation, "API_SCHEDULER", FakeScheduler([{"code": 200, "body": "{}"}]))
+    with pytest.raises(RuntimeError, match="1 response"):
+        facebook_batch_request("token", ["act_1?fields=name", "act_1/insights"])
+
+
+def test_facebook_batch_rejected(monkeypatch):
+    monkeypatch.setattr(live_reconciliation, "API_SCHEDULER", FakeScheduler(
+        {"error": {"message": "Invalid OAuth access token."}}))
+    with pytest.raises(RuntimeError, match="Invalid OAuth access token"):
+        facebook_batch_request("token", ["act_1?fields=name"])
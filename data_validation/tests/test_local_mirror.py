@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+import local_mirror
+from local_mirror import NotMirrored, earliest_date, translate
+
+TODAY = date(2026, 2, 13)
+PARAMS = {"today": TODAY}
+ORDERS = "hulken.ads_data.shopify_live_orders_clean"
+
+
+# ── translate ────────────────────────────────────────────────
+def test_translate_table_names():
+    sql, tables = translate(f"SELECT * FROM `{ORDERS}` o JOIN `hulken.ads_data.shopify_utm` u USING (id)")
+    assert sql == 'SELECT * FROM "shopify_live_orders_clean" o JOIN "shopify_utm" u USING (id)'
+    assert tables == [ORDERS, "hulken.ads_data.shopify_utm"]
+
+
+def test_translate_date_functions():
+    sql, _ = translate("SELECT DATE(created_at), DATE_DIFF(@today, DATE(created_at), DAY) "
+                       "FROM `a.b.c` WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)")
+    assert sql == ("SELECT CAST(created_at AS DATE), date_diff('day', CAST(created_at AS DATE), $today) "
+                   'FROM "c" WHERE CAST(created_at AS DATE) >= CAST($today - INTERVAL 7 DAY AS DATE)')
+
+
+def test_translate_keeps_multi_argument_date():
+    sql, _ = translate("SELECT DATE(2026, 2, 13)")
+    assert sql == "SELECT DATE(2026, 2, 13)"
+
+
+def test_translate_nested_calls_and_types():
+    sql, _ = translate("SELECT SAFE_DIVIDE(COUNTIF(x > 0), SAFE_CAST(n AS INT64)), CAST(p AS FLOAT64)")
+    assert sql == "SELECT (count_if(x > 0) / NULLIF(TRY_CAST(n AS BIGINT), 0)), CAST(p AS DOUBLE)"
+
+
+# ── earliest_date ────────────────────────────────────────────
+@pytest.mark.parametrize("where, expected", [
+    ("WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)", date(2026, 2, 6)),
+    ("WHERE created_at > DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)", date(2026, 1, 14)),
+    ("WHERE o.created_at BETWEEN '2026-02-01' AND '2026-02-05' AND status = 'paid'", date(2026, 2, 1)),
+    ("WHERE created_at >= TIMESTAMP '2026-02-10 00:00:00' GROUP BY 1", date(2026, 2, 10)),
+    ("WHERE DATE(created_at) = @today", TODAY),
+    ("WHERE status = 'paid' AND (total > 0 OR refunded) AND DATE(created_at) >= '2026-02-03'", date(2026, 2, 3)),
+])
+def test_earliest_date_from_where_predicate(where, expected):
+    assert earliest_date(f"SELECT * FROM `{ORDERS}` o {where}", "created_at", PARAMS) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    # bound in a SELECT expression: every row is read
+    f"SELECT COUNT(*), COUNTIF(DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)) FROM `{ORDERS}`",
+    f"SELECT * FROM `{ORDERS}` WHERE created_at >= '2026-02-01' OR status = 'paid'",
+    f"SELECT * FROM `{ORDERS}` WHERE (created_at >= '2026-02-01' OR status = 'paid')",
+    f"SELECT * FROM `{ORDERS}` WHERE created_at <= '2026-02-01'",
+    f"SELECT * FROM `{ORDERS}` WHERE updated_created_at >= '2026-02-01'",
+    f"SELECT * FROM `{ORDERS}` WHERE status = 'created_at >= 2026-02-01'",
+])
+def test_earliest_date_without_bound(sql):
+    assert earliest_date(sql, "created_at", PARAMS) is None
+
+
+def test_earliest_date_in_subquery():
+    sql = f"SELECT n FROM (SELECT COUNT(*) AS n FROM `{ORDERS}` WHERE DATE(created_at) >= '2026-02-10') t WHERE n > 0"
+    assert earliest_date(sql, "created_at", PARAMS) == date(2026, 2, 10)
+
+
+def test_earliest_date_from_query_parameter():
+    sql = f"SELECT * FROM `{ORDERS}` WHERE DATE(created_at) >= @start_date"
+    assert earliest_date(sql, "created_at", {**PARAMS, "start_date": "2026-02-02"}) == date(2026, 2, 2)
+    assert earliest_date(sql, "created_at", PARAMS) is None
+
+
+# ── run: mirror coverage ─────────────────────────────────────
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    """Mirror directory with empty day files; returns a function adding days to a table."""
+    pytest.importorskip("duckdb")  # optional dependency: run() refuses every query without it
+    tmp_path.chmod(0o700)
+    monkeypatch.setattr(local_mirror, "MIRROR_DIR", tmp_path)
+    monkeypatch.setattr(local_mirror, "now_params", lambda: {"now": None, "today": TODAY})
+
+    def add_days(table, *days):
+        directory = local_mirror.table_dir(table)
+        directory.mkdir(parents=True, exist_ok=True)
+        for day in days:
+            (directory / f"{day.isoformat()}.parquet").touch()
+    return add_days
+
+
+def test_run_requires_where_bound(mirror):
+    mirror(ORDERS, date(2026, 2, 1), TODAY)
+    with pytest.raises(NotMirrored, match="no WHERE bound"):
+        local_mirror.run(f"SELECT COUNTIF(DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)) FROM `{ORDERS}`")
+
+
+def test_run_refuses_days_before_the_mirror(mirror):
+    mirror(ORDERS, date(2026, 2, 10), TODAY)
+    with pytest.raises(NotMirrored, match="mirrored from 2026-02-10"):
+        local_mirror.run(f"SELECT * FROM `{ORDERS}` WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)")
+
+
+def test_run_refuses_stale_mirror(mirror):
+    mirror(ORDERS, date(2026, 1, 1), date(2026, 2, 10))
+    with pytest.raises(NotMirrored, match="up to 2026-02-10"):
+        local_mirror.run(f"SELECT * FROM `{ORDERS}` WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)")
+
+
+def test_run_refuses_shared_mirror_directory(mirror, tmp_path):
+    mirror(ORDERS, date(2026, 2, 1), TODAY)
+    tmp_path.chmod(0o777)
+    with pytest.raises(NotMirrored, match="not private"):
+        local_mirror.run(f"SELECT * FROM `{ORDERS}` WHERE DATE(created_at) >= DATE_SUB(@today, INTERVAL 7 DAY)")
+
+
+def test_run_refuses_tables_not_mirrored(mirror):
+    with pytest.raises(NotMirrored, match="is not mirrored"):
+        local_mirror.run("SELECT * FROM `hulken.ads_data.tiktok_ads_reports_daily` WHERE report_date >= @today")
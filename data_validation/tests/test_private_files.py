@@ -0,0 +1,37 @@
+import os
+import stat
+
+import pytest
+
+from private_files import private_dir, user_temp_path
+
+posix_only = pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX ownership")
+
+
+@posix_only
+def test_user_temp_path_has_uid():
+    assert user_temp_path("hulken_exports").name == f"hulken_exports-{os.getuid()}"
+    assert user_temp_path("hulken_catalog.sqlite").name == f"hulken_catalog-{os.getuid()}.sqlite"
+
+
+@posix_only
+def test_private_dir_created_0700(tmp_path):
+    path = private_dir(tmp_path / "exports")
+    assert stat.S_IMODE(path.stat().st_mode) & 0o077 == 0
+
+
+@posix_only
+def test_private_dir_refuses_shared_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        private_dir(shared)
+
+
+@posix_only
+def test_private_dir_refuses_symlink(tmp_path):
+    target = private_dir(tmp_path / "target")
+    (tmp_path / "link").symlink_to(target)
+    with pytest.raises(PermissionError):
+        private_dir(tmp_path / "link")
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from query_budget import sample_blocker, sample_sql
+
+
+class FakeClient:
+    """get_table() of a client whose tables have the given table_type."""
+
+    def __init__(self, **types):
+        self.types = types
+
+    def get_table(self, table):
+        return SimpleNamespace(table_type=self.types.get(table.rsplit(".", 1)[-1], "TABLE"))
+
+
+def test_sample_sql_every_table():
+    sql = "SELECT * FROM `p.d.orders` o JOIN `p.d.utm` u ON o.id = u.order_id"
+    assert sample_sql(sql, 10) == ("SELECT * FROM `p.d.orders` TABLESAMPLE SYSTEM (10 PERCENT) o "
+                                   "JOIN `p.d.utm` TABLESAMPLE SYSTEM (10 PERCENT) u ON o.id = u.order_id")
+
+
+def test_sample_sql_keeps_existing_sample():
+    sql = "SELECT * FROM `p.d.orders` TABLESAMPLE SYSTEM (5 PERCENT)"
+    assert sample_sql(sql, 10) == sql
+
+
+def test_sample_sql_leaves_unquoted_names():
+    sql = "WITH t AS (SELECT 1) SELECT * FROM t"
+    assert sample_sql(sql, 10) == sql
+
+
+def test_sample_blocker_base_tables():
+    assert sample_blocker(FakeClient(), "SELECT * FROM `hulken-1.d.orders` JOIN `p.d.utm` USING (id)") is None
+
+
+def test_sample_blocker_view():
+    assert (sample_blocker(FakeClient(facebook_insights="VIEW"), "SELECT * FROM `p.d.facebook_insights`")
+            == "p.d.facebook_insights is a view")
+
+
+def test_sample_blocker_table_read_twice():
+    sql = "SELECT * FROM `p.d.orders` a JOIN `p.d.orders` b ON a.parent_id = b.id"
+    assert sample_blocker(FakeClient(), sql) == "p.d.orders is read more than once"
+
+
+def test_sample_blocker_no_table():
+    assert sample_blocker(FakeClient(), "SELECT 1") == "no table to sample"
@@ -0,0 +1,39 @@
+from reconciliation_history import connect, get_regressions, get_trend, record_run
+
+
+def _daily_runs(db, diffs, days=3, first_end=10):
+    """One run per day over a rolling `days`-day window ending on Feb `first_end` + i."""
+    for i, diff in enumerate(diffs):
+        end = first_end + i
+        record_run(f"2026-02-{end - days + 1:02d}", f"2026-02-{end:02d}", 1.0,
+                   [("Facebook", "Spend", 100.0, 100.0 - diff, diff, diff <= 1.0)],
+                   db_path=db, run_at=f"2026-02-{end + 1:02d} 06:00:00")
+
+
+def test_rolling_window_diff_growing(tmp_path):
+    db = tmp_path / "history.db"
+    _daily_runs(db, [1.5, 2.0, 2.5])
+    regressions = get_regressions(connect(db), window=3)
+    assert [(r['kind'], r['window_days'], r['diff_pct']) for r in regressions] == [('DIFF GROWING', 3, 2.5)]
+    assert (regressions[0]['start_date'], regressions[0]['end_date']) == ("2026-02-10", "2026-02-12")
+
+
+def test_rolling_window_new_mismatch(tmp_path):
+    db = tmp_path / "history.db"
+    _daily_runs(db, [0.5, 3.0])
+    assert [r['kind'] for r in get_regressions(connect(db))] == ['NEW MISMATCH']
+
+
+def test_exact_window_does_not_compare_rolling_runs(tmp_path):
+    db = tmp_path / "history.db"
+    _daily_runs(db, [1.5, 2.0, 2.5])
+    assert get_regressions(connect(db), window=3, exact=True) == []
+
+
+def test_window_lengths_are_separate_series(tmp_path):
+    db = tmp_path / "history.db"
+    _daily_runs(db, [0.5], days=3)
+    _daily_runs(db, [3.0], days=7, first_end=11)
+    conn = connect(db)
+    assert get_regressions(conn) == []
+    assert [r['window_days'] for r in get_trend(conn, days=100000)] == [3, 7]
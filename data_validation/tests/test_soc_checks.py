@@ -0,0 +1,34 @@
+import pytest
+
+from soc_checks import duplicate_rate_bounds, proportion_ci
+
+
+def test_proportion_ci_contains_the_rate():
+    low, high = proportion_ci(50, 1000, z=1.96, design_effect=1.0)
+    assert low < 0.05 < high
+    assert low == pytest.approx(0.0381, abs=1e-4)
+    assert high == pytest.approx(0.0653, abs=1e-4)
+
+
+def test_proportion_ci_design_effect_widens():
+    low, high = proportion_ci(50, 1000, z=1.96, design_effect=1.0)
+    low2, high2 = proportion_ci(50, 1000, z=1.96, design_effect=2.0)
+    assert low2 < low and high2 > high
+
+
+def test_proportion_ci_bounds_stay_in_unit_interval():
+    assert proportion_ci(0, 100)[0] == 0.0
+    assert proportion_ci(100, 100)[1] == 1.0
+    assert 0.0 < proportion_ci(0, 100)[1] < 1.0
+
+
+def test_proportion_ci_without_sample():
+    assert proportion_ci(0, 0) == (0.0, 1.0)
+
+
+def test_duplicate_rate_bounds():
+    # observed 0.2%-0.4% of sampled rows on a 10% block sample
+    low, high = duplicate_rate_bounds(0.002, 0.004, 0.1)
+    assert low == pytest.approx(0.2)
+    assert high == pytest.approx(4.0)
+    assert duplicate_rate_bounds(0.0, 0.5, 0.1) == (0.0, 100.0)
@@ -14,8 +14,14 @@ Strategy:
 
 import json
 import os
+import sys
+from pathlib import Path
 from google.cloud import bigquery
 
+# Shared client factory lives in data_validation/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data_validation'))
+from bq_client import get_client
+
 # Config
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'D:/Better_signal/hulken-fb56a345ac08.json'
 BQ_PROJECT = "hulken"
@@ -23,7 +29,7 @@ BQ_DATASET = "ads_data"
 JSONL_PATH = "D:/Better_signal/Shopify/hulken-orders-bulk-export.jsonl"
 
 def main():
-    client = bigquery.Client(project=BQ_PROJECT)
+    client = get_client(BQ_PROJECT)
 
     print("=" * 60)
     print("RESTORE EMAILS FROM BACKUP")
@@ -29,11 +29,16 @@ Arguments:
 import json
 import os
 import sys
+from pathlib import Path
 from datetime import datetime
 
 # Google Cloud BigQuery
 from google.cloud import bigquery
 
+# Shared client factory lives in data_validation/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data_validation'))
+from bq_client import get_client
+
 # Configuration
 GOOGLE_CREDENTIALS = 'D:/Better_signal/hulken-fb56a345ac08.json'
 BQ_PROJECT = "hulken"
@@ -297,7 +302,7 @@ def main():
 
     # Setup
     setup_credentials()
-    client = bigquery.Client(project=BQ_PROJECT)
+    client = get_client(BQ_PROJECT)
 
     # Step 1: Check current state
     existing_columns = check_current_state(client)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+BIGQUERY EXECUTOR
+=================
+Exécute les requêtes du pipeline via le client google.cloud.bigquery
+au lieu du CLI `bq` (pas de démarrage Python/gcloud par appel, pas de
+parsing CSV de stdout).
+
+- query():      une requête -> lignes typées (list de dict)
+- run_script(): fichier SQL multi-statements -> un seul job "script"
+- submit() + poll(): soumission asynchrone et suivi de plusieurs jobs
+- job_listeners: callbacks appelés avec chaque job terminé (métriques)
+
+Usage:
+    from bq_executor import BigQueryExecutor
+
+    executor = BigQueryExecutor(project="hulken")
+    rows = executor.query("SELECT 1 AS x")          # [{'x': 1}]
+    job = executor.run_script(Path("sql/create_unified_tables.sql"))
+"""
+
+import sys
+import time
+import hashlib
+from pathlib import Path
+
+from google.cloud import bigquery
+
+# Shared client factory lives in data_validation/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data_validation'))
+from bq_client import get_client
+
+from workflow_state import sql_tables
+
+POLL_INTERVAL = 2.0  # seconds between job status polls
+VIEW_TYPE = 2        # __TABLES__.type: 1 = table, 2 = view, 3 = external
+EXTERNAL_TYPE = 3
+
+
+class BigQueryExecutor:
+    """Runs queries and SQL scripts as BigQuery jobs and returns typed rows."""
+
+    def __init__(self, project, client=None, location=None, poll_interval=POLL_INTERVAL):
+        self.project = project
+        self.location = location
+        self.poll_interval = poll_interval
+        self._client = client
+        # listener(job, row_count=None, parent_job_id=None), called for every finished job
+        self.job_listeners = []
+
+    @property
+    def client(self):
+        """Shared BigQuery client, created on first use."""
+        if self._client is None:
+            self._client = get_client(self.project, self.location)
+        return self._client
+
+    def submit(self, sql, job_config=None):
+        """Start a query job without waiting for it."""
+        return self.client.query(sql, job_config=job_config)
+
+    def poll(self, jobs, timeout=None, on_progress=None):
+        """
+        Wait until every job is done, polling their state asynchronously.
+
+        on_progress(job, elapsed_seconds) is called for each job still running
+        at every poll. Raises the first job error once all jobs have finished,
+        and TimeoutError if timeout (seconds) is exceeded.
+        """
+        started = time.monotonic()
+        pending = list(jobs)
+        while pending:
+            still_running = []
+            for job in pending:
+                job.reload()
+                if job.state != 'DONE':
+                    still_running.append(job)
+                    if on_progress:
+                        on_progress(job, time.monotonic() - started)
+            pending = still_running
+            if not pending:
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"{len(pending)} BigQuery job(s) still running after {timeout}s")
+            time.sleep(self.poll_interval)
+
+        for job in jobs:
+            if job.error_result:
+                # result() raises the matching google.api_core exception
+                job.result()
+        return jobs
+
+    def track(self, job, row_count=None, children=False):
+        """Report a finished job (and optionally its script child jobs) to the job listeners."""
+        if not self.job_listeners:
+            return
+        for listener in self.job_listeners:
+            listener(job, row_count=row_count)
+        if children:
+            for child in self.child_jobs(job):
+                for listener in self.job_listeners:
+                    listener(child, parent_job_id=job.job_id)
+
+    def query(self, sql, job_config=None, timeout=None):
+        """Run one query and return its rows as a list of dicts (native Python types)."""
+        job = self.submit(sql, job_config)
+        try:
+            self.poll([job], timeout=timeout)
+            rows = [dict(row.items()) for row in job.result()]
+        except Exception:
+            self.track(job)
+            raise
+        self.track(job, len(rows))
+        return rows
+
+    def run_script(self, sql_or_path, timeout=None, on_progress=None):
+        """
+        Run a multi-statement SQL text or .sql file as a single script job.
+
+        Returns the finished parent job; rows of the last statement are
+        available through job.result().
+        """
+        sql = Path(sql_or_path).read_text(encoding='utf-8') if isinstance(sql_or_path, Path) else sql_or_path
+        job = self.submit(sql)
+        try:
+            self.poll([job], timeout=timeout, on_progress=on_progress)
+        finally:
+            self.track(job, children=True)
+        return job
+
+    def last_modified_times(self, table_ids, _seen=()):
+        """
+        Map fully qualified table ids to their last_modified_time (ms epoch).
+
+        One __TABLES__ metadata query per dataset (no table data scanned);
+        tables that do not exist map to None. A view's last_modified_time
+        only moves when its definition changes, so a view maps instead to
+        {"view_sha256": ..., "base_tables": {...}}: the hash of its query and
+        the times of the tables it reads (nested views expanded the same way).
+        Views whose sources cannot be read from their query and external
+        tables map to a value that differs on every call, i.e. they are
+        always considered changed.
+        """
+        by_dataset = {}
+        for table_id in table_ids:
+            project, dataset, table = table_id.split(".")
+            by_dataset.setdefault((project, dataset), []).append(table)
+
+        result = {table_id: None for table_id in table_ids}
+        for (project, dataset), tables in by_dataset.items():
+            config = bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ArrayQueryParameter("tables", "STRING", tables)
+            ])
+            rows = self.query(
+                f"SELECT table_id, type, last_modified_time FROM `{project}.{dataset}.__TABLES__` "
+                f"WHERE table_id IN UNNEST(@tables)",
+                job_config=config
+            )
+            for row in rows:
+                table_id = f"{project}.{dataset}.{row['table_id']}"
+                if row['type'] == VIEW_TYPE:
+                    result[table_id] = self._view_inputs(table_id, _seen)
+                elif row['type'] == EXTERNAL_TYPE:
+                    # data lives outside BigQuery: no modification time to rely on
+                    result[table_id] = {"external": True, "checked_at": time.time()}
+                else:
+                    result[table_id] = row['last_modified_time']
+        return result
+
+    def _view_inputs(self, view_id, seen):
+        """Definition hash and base table times of a view (see last_modified_times)."""
+        view_query = self.client.get_table(view_id).view_query or ""
+        sources, _ = sql_tables(view_query)
+        sources = [t for t in sources if t != view_id and t not in seen]
+        if not sources:
+            return {"view_sha256": None, "unresolved_at": time.time()}
+        return {
+            "view_sha256": hashlib.sha256(view_query.encode("utf-8")).hexdigest(),
+            "base_tables": self.last_modified_times(sources, _seen=(*seen, view_id)),
+        }
+
+    def child_jobs(self, script_job):
+        """Statement-level jobs of a finished script job (oldest first)."""
+        return list(reversed(list(self.client.list_jobs(parent_job=script_job.job_id))))
+
+
+def format_rows(rows, columns=None):
+    """Render rows (list of dicts) as an aligned text table, like `bq --format=pretty`."""
+    if not rows:
+        return "(0 rows)"
+    columns = columns or list(rows[0].keys())
+    cells = [[str(row.get(c, '')) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    sep = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+    lines = [sep, "| " + " | ".join(c.ljust(w) for c, w in zip(columns, widths)) + " |", sep]
+    for r in cells:
+        lines.append("| " + " | ".join(v.ljust(w) for v, w in zip(r, widths)) + " |")
+    lines.append(sep)
+    return "\n".join(lines)
@@ -13,27 +13,47 @@ Exécute tout le pipeline de data analytics de A à Z:
 7. Détection anomalies (NULL, 0, data manquante)
 8. Génération rapport exécutif
 
+Les étapes PII, unification et anomalies sont sautées si leurs entrées
+(hash du SQL, last_modified_time des tables sources) n'ont pas changé
+depuis leur dernier succès. Après un échec, le run suivant reprend à
+l'étape en échec. Ledger: logs/workflow_state.json
+
+Chaque étape et chaque job BigQuery sont instrumentés (durée, bytes
+facturés, slot-ms, cache hit, lignes): timeline JSON + trace Chrome/Perfetto
+dans logs/, et tableau récapitulatif en fin de run.
+
 Usage:
     python3 master_workflow.py [--skip-reconciliation] [--skip-pii] [--skip-report]
+    python3 master_workflow.py --force   # tout ré-exécuter (ignore le ledger)
 """
 
 import os
 import sys
 import subprocess
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 
+from bq_executor import BigQueryExecutor, format_rows
+from workflow_state import WorkflowState, file_sha256, sql_tables
+from workflow_metrics import WorkflowTimeline
+
 # Configuration
 PROJECT_DIR = Path(__file__).parent.parent
 DATA_VALIDATION_DIR = PROJECT_DIR / "data_validation"
 REPORTS_DIR = PROJECT_DIR / "reports"
 LOGS_DIR = PROJECT_DIR / "logs"
+STATE_FILE = LOGS_DIR / "workflow_state.json"
+PII_SQL = PROJECT_DIR / "sql" / "create_complete_pii_reference.sql"
+UNIFIED_SQL = PROJECT_DIR / "sql" / "create_unified_tables.sql"
 
 # BigQuery config
 BQ_PROJECT = "hulken"
 BQ_DATASET = "ads_data"
 
+# Native BigQuery client (replaces `bq` CLI shell-outs)
+executor = BigQueryExecutor(project=BQ_PROJECT)
+
 # Colors pour output
 class Colors:
     HEADER = '\033[95m'
@@ -88,12 +108,32 @@ def run_command(cmd, description, cwd=None):
         print_error(f"{description} - Exception: {str(e)}")
         return False, str(e)
 
+def print_job_progress(job, elapsed):
+    """Progress line while a BigQuery job is running"""
+    processed = (job.total_bytes_processed or 0) / 1024 / 1024
+    print(f"   ... job {job.job_id} {job.state} ({elapsed:.0f}s, {processed:,.1f} MB traités)")
+
+def run_bq(func, description):
+    """Run a BigQuery executor call and return (success, result)"""
+    print_info(f"Exécution: {description}")
+
+    try:
+        result = func()
+        print_success(f"{description} - Terminé")
+        return True, result
+    except Exception as e:
+        print_error(f"{description} - Échec")
+        print(f"   Erreur: {e}")
+        return False, None
+
 def step1_test_bigquery_connection():
     """Test BigQuery connection"""
     print_step(1, "Test Connexion BigQuery", "🔌")
 
-    cmd = f"bq ls --project_id={BQ_PROJECT} --max_results=5 {BQ_DATASET}"
-    success, output = run_command(cmd, "Test connexion BigQuery")
+    success, _ = run_bq(
+        lambda: list(executor.client.list_tables(f"{BQ_PROJECT}.{BQ_DATASET}", max_results=5)),
+        "Test connexion BigQuery"
+    )
 
     if success:
         print_success("Connexion BigQuery OK!")
@@ -143,37 +183,36 @@ def step4_check_data_freshness():
     """Check if data syncs are up to date"""
     print_step(4, "Vérification Freshness des Données", "⏰")
 
-    # Check last sync time for each source
-    cmd = f"""
-    bq query --project_id={BQ_PROJECT} --use_legacy_sql=false --format=csv '
-    SELECT
-      table_id,
-      TIMESTAMP_MILLIS(last_modified_time) AS last_sync,
-      TIMESTAMP_DIFF(CURRENT_TIMESTAMP(), TIMESTAMP_MILLIS(last_modified_time), HOUR) AS hours_since_sync
-    FROM `{BQ_PROJECT}.{BQ_DATASET}.__TABLES__`
-    WHERE table_id IN (
-      \"shopify_live_orders\",
-      \"facebook_ads_insights\",
-      \"tiktok_ads_reports_daily\",
-      \"google_ads_unified\"
-    )
-    ORDER BY hours_since_sync DESC
-    '
-    """
+    # Check last sync time for each source. Hours are computed here rather
+    # than with CURRENT_TIMESTAMP() so the metadata query stays deterministic.
+    tables = [
+        "shopify_live_orders",
+        "facebook_ads_insights",
+        "tiktok_ads_reports_daily",
+        "google_ads_unified"
+    ]
 
-    success, output = run_command(cmd, "Vérification freshness")
+    success, modified = run_bq(
+        lambda: executor.last_modified_times([f"{BQ_PROJECT}.{BQ_DATASET}.{t}" for t in tables]),
+        "Vérification freshness"
+    )
 
     if success:
-        print(output)
-        # Parse and warn if data is stale (>48h)
-        if "hours_since_sync" in output:
-            for line in output.split('\n')[1:]:  # Skip header
-                if line.strip():
-                    parts = line.split(',')
-                    if len(parts) >= 3:
-                        table, last_sync, hours = parts[0], parts[1], parts[2]
-                        if hours and float(hours) > 48:
-                            print_warning(f"Table {table} n'a pas sync depuis {hours}h!")
+        now = datetime.now(timezone.utc)
+        rows = []
+        for table_id, last_modified in modified.items():
+            last_sync = datetime.fromtimestamp(last_modified / 1000, timezone.utc) if last_modified else None
+            rows.append({
+                'table_id': table_id.split('.')[-1],
+                'last_sync': last_sync,
+                'hours_since_sync': int((now - last_sync).total_seconds() // 3600) if last_sync else None,
+            })
+        rows.sort(key=lambda r: -1 if r['hours_since_sync'] is None else r['hours_since_sync'], reverse=True)
+        print(format_rows(rows))
+        # Warn if data is stale (>48h)
+        for row in rows:
+            if row['hours_since_sync'] is not None and row['hours_since_sync'] > 48:
+                print_warning(f"Table {row['table_id']} n'a pas sync depuis {row['hours_since_sync']}h!")
 
     return success
 
@@ -200,22 +239,23 @@ def step5_consistent_pii_encoding():
     print_info("PII couvertes: email, phone, first_name, last_name, address, IP")
 
     # Check if complete PII script exists
-    pii_script = PROJECT_DIR / "sql" / "create_complete_pii_reference.sql"
+    pii_script = PII_SQL
 
     if pii_script.exists():
         print_info("Exécution script PII complet (email, phone, name, address, IP)...")
 
         # Execute the complete PII reference script
         # Note: This script creates 7 tables (email, phone, first_name, last_name, address, ip, master)
-        cmd = f"bq query --project_id={BQ_PROJECT} --use_legacy_sql=false < {pii_script}"
-        success, output = run_command(cmd, "Création tables PII complètes", cwd=PROJECT_DIR)
+        success, _ = run_bq(
+            lambda: executor.run_script(pii_script, on_progress=print_job_progress),
+            "Création tables PII complètes"
+        )
 
         if success:
             print_success("Tables PII créées: email, phone, name, address, IP!")
 
             # Verify summary
-            check_cmd = f"""
-            bq query --project_id={BQ_PROJECT} --use_legacy_sql=false --format=pretty '
+            check_sql = f"""
             SELECT
               pii_field,
               COUNT(*) AS unique_values,
@@ -224,12 +264,11 @@ def step5_consistent_pii_encoding():
             GROUP BY pii_field
             ORDER BY unique_values DESC
             LIMIT 10
-            '
             """
 
-            check_success, check_output = run_command(check_cmd, "Vérification PII summary")
+            check_success, check_rows = run_bq(lambda: executor.query(check_sql), "Vérification PII summary")
             if check_success:
-                print(check_output)
+                print(format_rows(check_rows))
                 print_info("Valeurs non-NULL: même hash partout")
                 print_info("Valeurs NULL: restent NULL (données manquantes)")
 
@@ -239,14 +278,13 @@ def step5_consistent_pii_encoding():
         # Fallback: create email reference only (backward compatibility)
         print_warning("Script complet non trouvé, création email reference seulement...")
 
-        cmd = f"""
-        bq query --project_id={BQ_PROJECT} --use_legacy_sql=false '
+        sql = f"""
         CREATE OR REPLACE TABLE `{BQ_PROJECT}.{BQ_DATASET}.pii_email_reference` AS
 
         WITH all_emails AS (
           SELECT DISTINCT
             email_hash AS email_hash_original,
-            \"shopify_customers\" AS source
+            "shopify_customers" AS source
           FROM `{BQ_PROJECT}.{BQ_DATASET}.shopify_live_customers_clean`
           WHERE email_hash IS NOT NULL
 
@@ -254,7 +292,7 @@ def step5_consistent_pii_encoding():
 
           SELECT DISTINCT
             email_hash,
-            \"shopify_orders\" AS source
+            "shopify_orders" AS source
           FROM `{BQ_PROJECT}.{BQ_DATASET}.shopify_live_orders_clean`
           WHERE email_hash IS NOT NULL
         )
@@ -262,7 +300,7 @@ def step5_consistent_pii_encoding():
         SELECT
           email_hash_original,
           TO_HEX(SHA256(email_hash_original)) AS email_hash_consistent,
-          STRING_AGG(DISTINCT source, \", \") AS sources,
+          STRING_AGG(DISTINCT source, ", ") AS sources,
           COUNT(DISTINCT source) AS source_count
         FROM all_emails
         GROUP BY email_hash_original;
@@ -270,10 +308,9 @@ def step5_consistent_pii_encoding():
         -- Backward compatibility view
         CREATE OR REPLACE VIEW `{BQ_PROJECT}.{BQ_DATASET}.pii_hash_reference` AS
         SELECT * FROM `{BQ_PROJECT}.{BQ_DATASET}.pii_email_reference`;
-        '
         """
 
-        success, output = run_command(cmd, "Création email reference")
+        success, _ = run_bq(lambda: executor.run_script(sql), "Création email reference")
 
         if success:
             print_success("Table pii_email_reference créée!")
@@ -286,24 +323,25 @@ def step6_unify_tables():
     """Run table unification with deduplication"""
     print_step(6, "Unification des Tables (Sans Doublons)", "🔗")
 
-    unified_sql_script = PROJECT_DIR / "sql" / "create_unified_tables.sql"
+    unified_sql_script = UNIFIED_SQL
 
     if not unified_sql_script.exists():
         print_warning("Script create_unified_tables.sql non trouvé")
         return True
 
     print_info("Exécution du script d'unification...")
-    cmd = f"bq query --project_id={BQ_PROJECT} --use_legacy_sql=false < {unified_sql_script}"
-    success, output = run_command(cmd, "Unification des tables")
+    success, _ = run_bq(
+        lambda: executor.run_script(unified_sql_script, on_progress=print_job_progress),
+        "Unification des tables"
+    )
 
     if success:
         # Check for duplicates
         print_info("Vérification des doublons...")
 
-        duplicate_check_cmd = f"""
-        bq query --project_id={BQ_PROJECT} --use_legacy_sql=false --format=csv '
+        duplicate_check_sql = f"""
         SELECT
-          \"shopify_unified\" AS table_name,
+          "shopify_unified" AS table_name,
           COUNT(*) AS total_rows,
           COUNT(DISTINCT order_id) AS unique_orders,
           COUNT(*) - COUNT(DISTINCT order_id) AS duplicates
@@ -312,19 +350,18 @@ def step6_unify_tables():
         UNION ALL
 
         SELECT
-          \"marketing_unified\",
+          "marketing_unified",
           COUNT(*),
-          COUNT(DISTINCT CONCAT(CAST(date AS STRING), \"_\", channel)),
-          COUNT(*) - COUNT(DISTINCT CONCAT(CAST(date AS STRING), \"_\", channel))
+          COUNT(DISTINCT CONCAT(CAST(date AS STRING), "_", channel)),
+          COUNT(*) - COUNT(DISTINCT CONCAT(CAST(date AS STRING), "_", channel))
         FROM `{BQ_PROJECT}.{BQ_DATASET}.marketing_unified`
-        '
         """
 
-        dup_success, dup_output = run_command(duplicate_check_cmd, "Vérification doublons")
+        dup_success, dup_rows = run_bq(lambda: executor.query(duplicate_check_sql), "Vérification doublons")
 
         if dup_success:
-            print(dup_output)
-            if "duplicates,0" not in dup_output.replace(" ", ""):
+            print(format_rows(dup_rows))
+            if any(row['duplicates'] for row in dup_rows):
                 print_warning("⚠️  Doublons détectés!")
             else:
                 print_success("Aucun doublon détecté!")
@@ -338,12 +375,11 @@ def step7_detect_anomalies():
     print_info("Recherche de données NULL ou 0 inappropriées...")
 
     # Check for suspicious NULLs/zeros
-    anomaly_check_cmd = f"""
-    bq query --project_id={BQ_PROJECT} --use_legacy_sql=false --format=pretty '
+    anomaly_check_sql = f"""
     WITH anomalies AS (
       SELECT
-        \"shopify_unified\" AS table_name,
-        \"order_value\" AS field,
+        "shopify_unified" AS table_name,
+        "order_value" AS field,
         COUNT(*) AS total_rows,
         COUNTIF(order_value IS NULL) AS null_count,
         COUNTIF(order_value = 0) AS zero_count,
@@ -353,8 +389,8 @@ def step7_detect_anomalies():
       UNION ALL
 
       SELECT
-        \"shopify_unified\",
-        \"customer_id\",
+        "shopify_unified",
+        "customer_id",
         COUNT(*),
         COUNTIF(customer_id IS NULL),
         0,
@@ -364,8 +400,8 @@ def step7_detect_anomalies():
       UNION ALL
 
       SELECT
-        \"marketing_unified\",
-        \"revenue\",
+        "marketing_unified",
+        "revenue",
         COUNT(*),
         COUNTIF(revenue IS NULL),
         COUNTIF(revenue = 0),
@@ -375,8 +411,8 @@ def step7_detect_anomalies():
       UNION ALL
 
       SELECT
-        \"marketing_unified\",
-        \"ad_spend\",
+        "marketing_unified",
+        "ad_spend",
         COUNT(*),
         COUNTIF(ad_spend IS NULL),
         COUNTIF(ad_spend = 0),
@@ -388,13 +424,13 @@ def step7_detect_anomalies():
     FROM anomalies
     WHERE null_count > 0 OR zero_count > (total_rows * 0.1)  -- More than 10% zeros
     ORDER BY null_pct DESC, zero_count DESC
-    '
     """
 
-    success, output = run_command(anomaly_check_cmd, "Détection anomalies")
+    success, rows = run_bq(lambda: executor.query(anomaly_check_sql), "Détection anomalies")
+    output = format_rows(rows) if success else "Anomaly query failed"
 
     if success:
-        if "0 rows" in output or not output.strip():
+        if not rows:
             print_success("Aucune anomalie majeure détectée!")
         else:
             print_warning("⚠️  Anomalies détectées:")
@@ -433,6 +469,44 @@ def step8_generate_executive_report():
 
     return success
 
+def sql_step_inputs(sql_path):
+    """Inputs of a SQL-file step: script hash + last_modified_time of every source table (views: of their base tables)"""
+    if not sql_path.exists():
+        return None
+    sources, _ = sql_tables(sql_path.read_text(encoding='utf-8'))
+    return {"sql_sha256": file_sha256(sql_path), "tables": executor.last_modified_times(sources)}
+
+def sql_step_outputs(sql_path):
+    """Outputs of a SQL-file step: last_modified_time of every table it creates"""
+    if not sql_path.exists():
+        return None
+    _, targets = sql_tables(sql_path.read_text(encoding='utf-8'))
+    return {"tables": executor.last_modified_times(targets)}
+
+# Steps whose work only depends on tracked inputs: (inputs, outputs) callables.
+# Other steps (connection, API reconciliation, freshness, report) always run.
+STEP_STATE = {
+    "Encoding PII Cohérent": (lambda: sql_step_inputs(PII_SQL), lambda: sql_step_outputs(PII_SQL)),
+    "Unification Tables": (lambda: sql_step_inputs(UNIFIED_SQL), lambda: sql_step_outputs(UNIFIED_SQL)),
+    "Détection Anomalies": (
+        lambda: {"tables": executor.last_modified_times([
+            f"{BQ_PROJECT}.{BQ_DATASET}.shopify_unified",
+            f"{BQ_PROJECT}.{BQ_DATASET}.marketing_unified",
+        ])},
+        None
+    ),
+}
+
+def step_fingerprint(fn):
+    """Evaluate an inputs/outputs callable; None (= always run) if it cannot be computed"""
+    if fn is None:
+        return None
+    try:
+        return fn()
+    except Exception as e:
+        print_warning(f"Impossible de lire l'état des entrées: {e}")
+        return None
+
 def main():
     """Main workflow orchestrator"""
     print(f"\n{Colors.HEADER}{Colors.BOLD}")
@@ -451,6 +525,18 @@ def main():
     skip_reconciliation = "--skip-reconciliation" in sys.argv
     skip_pii = "--skip-pii" in sys.argv
     skip_report = "--skip-report" in sys.argv
+    force = "--force" in sys.argv
+
+    # Run-state ledger: resume after failure, skip steps with unchanged inputs
+    state = WorkflowState(STATE_FILE)
+    resume_from = None if force else state.resume_point()
+    state.start_run()
+
+    # Instrumentation: step spans + stats of every BigQuery job
+    timeline = WorkflowTimeline(state.data["last_run"]["run_id"])
+    executor.job_listeners.append(timeline.record_job)
+    if resume_from:
+        print_info(f"Reprise du run précédent à l'étape: {resume_from}")
 
     # Execute workflow steps
     steps = [
@@ -465,6 +551,9 @@ def main():
     ]
 
     results = []
+    step_names = [name for name, _, _ in steps]
+    resume_index = step_names.index(resume_from) if resume_from in step_names else 0
+    failed_step = None
 
     for i, (name, func, skip) in enumerate(steps, 1):
         if skip:
@@ -472,12 +561,38 @@ def main():
             results.append((name, "SKIPPED"))
             continue
 
-        try:
-            success = func()
-            results.append((name, "SUCCESS" if success else "FAILED"))
-        except Exception as e:
-            print_error(f"Erreur dans {name}: {str(e)}")
-            results.append((name, "ERROR"))
+        # Resume: steps before the failed one already succeeded in the previous run
+        if i - 1 < resume_index and state.succeeded_in_previous_run(name):
+            print_info(f"\nÉtape {i} ({name}) - RESUMED (réussie au run précédent)")
+            state.carry_over(name)
+            results.append((name, "RESUMED"))
+            continue
+
+        inputs_fn, outputs_fn = STEP_STATE.get(name, (None, None))
+        inputs = step_fingerprint(inputs_fn)
+        if not force and state.inputs_unchanged(name, inputs):
+            print_info(f"\nÉtape {i} ({name}) - UNCHANGED (entrées identiques au dernier succès)")
+            state.carry_over(name)
+            results.append((name, "UNCHANGED"))
+            continue
+
+        with timeline.step(name) as span:
+            try:
+                success = func()
+                status = "SUCCESS" if success else "FAILED"
+            except Exception as e:
+                print_error(f"Erreur dans {name}: {str(e)}")
+                status = "ERROR"
+            span["status"] = status
+        results.append((name, status))
+
+        if status == "SUCCESS":
+            state.record(name, status, inputs, step_fingerprint(outputs_fn))
+        else:
+            state.record(name, status, inputs)
+            failed_step = failed_step or name
+
+    state.finish_run(failed_step)
 
     # Summary
     end_time = datetime.now()
@@ -497,9 +612,22 @@ def main():
             print_success(f"{name}: {status}")
         elif status == "SKIPPED":
             print_warning(f"{name}: {status}")
+        elif status in ("RESUMED", "UNCHANGED"):
+            print_info(f"{name}: {status}")
         else:
             print_error(f"{name}: {status}")
 
+    # Per-step timing and BigQuery cost
+    print(f"\nInstrumentation:")
+    timeline.print_summary()
+    LOGS_DIR.mkdir(exist_ok=True)
+    timeline_file = LOGS_DIR / f"workflow_timeline_{timeline.run_id}.json"
+    trace_file = LOGS_DIR / f"workflow_trace_{timeline.run_id}.json"
+    timeline.write_json(timeline_file)
+    timeline.write_chrome_trace(trace_file)
+    print_info(f"Timeline: {timeline_file}")
+    print_info(f"Trace Chrome/Perfetto: {trace_file}")
+
     # Overall status
     failed = sum(1 for _, s in results if s == "FAILED" or s == "ERROR")
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+WORKFLOW METRICS
+================
+Instrumentation de master_workflow: durée de chaque étape et, pour chaque
+job BigQuery lancé pendant l'étape, bytes facturés, slot-ms, cache hit et
+nombre de lignes.
+
+Sorties:
+- timeline JSON:  logs/workflow_timeline_<run_id>.json
+- Chrome trace:   logs/workflow_trace_<run_id>.json
+  (ouvrir dans chrome://tracing ou https://ui.perfetto.dev)
+- tableau récapitulatif en fin de workflow (print_summary)
+
+Usage:
+    timeline = WorkflowTimeline(run_id)
+    executor.job_listeners.append(timeline.record_job)
+    with timeline.step("Unification Tables") as step:
+        ...
+        step["status"] = "SUCCESS"
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+ON_DEMAND_USD_PER_TIB = 6.25  # BigQuery on-demand pricing, for the cost estimate
+
+
+def _iso(dt):
+    return dt.isoformat() if dt else None
+
+
+class WorkflowTimeline:
+    """Collects step spans and BigQuery job statistics for one workflow run."""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.origin = time.time()
+        self.steps = []
+        self.jobs = []
+        self.current_step = None
+
+    @contextmanager
+    def step(self, name):
+        """Time a workflow step; jobs recorded meanwhile are attached to it."""
+        span = {"name": name, "status": None, "start": time.time(), "end": None, "jobs": []}
+        self.steps.append(span)
+        self.current_step = span
+        try:
+            yield span
+        finally:
+            span["end"] = time.time()
+            self.current_step = None
+
+    def record_job(self, job, row_count=None, parent_job_id=None):
+        """Job listener for BigQueryExecutor: store the statistics of a finished job."""
+        entry = {
+            "job_id": job.job_id,
+            "parent_job_id": parent_job_id,
+            "step": self.current_step["name"] if self.current_step else None,
+            "statement_type": getattr(job, "statement_type", None),
+            "state": job.state,
+            "error": (job.error_result or {}).get("message") if job.error_result else None,
+            "created": _iso(job.created),
+            "started": _iso(job.started),
+            "ended": _iso(job.ended),
+            "duration_s": (job.ended - job.started).total_seconds() if job.started and job.ended else None,
+            "total_bytes_processed": getattr(job, "total_bytes_processed", None) or 0,
+            "total_bytes_billed": getattr(job, "total_bytes_billed", None) or 0,
+            "total_slot_ms": getattr(job, "slot_millis", None) or 0,
+            "cache_hit": bool(getattr(job, "cache_hit", False)),
+            "row_count": row_count if row_count is not None else getattr(job, "num_dml_affected_rows", None),
+        }
+        self.jobs.append(entry)
+        if self.current_step is not None:
+            self.current_step["jobs"].append(entry["job_id"])
+
+    # ── Aggregation ──────────────────────────────────────────
+    def step_totals(self, span):
+        """Aggregate job statistics for one step (child jobs of scripts excluded to avoid double counting)."""
+        jobs = [j for j in self.jobs if j["step"] == span["name"] and j["parent_job_id"] is None]
+        return {
+            "wall_s": round((span["end"] or time.time()) - span["start"], 2),
+            "jobs": len(jobs),
+            "bytes_billed": sum(j["total_bytes_billed"] for j in jobs),
+            "slot_ms": sum(j["total_slot_ms"] for j in jobs),
+            "cache_hits": sum(1 for j in jobs if j["cache_hit"]),
+            "rows": sum(j["row_count"] or 0 for j in jobs),
+        }
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "started_at": datetime.fromtimestamp(self.origin).isoformat(),
+            "steps": [
+                {
+                    "name": s["name"],
+                    "status": s["status"],
+                    "start": datetime.fromtimestamp(s["start"]).isoformat(),
+                    "end": datetime.fromtimestamp(s["end"]).isoformat() if s["end"] else None,
+                    **self.step_totals(s),
+                }
+                for s in self.steps
+            ],
+            "jobs": self.jobs,
+        }
+
+    # ── Outputs ──────────────────────────────────────────────
+    def write_json(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2, default=str), encoding="utf-8")
+
+    def write_chrome_trace(self, path):
+        """Chrome trace event format: steps on thread 1, jobs on 2, script statements on 3."""
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": label}}
+            for tid, label in ((1, "Steps"), (2, "BigQuery jobs"), (3, "Script statements"))
+        ]
+        for s in self.steps:
+            events.append({
+                "name": s["name"], "cat": "step", "ph": "X", "pid": 1, "tid": 1,
+                "ts": int((s["start"] - self.origin) * 1e6),
+                "dur": int(((s["end"] or s["start"]) - s["start"]) * 1e6),
+                "args": {"status": s["status"], **self.step_totals(s)},
+            })
+        for j in self.jobs:
+            if not (j["started"] and j["ended"]):
+                continue
+            start = datetime.fromisoformat(j["started"]).timestamp()
+            end = datetime.fromisoformat(j["ended"]).timestamp()
+            events.append({
+                "name": j["statement_type"] or j["job_id"], "cat": "bigquery", "ph": "X", "pid": 1,
+                "tid": 3 if j["parent_job_id"] else 2,
+                "ts": int((start - self.origin) * 1e6),
+                "dur": int((end - start) * 1e6),
+                "args": {k: j[k] for k in ("job_id", "total_bytes_billed", "total_slot_ms", "cache_hit", "row_count")},
+            })
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}), encoding="utf-8")
+
+    def print_summary(self):
+        """Per-step table sorted as executed, with totals."""
+        header = f"{'Étape':<34} {'Statut':<10} {'Durée':>8} {'Jobs':>5} {'GB facturés':>12} {'Slot-s':>9} {'Cache':>6} {'$ est.':>8}"
+        print(header)
+        print("-" * len(header))
+        total_wall, total_bytes, total_slot = 0.0, 0, 0
+        for s in self.steps:
+            t = self.step_totals(s)
+            total_wall += t["wall_s"]
+            total_bytes += t["bytes_billed"]
+            total_slot += t["slot_ms"]
+            cost = t["bytes_billed"] / 2 ** 40 * ON_DEMAND_USD_PER_TIB
+            print(f"{s['name'][:34]:<34} {str(s['status']):<10} {t['wall_s']:>7.1f}s {t['jobs']:>5} "
+                  f"{t['bytes_billed'] / 1e9:>12.3f} {t['slot_ms'] / 1000:>9.1f} {t['cache_hits']:>6} {cost:>8.3f}")
+        print("-" * len(header))
+        print(f"{'TOTAL':<34} {'':<10} {total_wall:>7.1f}s {len([j for j in self.jobs if not j['parent_job_id']]):>5} "
+              f"{total_bytes / 1e9:>12.3f} {total_slot / 1000:>9.1f} {'':>6} "
+              f"{total_bytes / 2 ** 40 * ON_DEMAND_USD_PER_TIB:>8.3f}")
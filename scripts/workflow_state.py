@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+WORKFLOW STATE LEDGER
+=====================
+Mémorise, pour chaque étape de master_workflow, ses entrées (hash du
+fichier SQL, last_modified_time des tables sources; pour une vue, celui
+des tables qu'elle lit) et ses sorties.
+
+- Une étape dont les entrées n'ont pas changé depuis son dernier succès
+  est sautée (UNCHANGED).
+- Si le run précédent a échoué, les étapes réussies avant l'étape en
+  échec sont sautées (RESUMED) et le workflow reprend à l'étape en échec.
+
+Le ledger est un fichier JSON: logs/workflow_state.json
+"""
+
+import re
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+# `project.dataset.table` references in SQL text
+TABLE_REF_RE = re.compile(r"`([\w-]+)\.(\w+)\.(\w+)`")
+CREATED_RE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP\s+|TEMPORARY\s+)?(?:TABLE|VIEW|MATERIALIZED\s+VIEW)\s+"
+    r"(?:IF\s+NOT\s+EXISTS\s+)?`([\w-]+\.\w+\.\w+)`",
+    re.IGNORECASE
+)
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def sql_tables(sql_text):
+    """
+    Return (sources, targets) fully qualified table ids referenced by a SQL script.
+
+    targets are tables/views the script creates; sources are every other
+    table it reads (metadata tables such as __TABLES__ are ignored).
+    """
+    targets = {m.group(1) for m in CREATED_RE.finditer(sql_text)}
+    refs = {".".join(m.groups()) for m in TABLE_REF_RE.finditer(sql_text)
+            if not m.group(3).startswith("__")}
+    return sorted(refs - targets), sorted(targets)
+
+
+class WorkflowState:
+    """JSON ledger of step inputs/outputs and of the last run's progress."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data = {"steps": {}, "last_run": None}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                pass  # corrupted ledger: start fresh
+
+    def save(self):
+        self.path.parent.mkdir(exist_ok=True)
+        self.path.write_text(json.dumps(self.data, indent=2, default=str), encoding="utf-8")
+
+    # ── Run tracking ─────────────────────────────────────────
+    def resume_point(self):
+        """Name of the step the previous run failed at, or None if it completed."""
+        last_run = self.data.get("last_run")
+        if last_run and not last_run.get("completed"):
+            return last_run.get("failed_step")
+        return None
+
+    def start_run(self):
+        self.previous_run = self.data.get("last_run")
+        self.data["last_run"] = {
+            "run_id": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "started_at": datetime.now().isoformat(),
+            "completed": False,
+            "failed_step": None,
+        }
+        self.save()
+
+    def finish_run(self, failed_step=None):
+        self.data["last_run"]["completed"] = failed_step is None
+        self.data["last_run"]["failed_step"] = failed_step
+        self.data["last_run"]["finished_at"] = datetime.now().isoformat()
+        self.save()
+
+    # ── Step decisions ───────────────────────────────────────
+    def succeeded_in_previous_run(self, name):
+        """True if the step succeeded during the (failed) previous run."""
+        step = self.data["steps"].get(name)
+        previous = getattr(self, "previous_run", None) or {}
+        return bool(step and step.get("status") == "SUCCESS"
+                    and step.get("run_id") == previous.get("run_id"))
+
+    def inputs_unchanged(self, name, inputs):
+        """True if the step last succeeded with exactly these inputs."""
+        step = self.data["steps"].get(name)
+        return bool(inputs is not None and step and step.get("status") == "SUCCESS"
+                    and step.get("inputs") == inputs)
+
+    def carry_over(self, name):
+        """Keep a skipped step's last success attached to the current run."""
+        if name in self.data["steps"]:
+            self.data["steps"][name]["run_id"] = self.data["last_run"]["run_id"]
+            self.save()
+
+    def record(self, name, status, inputs=None, outputs=None):
+        self.data["steps"][name] = {
+            "status": status,
+            "run_id": self.data["last_run"]["run_id"],
+            "inputs": inputs,
+            "outputs": outputs,
+            "finished_at": datetime.now().isoformat(),
+        }
+        self.save()